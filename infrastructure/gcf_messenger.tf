@@ -36,8 +36,11 @@ resource "google_cloudfunctions_function" "stock-reporter" {
   }
 
   environment_variables = {
-    PRICES     = "${google_bigquery_dataset.stocks.dataset_id}.prices_minutely_resampled"
-    PROJECT_ID = var.project_id
+    PRICES        = "${google_bigquery_dataset.stocks.dataset_id}.prices_minutely_resampled"
+    COMPANIES     = "${google_bigquery_dataset.stocks.dataset_id}.${google_bigquery_table.listed_companies.table_id}"
+    PROJECT_ID    = var.project_id
+    STATE_DATASET = google_bigquery_dataset.stocks.dataset_id
+    RENDER_CACHE  = "gs://${google_storage_bucket.datalake.name}/render_cache/messenger"
   }
 
   secret_environment_variables {
@@ -44,5 +44,6 @@ resource "google_cloudfunctions_function" "stock_scraper" {
     HOURLY_INDEX_TABLE    = "${google_bigquery_dataset.stocks.dataset_id}.${google_bigquery_table.indices_hourly.table_id}"
     PROJECT_ID            = var.project_id
     BUCKET                = google_storage_bucket.datalake.name
+    STATE_DATASET         = google_bigquery_dataset.stocks.dataset_id
   }
 }
@@ -42,6 +42,7 @@ resource "google_cloudfunctions_function" "trade-simulator" {
     PROJECT_ID      = var.project_id
     CHANNEL_ID      = var.trading_channel_id
     GUILD_ID        = var.guild_id
+    RENDER_CACHE    = "gs://${google_storage_bucket.datalake.name}/render_cache/trade_simulator"
   }
 
   secret_environment_variables {
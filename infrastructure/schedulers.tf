@@ -18,7 +18,7 @@ resource "google_cloud_scheduler_job" "hourly" {
   name        = "stocks-hourly"
   schedule    = "0 0 * * 1-5"
   region      = var.region
-  description = "Starts a job to ingest the stock prices with hourly granularity."
+  description = "Starts a job to derive hourly stock prices from the minutely prices."
 
   pubsub_target {
     topic_name = google_pubsub_topic.ingestor.id
@@ -51,6 +51,18 @@ resource "google_cloud_scheduler_job" "minutely" {
   }
 }
 
+resource "google_cloud_scheduler_job" "archive_compaction" {
+  name        = "stocks-archive-compaction"
+  schedule    = "0 8 * * 2-6" # after the last minutely run of the previous day
+  region      = var.region
+  description = "Starts a job to compact yesterday's price archive into daily files."
+
+  pubsub_target {
+    topic_name = google_pubsub_topic.ingestor.id
+    data = base64encode(jsonencode({"method": "compact", "interval": "1m"}))
+  }
+}
+
 ###############
 ## Reporting ##
 ###############
@@ -0,0 +1,27 @@
+"""Conftest shared by the tests of every handler."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def imported_modules(handler_dir: str, handler_env: dict) -> set:
+    """
+    Fixture which imports the handler in a fresh interpreter and returns the
+    names of every module in sys.modules afterwards. Each package's conftest
+    provides the handler_dir and handler_env fixtures.
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print(*sys.modules, sep='\\n')"],
+        cwd=handler_dir,
+        env={**os.environ, **handler_env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return set(result.stdout.split())
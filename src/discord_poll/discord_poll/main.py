@@ -3,6 +3,7 @@
 import os
 from time import perf_counter
 import json
+from functools import lru_cache
 
 from google.cloud import pubsub_v1
 
@@ -26,7 +27,7 @@ def main(event=None, context=None):
     messages = scrape_messages_from_discord_channel(CHANNEL_ID, AUTH_TOKEN)
     print("Message ingestion success!")
 
-    client = pubsub_v1.PublisherClient()
+    client = get_publisher()
 
     trades = [
         i for i in messages if i.lower().startswith(("buy", "sell", "add", "subtract"))
@@ -48,6 +49,12 @@ def main(event=None, context=None):
         print(("Nothing to do!"))
 
 
+@lru_cache(maxsize=None)
+def get_publisher() -> pubsub_v1.PublisherClient:
+    """Returns the Pub/Sub publisher, reused across warm invocations"""
+    return pubsub_v1.PublisherClient()
+
+
 ##########
 ## Main ##
 ##########
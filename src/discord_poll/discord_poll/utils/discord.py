@@ -6,6 +6,9 @@ import requests
 
 POLLING_PERIOD = os.environ["POLLING_PERIOD"]
 
+# Reused across warm invocations, so the TLS connection to Discord is kept alive
+SESSION = requests.Session()
+
 
 def scrape_messages_from_discord_channel(channel_id: str, token: str) -> dict:
     """Scrapes all commands from a discord channel"""
@@ -13,7 +16,7 @@ def scrape_messages_from_discord_channel(channel_id: str, token: str) -> dict:
     headers = {"authorization": f"Bot {token}"}
     url = f"https://discord.com/api/v9/channels/{channel_id}/messages?limit=50"
 
-    r = requests.get(url, headers=headers, timeout=10)
+    r = SESSION.get(url, headers=headers, timeout=10)
 
     threshold = datetime.now(timezone.utc) - timedelta(minutes=int(POLLING_PERIOD))
 
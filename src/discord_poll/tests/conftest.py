@@ -0,0 +1,23 @@
+"""Conftest for discord_poll tests."""
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def handler_dir() -> str:
+    """Fixture to return the directory the handler is deployed from"""
+    return os.path.join(os.path.dirname(__file__), "..", "discord_poll")
+
+
+@pytest.fixture
+def handler_env() -> dict:
+    """Fixture to return the environment the handler is deployed with"""
+    return {
+        "PROJECT_ID": "test",
+        "CHANNEL_ID": "test",
+        "AUTH_TOKEN": "test",
+        "TOPIC": "test",
+        "POLLING_PERIOD": "5",
+    }
@@ -0,0 +1,10 @@
+"""Cold-start imports of the discord_poll handler"""
+
+# Heavy modules which the poller never needs, so it must not import them
+LAZY_MODULES = ["pandas", "pandas_gbq", "matplotlib", "fire"]
+
+
+def test_handler_defers_heavy_imports(imported_modules):
+    """Test that the heavy, method-specific modules are not imported on load"""
+
+    assert not set(LAZY_MODULES) & imported_modules
@@ -2,20 +2,29 @@
 
 import os
 from base64 import b64decode
+from functools import partial
 from time import perf_counter
 import json
 
-import fire
-
 # pylint: disable=import-error
-from utils.daily_report import create_discord_report
-from utils.price_alert import create_price_alert
-from utils.utils import import_prices_from_bigquery
-from utils.yahoo import get_stock_prices
+from utils.price_cache import import_prices_with_cache
+from utils.state import get_state_store
+from utils.tasks import Task, run_tasks
+
+# The report (matplotlib) and price check (yahooquery) modules are imported by
+# the method which uses them, so each method only pays for its own imports.
 
 PROJECT_ID = os.environ.get("PROJECT_ID")
 WEBHOOK = os.environ["WEBHOOK"]
 PRICES = os.environ["PRICES"]
+COMPANIES = os.environ.get("COMPANIES", "stocks.listed_companies")
+STATE_DATASET = os.environ.get("STATE_DATASET")
+STATE_DB = os.environ.get("STATE_DB")
+
+STORE = get_state_store(PROJECT_ID, STATE_DATASET, STATE_DB)
+
+# Seconds each step may take, well within the function's 540s timeout
+TIMEOUTS = {"prices": 180, "companies": 60, "quotes": 240, "send": 60}
 
 #############
 ## Handler ##
@@ -30,28 +39,102 @@ def main(event=None, context=None):
     else:  # Invoked via pubsub.
         event = json.loads(b64decode(event["data"]).decode("utf-8"))
 
-    print("Importing prices from BigQuery...")
-    historical_prices = import_prices_from_bigquery(PROJECT_ID, PRICES)
-    print("Data import success! Creating Discord report...")
-
     if event["method"] == "daily-report":
         print("Method called: daily-report")
-        create_discord_report(WEBHOOK, historical_prices)
+        from utils.daily_report import create_discord_report
+
+        tasks = {
+            "prices": Task(load_prices, timeout=TIMEOUTS["prices"]),
+            "send": Task(
+                partial(create_discord_report, WEBHOOK),
+                deps=("prices",),
+                timeout=TIMEOUTS["send"],
+            ),
+        }
+        run_tasks(tasks)
 
     if event["method"] == "price-check":
         print("Method called: price-check")
-        symbols = [f"{ii}.ax" for ii in historical_prices["symbol"].unique()]
-        current_prices = get_stock_prices(symbols)
-        create_price_alert(WEBHOOK, historical_prices, current_prices)
+        from utils.price_alert import create_price_alert, get_listed_companies
+        from utils.yahoo import get_stock_prices
+
+        # The quotes only depend on the register, so they are fetched while
+        # the price history is still loading.
+        tasks = {
+            "prices": Task(load_prices, timeout=TIMEOUTS["prices"]),
+            "companies": Task(
+                partial(get_listed_companies, PROJECT_ID, COMPANIES),
+                timeout=TIMEOUTS["companies"],
+            ),
+            "quotes": Task(
+                lambda companies: get_stock_prices(
+                    [f"{ii}.ax" for ii in companies["symbol"]]
+                ),
+                deps=("companies",),
+                timeout=TIMEOUTS["quotes"],
+            ),
+            "send": Task(
+                partial(create_price_alert, WEBHOOK, STORE),
+                deps=("prices", "quotes", "companies"),
+                timeout=TIMEOUTS["send"],
+            ),
+        }
+        run_tasks(tasks)
+
+    if event["method"] == "watch":
+        print("Method called: watch")
+        import asyncio
+        from utils.delivery import DiscordQueue
+        from utils.price_alert import create_watch_alert, get_listed_companies
+        from utils.watcher import PriceWatcher, watch
+        from utils.yahoo import get_stock_prices
+
+        # Long-running: polls quotes until stopped, so it is run as a process
+        # (python main.py --event='{"method": "watch"}') rather than on a cron.
+        results = run_tasks(
+            {
+                "prices": Task(load_prices, timeout=TIMEOUTS["prices"]),
+                "companies": Task(
+                    partial(get_listed_companies, PROJECT_ID, COMPANIES),
+                    timeout=TIMEOUTS["companies"],
+                ),
+            }
+        )
+        companies = results["companies"]
+        names = dict(zip(companies["symbol"], companies["name"]))
+        tickers = [f"{ii}.ax" for ii in companies["symbol"]]
+
+        queue = DiscordQueue(WEBHOOK)
+        watcher = PriceWatcher(partial(create_watch_alert, queue, names))
+        watcher.seed(results["prices"])
+        fetch = partial(get_stock_prices, tickers, market_time=True)
+        asyncio.run(watch(watcher, fetch, queue=queue))
 
     return
 
 
+##################
+## Sub-Handlers ##
+##################
+
+
+def load_prices():
+    """Imports the recent price history from BigQuery"""
+
+    print("Importing prices from BigQuery...")
+    historical_prices = import_prices_with_cache(PROJECT_ID, PRICES)
+    print("Data import success!")
+
+    return historical_prices
+
+
 ##########
 ## Main ##
 ##########
 
 if __name__ == "__main__":
+    import fire
+
     start = perf_counter()
     fire.Fire(main)
     print(f"Execution time: {perf_counter() - start:.2f} seconds")
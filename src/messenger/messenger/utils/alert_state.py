@@ -0,0 +1,101 @@
+"""Persistent state of the price alerts already sent
+
+The state holds one row per (symbol, rule) pair which has fired: the price
+and time of its last alert and whether its condition still held on the last
+check. Against it, a hit is sent only if it is:
+    new:     the pair has never fired, or its condition cleared and the
+             rule's cooldown has passed since its last alert
+    changed: the condition still holds, but the price has moved by more than
+             the rule's hysteresis from the price last alerted
+The state is a table in the state store (see state.py).
+"""
+
+import numpy as np
+import pandas as pd
+
+ALERT_STATE = "alert_state"
+STATE_COLUMNS = ["symbol", "rule", "price", "fired_at", "active"]
+STATE_DTYPES = {
+    "symbol": object,
+    "rule": object,
+    "price": "float64",
+    "fired_at": "int64",
+    "active": bool,
+}
+
+
+def read_alert_state(store) -> pd.DataFrame:
+    """Reads the alert state, which is empty if no alert has fired yet."""
+
+    df = store.read(ALERT_STATE)
+    if len(df) == 0:
+        df = pd.DataFrame(columns=STATE_COLUMNS)
+
+    return df[STATE_COLUMNS].astype(STATE_DTYPES)
+
+
+def write_alert_state(store, state: pd.DataFrame):
+    """Replaces the alert state."""
+
+    store.write(ALERT_STATE, state[STATE_COLUMNS].astype(STATE_DTYPES))
+
+
+def filter_alerts(hits: pd.DataFrame, rules: list, state: pd.DataFrame, now=None):
+    """
+    Splits the (rule, symbol, price) hits against the state. Returns the hits
+    to send, with a "status" of "new" or "changed", and the state to save
+    once they are sent.
+    """
+
+    now = pd.Timestamp(now or pd.Timestamp.now(tz="UTC")).value
+    names = [r.name for r in rules]
+    cooldown = np.array([pd.Timedelta(hours=r.cooldown_hours).value for r in rules])
+    hysteresis = np.array([r.hysteresis for r in rules])
+
+    # Look up each hit's (symbol, rule) pair in the state by a single string key
+    rule_codes = pd.Categorical(hits["rule"].astype(str), categories=names).codes
+    hit_keys = _keys(hits["symbol"], hits["rule"].astype(str))
+    state_keys = _keys(state["symbol"], state["rule"])
+    found = pd.Index(state_keys).get_indexer(hit_keys)
+
+    fired = found >= 0
+    last = np.where(fired, found, len(state))  # Unfired pairs read the defaults
+    active = np.append(state["active"].values.astype(bool), False)[last]
+    last_price = np.append(state["price"].values.astype(float), np.nan)[last]
+    last_fired = np.append(state["fired_at"].values.astype("int64"), now)[last]
+
+    price = hits["price"].values.astype(float)
+    is_new = ~fired | (~active & (now - last_fired >= cooldown[rule_codes]))
+    is_changed = active & (np.abs(price / last_price - 1) > hysteresis[rule_codes])
+    send = is_new | is_changed
+
+    to_send = hits[send].reset_index(drop=True)
+    to_send["status"] = np.where(is_new[send], "new", "changed")
+
+    # Pairs which hit keep their last alert unless it is re-sent now, pairs
+    # which did not hit clear, and cleared pairs past their cooldown are dropped.
+    hit_state = pd.DataFrame(
+        {
+            "symbol": hits["symbol"].values,
+            "rule": hits["rule"].astype(str).values,
+            "price": np.where(send, price, last_price),
+            "fired_at": np.where(send, now, last_fired),
+            "active": True,
+        }
+    )
+
+    was_hit = np.zeros(len(state), dtype=bool)
+    was_hit[found[fired]] = True
+    state_cooldown = pd.Series(cooldown, index=names).reindex(state["rule"]).values
+    keep = ~was_hit & (now - state["fired_at"].values < state_cooldown)
+    cleared = state[keep].assign(active=False)
+
+    new_state = pd.concat([hit_state, cleared], ignore_index=True)
+
+    return to_send, new_state.astype(STATE_DTYPES)[STATE_COLUMNS]
+
+
+def _keys(symbols: pd.Series, rules: pd.Series) -> np.ndarray:
+    """Returns a "symbol/rule" key for each (symbol, rule) pair"""
+
+    return (symbols.astype(str) + "/" + rules.astype(str)).values
@@ -0,0 +1,57 @@
+"""Benchmarks for tuning the messenger's Yahoo fetch paths"""
+
+import json
+from time import perf_counter
+
+import pandas as pd
+
+from .yahoo import (
+    BATCH_SIZE,
+    QUOTE_BATCH_SIZE,
+    _fetch_financial_data,
+    fetch_in_batches,
+    fetch_quotes,
+    parse_financial_data,
+    parse_quotes,
+)
+
+MODES = {
+    "financial_data": (_fetch_financial_data, parse_financial_data, BATCH_SIZE),
+    "quotes": (fetch_quotes, parse_quotes, QUOTE_BATCH_SIZE),
+}
+
+
+def benchmark_quote_modes(tickers: list) -> pd.DataFrame:
+    """
+    Compares the financialData and batched quote paths of "get_stock_prices"
+    on latency and payload bytes (the JSON size of the parsed responses).
+    This calls Yahoo for every ticker once per mode.
+    """
+
+    results = []
+    for mode, (fetch, parse, batch_size) in MODES.items():
+        start = perf_counter()
+        data = fetch_in_batches(tickers, fetch, batch_size)
+        fetch_time = perf_counter() - start
+
+        start = perf_counter()
+        prices = parse(data)
+        parse_time = perf_counter() - start
+
+        results.append(
+            {
+                "mode": mode,
+                "requests": (
+                    -(-len(tickers) // batch_size) if mode == "quotes" else len(tickers)
+                ),
+                "bytes": len(json.dumps(data, default=str).encode()),
+                "fetch_seconds": fetch_time,
+                "parse_seconds": parse_time,
+                "prices": int(prices["currentPrice"].notna().sum()),
+            }
+        )
+
+    results = pd.DataFrame(results)
+    print(results.to_string(index=False))
+
+    return results
@@ -1,26 +1,35 @@
 """Utilities to create a daily discord report"""
+from datetime import datetime
 import pytz
 import math
 
 import pandas as pd
 import numpy as np
 
-from discord_webhook import DiscordWebhook, DiscordEmbed
+from discord_webhook import DiscordEmbed
 
 # pylint: disable=import-error
-import matplotlib.pyplot as plt
 import matplotlib.ticker as mtick
-
-from .metrics import get_price_change
-from .utils import (
-    get_last_two_dates,
-    get_yesterday_close,
+from matplotlib.figure import Figure
+
+from .delivery import DiscordQueue
+from .metrics import build_close_matrix, get_horizon_change, get_top_n
+from .render import (
+    day_labels,
+    get_figure,
+    hour_labels,
+    render_in_background,
+    render_png,
 )
+from .render_cache import cached_render, chart_key
+from .utils import get_symbol_prices, get_yesterday_close
+
+CHART_FILENAME = "daily_report.png"
 
 
 def create_discord_report(webhook: str, prices: pd.DataFrame):
     """Create a Discord report"""
-    webhook = DiscordWebhook(url=webhook)
+    queue = DiscordQueue(webhook)
 
     embed = DiscordEmbed(
         title="Daily Report",
@@ -32,41 +41,37 @@ def create_discord_report(webhook: str, prices: pd.DataFrame):
     # filter by shares with value above $0.5
     prices = prices[prices["price"] > 0.5]
 
-    daily_price_changes = get_price_change(prices, *get_last_two_dates(prices))
+    closes = build_close_matrix(prices)
+    daily_price_changes = get_horizon_change(closes, 1)
+    top_gainers = get_top_n(daily_price_changes, 10)
+    top_losers = get_top_n(daily_price_changes, 10, largest=False)
 
-    daily_price_changes = daily_price_changes.sort_values("pct_change", ascending=False)
+    # The chart renders in the background while the embed text is assembled
+    winner, loser = top_gainers["symbol"].iloc[0], top_losers["symbol"].iloc[0]
+    chart = render_in_background(get_chart, prices, winner, loser)
 
     embed.add_embed_field(
         name=":crown: Top Gainers",
-        value=make_gainer_string(daily_price_changes.head(10)),
+        value=make_gainer_string(top_gainers),
         inline=False,
     )
     embed.add_embed_field(
         name=":thumbsdown: Top Losers",
-        value=make_gainer_string(daily_price_changes.tail(10).iloc[::-1]),
+        value=make_gainer_string(top_losers),
         inline=False,
     )
-
-    # Create the chart
-    winner, loser = (
-        daily_price_changes["symbol"].iloc[0],
-        daily_price_changes["symbol"].iloc[-1],
+    embed.add_embed_field(
+        name=":calendar: Top Gainers This Week",
+        value=make_gainer_string(get_top_n(get_horizon_change(closes, "wtd"), 5)),
+        inline=False,
     )
 
-    figure = make_chart(prices, winner, loser)
-
-    with open("/tmp/" + figure, "rb") as f:
-        webhook.add_file(file=f.read(), filename=figure)
-
-    embed.set_image(url="attachment://" + figure)
+    embed.set_image(url="attachment://" + CHART_FILENAME)
 
     # Execute
-    webhook.add_embed(embed)
-    result = webhook.execute()
-    if result.status_code == 200:
-        print("Discord report created and sent successfully!")
-    else:
-        raise Exception("Report failed to send to Discord")
+    queue.add(embed, files={CHART_FILENAME: chart.result()})
+    queue.flush()
+    print("Discord report created and sent successfully!")
 
     return
 
@@ -89,85 +94,68 @@ def make_gainer_string(df: pd.DataFrame):
     )
 
 
-def make_chart(prices: pd.DataFrame, winner: str, loser: str) -> str:
-    """Create a chart of the top gainer and loser"""
+def get_chart(prices: pd.DataFrame, winner: str, loser: str) -> bytes:
+    """Returns the chart of the top gainer and loser, from the render cache if unchanged"""
 
-    top_gainer = prices[prices["symbol"] == winner]
-    top_gainer = top_gainer.set_index("timestamp").sort_index()
-    top_gainer_open = get_yesterday_close(prices, winner)
-    top_loser = prices[prices["symbol"] == loser]
-    top_loser = top_loser.set_index("timestamp").sort_index()
-    top_loser_open = get_yesterday_close(prices, loser)
+    window = prices[prices["symbol"].isin([winner, loser])]
+    window = window[["symbol", "timestamp", "price"]].sort_values(
+        ["symbol", "timestamp"]
+    )
+    # The chart's open lines are yesterday's closes, so the date is part of the key
+    key = chart_key("daily_report", window, winner, loser, datetime.today().date())
 
-    fig = plt.figure(figsize=(10, 8))
-    plt.subplots_adjust(wspace=0.05, hspace=0.25)
-    ax1 = fig.add_subplot(211)
-    ax2 = fig.add_subplot(212)
+    return cached_render(key, lambda: make_chart(prices, winner, loser))
 
-    ax1.plot(
-        range(len(top_gainer)),
-        top_gainer["price"],
-        c="g",
-        label="Top Gainer: " + winner,
-    )
-    ax1.axhline(top_gainer_open, color="gray", linestyle="--")
-    ax1.fill_between(
-        range(len(top_gainer)),
-        top_gainer["price"],
-        top_gainer_open,
-        where=top_gainer["price"] >= top_gainer_open,
-        color="g",
-        alpha=0.5,
-    )
-    ax1.fill_between(
-        range(len(top_gainer)),
-        top_gainer["price"],
-        top_gainer_open,
-        where=top_gainer["price"] <= top_gainer_open,
-        color="r",
-        alpha=0.5,
-    )
 
-    ax2.plot(
-        range(len(top_loser)), top_loser["price"], c="r", label="Top Loser: " + loser
-    )
-    ax2.axhline(top_loser_open, color="gray", linestyle="--")
-    ax2.fill_between(
-        range(len(top_loser)),
-        top_loser["price"],
-        top_loser_open,
-        where=top_loser["price"] >= top_loser_open,
-        color="g",
-        alpha=0.5,
-    )
-    ax2.fill_between(
-        range(len(top_loser)),
-        top_loser["price"],
-        top_loser_open,
-        where=top_loser["price"] <= top_loser_open,
-        color="r",
-        alpha=0.5,
-    )
+def make_chart(prices: pd.DataFrame, winner: str, loser: str) -> bytes:
+    """Render a chart of the top gainer and loser to PNG bytes"""
+
+    fig = get_figure("daily_report", build_chart_template)
+    ax1, ax2 = fig.axes
+
+    for ax, symbol, color, label in [
+        (ax1, winner, "g", "Top Gainer: "),
+        (ax2, loser, "r", "Top Loser: "),
+    ]:
+        data = get_symbol_prices(prices, symbol)
+        plot_prices(
+            ax, data, get_yesterday_close(prices, symbol), color, label + symbol
+        )
+
+        # Figure formatting
+        format_time_axis(ax, data)
+        ax.yaxis.set_major_formatter(mtick.StrMethodFormatter("${x:,.2f}"))
+        ax.legend(fontsize=15, loc=2)
+        ax.tick_params(labelsize=15)
 
-    # Figure formatting
+    return render_png(fig)
 
-    ax1 = format_time_axis(ax1, top_gainer)
-    ax2 = format_time_axis(ax2, top_loser)
 
-    tick = mtick.StrMethodFormatter("${x:,.2f}")
-    ax1.yaxis.set_major_formatter(tick)
-    ax2.yaxis.set_major_formatter(tick)
+def build_chart_template() -> Figure:
+    """Build the figure the daily report chart is drawn on"""
 
-    ax2.legend(fontsize=15, loc=2)
-    ax1.legend(fontsize=15, loc=2)
+    fig = Figure(figsize=(10, 8))
+    fig.subplots_adjust(wspace=0.05, hspace=0.25)
+    fig.add_subplot(211)
+    fig.add_subplot(212)
 
-    ax1.tick_params(labelsize=15)
-    ax2.tick_params(labelsize=15)
+    return fig
 
-    filename = "test_image.png"
-    plt.savefig("/tmp/" + filename)
 
-    return filename
+def plot_prices(ax, data: pd.DataFrame, open_price: float, color: str, label: str):
+    """Plot a symbol's prices, shaded green above and red below the open"""
+
+    x = np.arange(len(data))
+    price = data["price"].values
+
+    ax.plot(x, price, c=color, label=label)
+    ax.axhline(open_price, color="gray", linestyle="--")
+    ax.fill_between(
+        x, price, open_price, where=price >= open_price, color="g", alpha=0.5
+    )
+    ax.fill_between(
+        x, price, open_price, where=price <= open_price, color="r", alpha=0.5
+    )
 
 
 def format_time_axis(ax, data):
@@ -175,22 +163,14 @@ def format_time_axis(ax, data):
     timezone = pytz.timezone("Australia/Perth")
 
     ticks_date = data.index.indexer_at_time("00:00")
-    ticks_time = np.arange(data.index.size)[data.index.minute == 0]
+    ticks_time = np.flatnonzero(data.index.minute == 0)
     ax.set_xticks(ticks_date)
     ax.set_xticks(ticks_time, minor=True)
 
-    data.index = data.index.tz_convert(timezone)
-
-    labels_date = [
-        maj_tick.strftime("\n%d-%b").replace("\n0", "\n")
-        for maj_tick in data.index[ticks_date]
-    ]
-    labels_time = [
-        min_tick.strftime("%I").lstrip("0").lower()
-        for min_tick in data.index[ticks_time]
-    ]
-    ax.set_xticklabels(labels_date)
-    ax.set_xticklabels(labels_time, minor=True)
+    local = data.index.tz_convert(timezone)
+
+    ax.set_xticklabels(day_labels(local[ticks_date]))
+    ax.set_xticklabels(hour_labels(local[ticks_time]), minor=True)
     ax.figure.autofmt_xdate(rotation=0, ha="center", which="both")
 
     ax.set_xlim(0, len(data))
@@ -0,0 +1,240 @@
+"""Rate-limit-aware delivery of Discord webhook messages
+
+Embeds added to a DiscordQueue are split to fit Discord's per-embed limits
+and packed into as few messages as the per-message limits allow:
+    per message: 10 embeds, 10 files and 6,000 characters across its embeds
+    per embed:   25 fields, 1,024 characters per field value
+The messages are posted in order by an async sender. A 429 is retried after
+its "retry_after" (5xx responses back off exponentially), and the sender
+pauses when the webhook's rate-limit bucket is exhausted. The webhook is a
+plain URL, so a local HTTP server can stand in for Discord.
+"""
+
+import asyncio
+import json
+import os
+from time import monotonic
+
+import requests
+
+MAX_EMBEDS = 10
+MAX_FILES = 10
+MAX_CHARS = 6000
+MAX_FIELDS = 25
+MAX_FIELD_NAME = 256
+MAX_FIELD_VALUE = 1024
+MAX_TITLE = 256
+MAX_DESCRIPTION = 4096
+
+MAX_RETRIES = int(os.environ.get("DISCORD_MAX_RETRIES", 5))
+
+# Reused across warm invocations, so the TLS connection to Discord is kept alive
+SESSION = requests.Session()
+
+
+class DiscordQueue:
+    """Queue of embeds for one webhook, sent in as few messages as the limits allow"""
+
+    def __init__(self, webhook: str, timeout: float = 30):
+        self.webhook = webhook
+        self.timeout = timeout
+        self.queue = []
+        self.stats = {"embeds": 0, "messages": 0, "requests": 0, "retries": 0}
+        self.max_depth = 0
+        self.latencies = []
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, embed, files: dict = None):
+        """Queues an embed (a DiscordEmbed or dict) and its {filename: bytes} files"""
+
+        parts = split_embed(to_dict(embed))
+        self.queue.append((parts[0], files or {}))
+        self.queue.extend((part, {}) for part in parts[1:])
+
+        self.stats["embeds"] += len(parts)
+        self.max_depth = max(self.max_depth, len(self.queue))
+
+    def flush(self):
+        """Sends every queued embed, blocking until they are delivered"""
+
+        asyncio.run(self.send())
+
+    async def send(self):
+        """Sends every queued embed, in order, packed into messages"""
+
+        while self.queue:
+            embeds, files = self._pack()
+
+            start = monotonic()
+            await self._post(embeds, files)
+            self.latencies.append(monotonic() - start)
+            self.stats["messages"] += 1
+
+        print(f"Discord delivery: {self.metrics()}")
+
+    def metrics(self) -> dict:
+        """Returns the queue depth, request counts and send latency"""
+
+        latencies = self.latencies or [0]
+        return {
+            **self.stats,
+            "depth": len(self.queue),
+            "max_depth": self.max_depth,
+            "mean_latency": round(sum(latencies) / len(latencies), 3),
+            "max_latency": round(max(latencies), 3),
+        }
+
+    def _pack(self) -> tuple:
+        """Takes the longest run of queued embeds which fits in one message"""
+
+        embeds, files, chars = [], {}, 0
+        while self.queue:
+            embed, embed_files = self.queue[0]
+            fits = (
+                len(embeds) < MAX_EMBEDS
+                and chars + embed_chars(embed) <= MAX_CHARS
+                and len(files) + len(embed_files) <= MAX_FILES
+            )
+            if embeds and not fits:
+                break
+
+            self.queue.pop(0)
+            embeds.append(embed)
+            files.update(embed_files)
+            chars += embed_chars(embed)
+
+        return embeds, files
+
+    async def _post(self, embeds: list, files: dict):
+        """Posts one message, retrying when rate limited or on a server error"""
+
+        payload = json.dumps({"embeds": embeds})
+        for attempt in range(MAX_RETRIES + 1):
+            if files:
+                parts = {
+                    f"files[{i}]": (name, data)
+                    for i, (name, data) in enumerate(files.items())
+                }
+                kwargs = {"files": {**parts, "payload_json": (None, payload)}}
+            else:
+                kwargs = {
+                    "data": payload,
+                    "headers": {"Content-Type": "application/json"},
+                }
+
+            self.stats["requests"] += 1
+            response = await asyncio.to_thread(
+                SESSION.post, self.webhook, timeout=self.timeout, **kwargs
+            )
+
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == MAX_RETRIES:
+                    break
+                wait = get_retry_after(response, attempt)
+                print(f"Discord returned {response.status_code}, retrying in {wait}s")
+                self.stats["retries"] += 1
+                await asyncio.sleep(wait)
+                continue
+
+            if not response.ok:
+                raise Exception(
+                    f"Discord message failed to send: {response.status_code} "
+                    f"{response.text}"
+                )
+
+            # The bucket is exhausted: wait for it to reset before the next message
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                await asyncio.sleep(
+                    float(response.headers.get("X-RateLimit-Reset-After", 0))
+                )
+            return response
+
+        raise Exception(
+            f"Discord message failed to send after {MAX_RETRIES} retries: "
+            f"{response.status_code}"
+        )
+
+
+def get_retry_after(response, attempt: int) -> float:
+    """Returns the seconds to wait before retrying a rate limited or failed request"""
+
+    try:
+        return float(response.json()["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+
+    if "Retry-After" in response.headers:
+        return float(response.headers["Retry-After"])
+
+    return float(2**attempt)
+
+
+def to_dict(embed) -> dict:
+    """Returns an embed (DiscordEmbed or dict) as a dict without empty keys"""
+
+    embed = embed if isinstance(embed, dict) else vars(embed)
+    return {k: v for k, v in embed.items() if v is not None}
+
+
+def embed_chars(embed: dict) -> int:
+    """Returns the characters of an embed counted towards Discord's 6,000 limit"""
+
+    return (
+        len(embed.get("title") or "")
+        + len(embed.get("description") or "")
+        + len((embed.get("footer") or {}).get("text") or "")
+        + len((embed.get("author") or {}).get("name") or "")
+        + sum(len(f["name"]) + len(f["value"]) for f in embed.get("fields", []))
+    )
+
+
+def split_embed(embed: dict) -> list:
+    """
+    Splits an embed into embeds within the per-embed limits. Long field
+    values are split on lines into fields of the same name, and fields past
+    the 25-field or 6,000-character limits continue in embeds with the same
+    title. Titles, descriptions and single lines which are too long are cut.
+    """
+
+    base = {k: v for k, v in embed.items() if k != "fields"}
+    if "title" in base:
+        base["title"] = base["title"][:MAX_TITLE]
+    if "description" in base:
+        base["description"] = base["description"][:MAX_DESCRIPTION]
+
+    fields = [
+        {**field, "name": field["name"][:MAX_FIELD_NAME], "value": value}
+        for field in embed.get("fields", [])
+        for value in split_value(str(field["value"]))
+    ]
+    continuation = {k: base[k] for k in ["title", "color", "timestamp"] if k in base}
+
+    parts = [{**base, "fields": []}]
+    chars = embed_chars(base)
+    for field in fields:
+        field_chars = len(field["name"]) + len(field["value"])
+        if len(parts[-1]["fields"]) == MAX_FIELDS or chars + field_chars > MAX_CHARS:
+            parts.append({**continuation, "fields": []})
+            chars = embed_chars(continuation)
+
+        parts[-1]["fields"].append(field)
+        chars += field_chars
+
+    return parts
+
+
+def split_value(value: str) -> list:
+    """Splits a field value on lines into values of at most 1,024 characters"""
+
+    values, lines = [], []
+    for line in value.split("\n"):
+        line = line[:MAX_FIELD_VALUE]
+        if lines and len("\n".join(lines + [line])) > MAX_FIELD_VALUE:
+            values.append("\n".join(lines))
+            lines = []
+        lines.append(line)
+    values.append("\n".join(lines))
+
+    return values
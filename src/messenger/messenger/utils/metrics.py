@@ -1,8 +1,94 @@
 """Compute standard metrics based on price data"""
+
 from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
 import pandas as pd
 
-from .utils import get_daily_close_price
+from .utils import get_dates, to_epoch
+
+
+class CloseMatrix(NamedTuple):
+    """Dense daily close prices, one row per symbol and one column per trading date"""
+
+    symbols: pd.Index
+    dates: pd.Index
+    close: np.ndarray
+
+
+def build_close_matrix(df: pd.DataFrame) -> CloseMatrix:
+    """
+    Builds the symbol x date close-price matrix in a single pass over the
+    prices, without sorting them. The close of a (symbol, date) cell is the
+    price with the latest timestamp. Cells without a price are NaN.
+    """
+
+    symbol_codes, symbols = pd.factorize(np.asarray(df["symbol"]), sort=True)
+    date_codes, dates = pd.factorize(get_dates(df), sort=True)
+
+    cells = symbol_codes * len(dates) + date_codes
+    timestamps = to_epoch(df["timestamp"])
+
+    latest = np.full(len(symbols) * len(dates), np.iinfo("int64").min)
+    np.maximum.at(latest, cells, timestamps)
+
+    is_close = timestamps == latest[cells]
+    close = np.full(len(symbols) * len(dates), np.nan)
+    close[cells[is_close]] = df["price"].values[is_close].astype(float)
+
+    return CloseMatrix(
+        pd.Index(symbols), pd.Index(dates), close.reshape(len(symbols), len(dates))
+    )
+
+
+def get_horizon_start(matrix: CloseMatrix, horizon) -> int:
+    """
+    Returns the column of the close a horizon is measured from: "horizon"
+    trading dates before the last one, or the last close before the current
+    week for horizon="wtd". Horizons longer than the matrix start at its first date.
+    """
+
+    last = len(matrix.dates) - 1
+
+    if horizon == "wtd":
+        week_start = matrix.dates[last] - pd.Timedelta(
+            days=matrix.dates[last].weekday()
+        )
+        return max(int(matrix.dates.searchsorted(week_start)) - 1, 0)
+
+    return max(last - int(horizon), 0)
+
+
+def get_horizon_change(matrix: CloseMatrix, horizon=1) -> pd.DataFrame:
+    """Get the price change of every symbol over a horizon, ending at the last date"""
+
+    start_price = matrix.close[:, get_horizon_start(matrix, horizon)]
+    end_price = matrix.close[:, -1]
+
+    df = pd.DataFrame(
+        {
+            "symbol": matrix.symbols,
+            "price_start": start_price,
+            "price_end": end_price,
+            "abs_change": end_price - start_price,
+            "pct_change": (end_price - start_price) / start_price,
+        }
+    )
+
+    return df.dropna().reset_index(drop=True)
+
+
+def get_top_n(df: pd.DataFrame, n: int, column="pct_change", largest=True):
+    """Get the "n" largest (or smallest) rows by "column", in order, via partial selection"""
+
+    values = df[column].values if largest else -df[column].values
+    if len(values) > n:
+        top = np.argpartition(-values, n)[:n]
+    else:
+        top = np.arange(len(values))
+
+    return df.iloc[top[np.argsort(-values[top], kind="stable")]]
 
 
 def get_price_change(
@@ -10,12 +96,15 @@ def get_price_change(
 ) -> pd.DataFrame:
     """Get the price change between two dates"""
 
-    start_price = get_daily_close_price(df, start_date)
-    end_price = get_daily_close_price(df, end_date)
+    matrix = build_close_matrix(df)
+    start_price = matrix.close[:, matrix.dates.get_loc(pd.Timestamp(start_date))]
+    end_price = matrix.close[:, matrix.dates.get_loc(pd.Timestamp(end_date))]
 
-    df = pd.merge(start_price, end_price, on="symbol", suffixes=("_start", "_end"))
+    df = pd.DataFrame(
+        {"symbol": matrix.symbols, "price_start": start_price, "price_end": end_price}
+    ).dropna()
 
     df["abs_change"] = df["price_end"] - df["price_start"]
     df["pct_change"] = df["abs_change"] / df["price_start"]
 
-    return df
+    return df.reset_index(drop=True)
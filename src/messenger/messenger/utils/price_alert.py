@@ -2,94 +2,118 @@
 
 import pandas as pd
 
-from discord_webhook import DiscordWebhook, DiscordEmbed
+from discord_webhook import DiscordEmbed
+
+from .alert_state import filter_alerts, read_alert_state, write_alert_state
+from .delivery import DiscordQueue
+from .rules import compile_rules, evaluate_rules, load_rules, rule_columns
 
 
 def create_price_alert(
-    webhook: str, historical_prices: pd.DataFrame, current_prices: pd.DataFrame
+    webhook: str,
+    store,
+    historical_prices: pd.DataFrame,
+    current_prices: pd.DataFrame,
+    companies: pd.DataFrame,
 ):
     """Create a Discord buy alert"""
 
     prices = get_price_stats_for_symbol(historical_prices)
 
-    prices = prices.merge(get_listed_companies(), how="left", on="symbol")
+    prices = prices.merge(companies, how="left", on="symbol")
     prices = prices.merge(current_prices, how="left", on="symbol")
 
-    print("Filtering for stocks to buy or sell...")
+    print("Evaluating the alert rules...")
 
-    buys = prices[
-        (prices["currentPrice"] > 1)
-        & (prices["currentPrice"] < prices["mean_price"] * 0.95)
-        & (prices["currentPrice"] < prices["min_price"])
-    ]
+    rules = compile_rules(load_rules())
+    columns = rule_columns(prices)
+    columns["price"] = columns.pop("currentPrice")
+    hits = evaluate_rules(rules, prices["symbol"].values, columns)
 
-    sales = prices[
-        (prices["currentPrice"] > 1)
-        & (prices["currentPrice"] > prices["mean_price"] * 1.05)
-        & (prices["currentPrice"] > prices["max_price"])
-    ]
+    # Only alerts which are new, or whose price moved, since the last check are sent
+    hits, state = filter_alerts(hits, rules, read_alert_state(store))
 
-    webhook = DiscordWebhook(url=webhook)
     embed = DiscordEmbed(
         title="Buy Alert",
         description="These stocks are 5% off their 5 day average:",
         color="03b2f8",
     )
 
-    print(f"Found {len(buys)} stocks to buy and {len(sales)} to sell")
-
-    if len(buys) > 0:
-
-        for s in list_stocks_in_embed_field(buys):
-            embed.add_embed_field(
-                name=":arrow_up: Buy:", value=s, inline=False,
-            )
-
-    if len(sales) > 0:
+    print(
+        f"Found {len(hits)} new or changed alerts: {hits['rule'].value_counts().to_dict()}"
+    )
 
-        for s in list_stocks_in_embed_field(sales):
-            embed.add_embed_field(
-                name=":arrow_down: Sell:", value=s, inline=False,
-            )
+    for rule in rules:
+        for status, title in [
+            ("new", rule.title),
+            ("changed", f"{rule.title} (moved)"),
+        ]:
+            rule_hits = hits[(hits["rule"] == rule.name) & (hits["status"] == status)]
+            if len(rule_hits) > 0:
+                for s in list_stocks_in_embed_field(rule_hits):
+                    embed.add_embed_field(name=title, value=s, inline=False)
     embed.set_timestamp()
 
     # Execute
-    webhook.add_embed(embed)
-    if len(buys) > 0 or len(sales) > 0:
-        result = webhook.execute()
-        if result.status_code == 200:
-            print("Price alert sent to Discord")
-        else:
-            raise Exception(f"Price alert failed to send to Discord: {result.json()}")
+    if len(hits) > 0:
+        queue = DiscordQueue(webhook)
+        queue.add(embed)
+        queue.flush()
+        print("Price alert sent to Discord")
+
+    write_alert_state(store, state)
 
     return
 
 
+def create_watch_alert(queue: DiscordQueue, names: dict, alert: dict):
+    """Queue a Discord alert for a single stock flagged by the price watcher"""
+
+    name = names.get(alert["symbol"], alert["symbol"])
+    arrow = ":arrow_up: Buy" if alert["signal"] == "buy" else ":arrow_down: Sell"
+
+    embed = DiscordEmbed(
+        title=f"{arrow}: {name.title()} (**{alert['symbol']}**)",
+        description=(
+            f"Price ${alert['price']:.3f} against a mean of ${alert['mean_price']:.3f} "
+            f"(range ${alert['min_price']:.3f} - ${alert['max_price']:.3f})"
+        ),
+        color="03b2f8",
+    )
+    embed.set_timestamp()
+
+    queue.add(embed)
+
+
 def get_price_stats_for_symbol(df: pd.DataFrame) -> pd.DataFrame:
     """Get the price stats for each symbol"""
 
     df = (
-        df.sort_values(by="timestamp")[["symbol", "price"]]
-        .groupby("symbol")
+        df[["symbol", "price"] + (["volume"] if "volume" in df else [])]
+        .groupby("symbol", observed=True)
         .agg(
             min_price=("price", "min"),
             max_price=("price", "max"),
             mean_price=("price", "mean"),
+            **({"mean_volume": ("volume", "mean")} if "volume" in df else {}),
         )
     )
 
-    numeric_columns = ["min_price", "max_price", "mean_price"]
+    numeric_columns = list(df.columns)
     df[numeric_columns] = df[numeric_columns].astype(float)
 
-    return df.reset_index()
+    df = df.reset_index()
+    df["symbol"] = df["symbol"].astype(str)
+
+    return df
 
 
-def get_listed_companies():
-    """Get the list of listed companies"""
+def get_listed_companies(project_id: str, table: str) -> pd.DataFrame:
+    """Get the list of listed companies, with the columns alert rules can filter on"""
 
     return pd.read_gbq(
-        query="SELECT * FROM `stocks.listed_companies`",
-        project_id="comple-389703",
+        query=f"SELECT symbol, name, GIC, market_cap FROM `{table}`",
+        project_id=project_id,
         dialect="standard",
         use_bqstorage_api=True,
     )
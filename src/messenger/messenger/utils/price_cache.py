@@ -0,0 +1,117 @@
+"""Incremental on-disk cache of the recent prices read from BigQuery
+
+The cache holds the last "n_days" of prices as a Parquet file. Each read only
+queries the rows newer than the cached maximum timestamp (less a small
+overlap, so restated recent rows are picked up), evicts the rows which fell
+out of the window and writes the cache back. A missing or unreadable cache,
+or a change in the table's columns, falls back to a full reload.
+"""
+
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from .utils import compact_prices
+
+CACHE_DIR = os.environ.get("PRICE_CACHE_DIR", "/tmp/price_cache")
+OVERLAP = pd.Timedelta(minutes=int(os.environ.get("PRICE_CACHE_OVERLAP_MINUTES", 60)))
+
+
+def import_prices_with_cache(
+    project_id: str,
+    table: str,
+    n_days: int = 7,
+    cache_dir: str = CACHE_DIR,
+    now: datetime = None,
+) -> pd.DataFrame:
+    """
+    Import the last "n_days" of prices, only querying BigQuery for new rows.
+    The prices are returned in the compact layout of "compact_prices".
+    """
+
+    now = pd.Timestamp(now or datetime.utcnow()).tz_localize("UTC")
+    window_start = now - pd.Timedelta(days=n_days)
+    path = os.path.join(cache_dir, f"{table.replace('.', '__')}.parquet")
+
+    cached = read_cache(path)
+    if cached is None:
+        print(f"Price cache miss for {table}, loading {n_days} days")
+        since = window_start
+    else:
+        latest = pd.Timestamp(cached["timestamp"].max(), tz="UTC")
+        since = max(latest - OVERLAP, window_start)
+        print(f"Price cache hit for {table}, loading rows since {since}")
+
+    fresh = query_prices_since(project_id, table, since)
+    fetched_memory = fresh.memory_usage(deep=True).sum()
+    fresh = compact_prices(fresh)
+
+    if cached is not None and len(fresh) > 0 and _schema(fresh) != _schema(cached):
+        print(f"Schema of {table} changed, reloading the price cache")
+        cached, since = None, window_start
+        fresh = query_prices_since(project_id, table, since)
+        fetched_memory = fresh.memory_usage(deep=True).sum()
+        fresh = compact_prices(fresh)
+
+    # The in-memory size of the frame, not the bytes BigQuery scanned or billed
+    print(
+        f"Fetched {len(fresh)} rows from {table} "
+        f"({fetched_memory} bytes in memory before compaction)"
+    )
+
+    if cached is not None:
+        fresh = pd.concat([cached[cached["timestamp"] < since.value], fresh])
+        fresh["symbol"] = fresh["symbol"].astype("category")
+    df = fresh[fresh["timestamp"] >= window_start.value].reset_index(drop=True)
+
+    write_cache(path, df)
+    print(
+        f"Price cache for {table} holds {len(df)} rows "
+        f"({df.memory_usage(deep=True).sum()} bytes in memory)"
+    )
+
+    return df
+
+
+def query_prices_since(project_id: str, table: str, since) -> pd.DataFrame:
+    """Import the prices with a timestamp at or after "since" from BigQuery"""
+
+    query = f"""
+        SELECT *
+        FROM `{table}`
+        WHERE timestamp >= TIMESTAMP("{since}")
+        AND symbol != "$AUD"
+    """
+
+    return pd.read_gbq(
+        query=query, project_id=project_id, dialect="standard", use_bqstorage_api=True
+    )
+
+
+def read_cache(path: str):
+    """Reads the cached prices, or returns None if there is no usable cache"""
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"Price cache at {path} is unreadable, ignoring it: {e}")
+        return None
+
+
+def write_cache(path: str, df: pd.DataFrame):
+    """Writes the cached prices atomically, so a crash never leaves a partial file"""
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = f"{path}.tmp"
+    df.to_parquet(staging, index=False, compression="zstd")
+    os.replace(staging, path)
+
+
+def _schema(df: pd.DataFrame) -> list:
+    """Returns the column names and dtype kinds of a frame"""
+
+    return [(c, t.kind) for c, t in df.dtypes.items()]
@@ -0,0 +1,114 @@
+"""Chart rendering to in-memory PNGs
+
+Charts are drawn on prebuilt figure templates with the Agg canvas, without
+pyplot's global state. A template is built on first use and its axes are
+cleared for each later render, and the PNG is written straight to a bytes
+buffer. Renders can run on a single background worker while the rest of a
+report is assembled. Templates are not thread-safe, so each one should be
+rendered either always on the worker or always in the caller.
+"""
+
+import io
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+RENDER_DPI = int(os.environ.get("RENDER_DPI", 100))
+# zlib level 0 (none, fastest) to 9 (smallest)
+PNG_COMPRESSION = int(os.environ.get("PNG_COMPRESSION", 6))
+
+MONTHS = np.array(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun"]
+    + ["Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+)
+
+_TEMPLATES = {}
+_WORKER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+
+
+def get_figure(name: str, build) -> Figure:
+    """Returns the figure template "name", built by "build()" on first use"""
+
+    fig = _TEMPLATES.get(name)
+    if fig is None:
+        fig = _TEMPLATES[name] = build()
+        FigureCanvasAgg(fig)
+    else:
+        for ax in fig.axes:
+            ax.clear()
+
+    return fig
+
+
+def render_png(
+    fig: Figure, dpi: int = None, compression: int = None, **kwargs
+) -> bytes:
+    """Renders a figure to PNG bytes"""
+
+    buffer = io.BytesIO()
+    fig.savefig(
+        buffer,
+        format="png",
+        dpi=dpi or RENDER_DPI,
+        pil_kwargs={
+            "compress_level": PNG_COMPRESSION if compression is None else compression
+        },
+        **kwargs,
+    )
+
+    return buffer.getvalue()
+
+
+def render_in_background(render, *args, **kwargs) -> Future:
+    """Runs "render(*args, **kwargs)" on the render worker"""
+
+    return _WORKER.submit(render, *args, **kwargs)
+
+
+def day_labels(index) -> np.ndarray:
+    """Returns a "\\n<day>-<Mon>" label for each timestamp of a DatetimeIndex"""
+
+    days = np.char.add("\n", index.day.values.astype(str))
+    return np.char.add(np.char.add(days, "-"), MONTHS[index.month.values - 1])
+
+
+def hour_labels(index, clock: int = 12) -> np.ndarray:
+    """
+    Returns an hour label for each timestamp of a DatetimeIndex: 1-12 on a
+    12-hour clock, or 1-23 on a 24-hour clock with midnight left blank.
+    """
+
+    hours = index.hour.values
+    if clock == 12:
+        return ((hours - 1) % 12 + 1).astype(str)
+
+    return np.where(hours == 0, "", hours.astype(str))
+
+
+def benchmark_render(render, repeats: int = 5) -> dict:
+    """
+    Times "render()", which returns PNG bytes: the first call, which builds
+    the template, and the mean of the later calls, with the PNG size.
+    """
+
+    start = perf_counter()
+    png = render()
+    first = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(repeats):
+        png = render()
+    repeat = (perf_counter() - start) / repeats
+
+    result = {
+        "first_ms": round(first * 1e3, 1),
+        "repeat_ms": round(repeat * 1e3, 1),
+        "bytes": len(png),
+    }
+    print(f"Render benchmark: {result}")
+
+    return result
@@ -0,0 +1,91 @@
+"""Content-addressed cache of rendered charts
+
+A chart is keyed by the sha256 of its input data and render parameters, so
+a chart whose inputs have not changed is served from the cache instead of
+being rendered again. The cache lives under RENDER_CACHE, a local path or
+a bucket URL (e.g. gs://bucket/render_cache) opened with fsspec. An index
+of last-use times keeps it to the RENDER_CACHE_ENTRIES most recently used
+charts. A cache which cannot be read or written only costs a render.
+"""
+
+import hashlib
+import json
+import os
+from time import time
+
+import fsspec
+import pandas as pd
+
+from .render import PNG_COMPRESSION, RENDER_DPI
+
+RENDER_CACHE = os.environ.get("RENDER_CACHE", "/tmp/render_cache")
+MAX_ENTRIES = int(os.environ.get("RENDER_CACHE_ENTRIES", 32))
+
+
+def chart_key(*parts) -> str:
+    """
+    Returns the sha256 of a chart's inputs: frames are hashed by their
+    columns, dtypes and values, anything else by its repr. The render
+    DPI and PNG compression are always part of the key.
+    """
+
+    digest = hashlib.sha256()
+    for part in [*parts, RENDER_DPI, PNG_COMPRESSION]:
+        if isinstance(part, pd.DataFrame):
+            digest.update(repr(list(part.dtypes.items())).encode())
+            digest.update(pd.util.hash_pandas_object(part, index=False).values)
+        else:
+            digest.update(repr(part).encode())
+
+    return digest.hexdigest()
+
+
+def cached_render(
+    key: str, render, cache: str = RENDER_CACHE, max_entries: int = MAX_ENTRIES
+) -> bytes:
+    """Returns the PNG cached under "key", or renders it with "render()" and caches it"""
+
+    try:
+        fs, root = fsspec.core.url_to_fs(cache)
+        path = f"{root}/{key}.png"
+        png = fs.cat_file(path) if fs.exists(path) else None
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"Render cache at {cache} is unreadable, rendering: {e}")
+        return render()
+
+    if png is not None:
+        print(f"Render cache hit for {key[:12]}")
+    else:
+        print(f"Render cache miss for {key[:12]}, rendering")
+        png = render()
+
+    try:
+        if not fs.exists(path):
+            fs.makedirs(root, exist_ok=True)
+            fs.pipe_file(path, png)
+        _touch(fs, root, key, max_entries)
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"Render cache at {cache} is unwritable: {e}")
+
+    return png
+
+
+def _touch(fs, root: str, key: str, max_entries: int):
+    """Records the use of "key" and evicts the least recently used charts"""
+
+    index_path = f"{root}/index.json"
+    try:
+        index = json.loads(fs.cat_file(index_path))
+    except (FileNotFoundError, ValueError):
+        index = {}
+
+    index[key] = time()
+    evicted = sorted(index, key=index.get)[: max(len(index) - max_entries, 0)]
+    for old in evicted:
+        del index[old]
+        if fs.exists(f"{root}/{old}.png"):
+            fs.rm(f"{root}/{old}.png")
+
+    fs.pipe_file(index_path, json.dumps(index).encode())
+    if evicted:
+        print(f"Render cache evicted {len(evicted)} charts")
@@ -0,0 +1,298 @@
+"""Declarative price alert rules, compiled to NumPy expressions
+
+A rule is a name, the title of its Discord embed field and a boolean
+expression over per-symbol columns, e.g.
+
+    price > 1 and price < mean_price * 0.95 and price < min_price
+
+Expressions may use column names, numbers and strings, arithmetic
+(+ - * / abs), comparisons (one per term, plus "in"/"not in" a list of
+constants) and and/or/not. Each rule is compiled once to a tree of NumPy
+ufuncs, and all rules are evaluated over the whole universe in one pass.
+A comparison with a missing (NaN) value is unknown rather than false, and
+stays unknown under "not" (as in SQL), so a rule fires for a symbol only
+when its expression is known to be true.
+"""
+
+import ast
+import json
+import numbers
+import os
+from functools import reduce
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+RULES_PATH = os.environ.get("ALERT_RULES")
+
+
+class Rule(NamedTuple):
+    """
+    An alert rule: its name, embed field title and boolean expression. A pair
+    which fired re-fires only once its condition cleared and "cooldown_hours"
+    passed, or when its price moved by more than "hysteresis" (see alert_state).
+    """
+
+    name: str
+    title: str
+    when: str
+    cooldown_hours: float = 24
+    hysteresis: float = 0.05
+
+
+class CompiledRule(NamedTuple):
+    """A rule compiled to a function of a {column: array} mapping"""
+
+    name: str
+    title: str
+    fn: Callable
+    columns: frozenset
+    cooldown_hours: float
+    hysteresis: float
+
+
+DEFAULT_RULES = [
+    Rule(
+        "buy",
+        ":arrow_up: Buy:",
+        "price > 1 and price < mean_price * 0.95 and price < min_price",
+    ),
+    Rule(
+        "sell",
+        ":arrow_down: Sell:",
+        "price > 1 and price > mean_price * 1.05 and price > max_price",
+    ),
+]
+
+BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+}
+COMPARE_OPS = {
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+
+def load_rules(path: str = RULES_PATH) -> list:
+    """Loads the rules from a JSON list of Rule fields, or the defaults"""
+
+    if not path:
+        return DEFAULT_RULES
+
+    with open(path, encoding="utf-8") as f:
+        return [Rule(**rule) for rule in json.load(f)]
+
+
+def compile_rules(rules: list) -> list:
+    """Compiles each rule's expression, raising ValueError on an unsupported one"""
+
+    compiled = []
+    for rule in rules:
+        try:
+            tree = ast.parse(rule.when, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Rule {rule.name} is not a valid expression: {e}") from e
+
+        columns = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)}
+        columns -= {n.func.id for n in ast.walk(tree) if isinstance(n, ast.Call)}
+        fn = _compile(tree.body, rule)
+        compiled.append(
+            CompiledRule(
+                rule.name,
+                rule.title,
+                fn,
+                frozenset(columns),
+                rule.cooldown_hours,
+                rule.hysteresis,
+            )
+        )
+
+    return compiled
+
+
+def rule_columns(df: pd.DataFrame) -> dict:
+    """
+    Returns the columns of a frame as arrays for evaluate_rules. Numeric
+    columns, including BigQuery NUMERIC columns (Decimal objects) and
+    nullable dtypes, become float64 with missing values as NaN. The other
+    columns become object arrays, also with missing values as NaN.
+    """
+
+    columns = {}
+    for name, values in df.items():
+        present = values.dropna()
+        if pd.api.types.is_numeric_dtype(values.dtype) or (
+            len(present) > 0
+            and present.map(lambda v: isinstance(v, numbers.Number)).all()
+        ):
+            numeric = pd.to_numeric(values, errors="coerce")
+            columns[name] = numeric.astype("float64").to_numpy()
+        else:
+            columns[name] = (
+                values.astype(object).where(values.notna(), np.nan).to_numpy()
+            )
+
+    return columns
+
+
+def evaluate_rules(rules: list, symbols, columns: dict) -> pd.DataFrame:
+    """
+    Evaluates compiled rules over per-symbol arrays and returns the hits, one
+    (rule, symbol) row per rule a symbol meets, ordered by rule then symbol.
+    The other columns of "columns" are carried into the hits table.
+    """
+
+    for rule in rules:
+        missing = rule.columns - set(columns)
+        if missing:
+            raise ValueError(f"Rule {rule.name} uses unknown columns {sorted(missing)}")
+
+    masks = np.zeros((len(rules), len(symbols)), dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i, rule in enumerate(rules):
+            masks[i] = rule.fn(columns)
+
+    rule_index, symbol_index = np.nonzero(masks)
+    hits = pd.DataFrame(
+        {
+            "rule": pd.Categorical.from_codes(rule_index, [r.name for r in rules]),
+            "symbol": np.asarray(symbols)[symbol_index],
+        }
+    )
+    for name, values in columns.items():
+        if name != "symbol":
+            hits[name] = np.asarray(values)[symbol_index]
+
+    return hits
+
+
+def _compile(node, rule: Rule) -> Callable:
+    """Compiles an expression node to a function of the {column: array} mapping"""
+
+    if isinstance(node, (ast.BoolOp, ast.Compare)) or (
+        isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not)
+    ):
+        condition = _compile_condition(node, rule)
+        return lambda columns: condition(columns)[0]
+
+    if isinstance(node, ast.Name):
+        return lambda columns: columns[node.id]
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)):
+        return lambda columns: node.value
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        fn = _compile(node.operand, rule)
+        return lambda columns: np.negative(fn(columns))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+        op = BINARY_OPS[type(node.op)]
+        left, right = _compile(node.left, rule), _compile(node.right, rule)
+        return lambda columns: op(left(columns), right(columns))
+
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "abs"
+        and len(node.args) == 1
+        and not node.keywords
+    ):
+        fn = _compile(node.args[0], rule)
+        return lambda columns: np.abs(fn(columns))
+
+    raise ValueError(
+        f"Rule {rule.name} has an unsupported expression: {ast.unparse(node)}"
+    )
+
+
+def _compile_condition(node, rule: Rule) -> Callable:
+    """
+    Compiles a condition node to a function returning (true, false) masks.
+    Where a comparison has a NaN operand both masks are false, and "not"
+    swaps the masks, so a missing value never makes a condition true.
+    """
+
+    if isinstance(node, ast.BoolOp):
+        fns = [_compile_condition(value, rule) for value in node.values]
+        if isinstance(node.op, ast.And):
+            first, second = np.logical_and, np.logical_or
+        else:
+            first, second = np.logical_or, np.logical_and
+
+        def boolop(columns):
+            masks = [fn(columns) for fn in fns]
+            return (
+                reduce(first, [true for true, _ in masks]),
+                reduce(second, [false for _, false in masks]),
+            )
+
+        return boolop
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        fn = _compile_condition(node.operand, rule)
+        return lambda columns: fn(columns)[::-1]
+
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        left = _compile(node.left, rule)
+        op, right = node.ops[0], node.comparators[0]
+
+        if isinstance(op, (ast.In, ast.NotIn)):
+            values = _constant_list(right, rule)
+            negate = isinstance(op, ast.NotIn)
+
+            def membership(columns):
+                value = left(columns)
+                known = pd.notna(value)
+                found = np.isin(value, values)
+                return known & (found != negate), known & (found == negate)
+
+            return membership
+
+        if type(op) in COMPARE_OPS:
+            op = COMPARE_OPS[type(op)]
+            right = _compile(right, rule)
+
+            def compare(columns):
+                a, b = left(columns), right(columns)
+                true = op(a, b)
+                return true, ~true & pd.notna(a) & pd.notna(b)
+
+            return compare
+
+    if isinstance(node, ast.Compare):
+        raise ValueError(
+            f"Rule {rule.name} has an unsupported expression: {ast.unparse(node)}"
+        )
+
+    # Any other value is a condition on its truthiness
+    fn = _compile(node, rule)
+
+    def truthy(columns):
+        value = fn(columns)
+        known = pd.notna(value)
+        true = known & np.asarray(value, dtype=bool)
+        return true, known & ~true
+
+    return truthy
+
+
+def _constant_list(node, rule: Rule) -> list:
+    """Returns the constants of a list/tuple node on the right of "in" """
+
+    if isinstance(node, (ast.List, ast.Tuple)) and all(
+        isinstance(e, ast.Constant) for e in node.elts
+    ):
+        return [e.value for e in node.elts]
+
+    raise ValueError(
+        f"Rule {rule.name} must test membership of a list of constants: "
+        f"{ast.unparse(node)}"
+    )
@@ -0,0 +1,77 @@
+"""Small key-value style state tables used to track ingestion progress"""
+
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+
+class SQLiteStore:
+    """Stores state tables in a local SQLite database. Used for tests and local runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self, name: str) -> pd.DataFrame:
+        """Reads a state table, returning an empty frame if it does not exist."""
+
+        with closing(sqlite3.connect(self.path)) as conn:
+            exists = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (name,)
+            ).fetchone()
+            if exists is None:
+                return pd.DataFrame()
+            return pd.read_sql(f"SELECT * FROM {name}", conn)
+
+    def write(self, name: str, df: pd.DataFrame):
+        """Replaces a state table with the given frame."""
+
+        with closing(sqlite3.connect(self.path)) as conn:
+            df.to_sql(name, conn, if_exists="replace", index=False)
+            conn.commit()
+
+
+class BigQueryStore:
+    """Stores state tables as small tables in a BigQuery dataset."""
+
+    def __init__(self, project_id: str, dataset: str):
+        self.project_id = project_id
+        self.dataset = dataset
+
+    def read(self, name: str) -> pd.DataFrame:
+        """Reads a state table, returning an empty frame if it does not exist."""
+
+        import pandas_gbq
+
+        try:
+            return pd.read_gbq(
+                query=f"SELECT * FROM `{self.dataset}.{name}`",
+                project_id=self.project_id,
+                dialect="standard",
+            )
+        except pandas_gbq.exceptions.GenericGBQException as e:
+            if "Not found" not in str(e):
+                raise
+            return pd.DataFrame()
+
+    def write(self, name: str, df: pd.DataFrame):
+        """Replaces a state table with the given frame."""
+
+        import pandas_gbq
+
+        pandas_gbq.to_gbq(
+            df,
+            f"{self.dataset}.{name}",
+            project_id=self.project_id,
+            if_exists="replace",
+            progress_bar=False,
+        )
+
+
+def get_state_store(project_id: str, dataset: str, path: str = None):
+    """Returns a local SQLite store if "path" is given, otherwise a BigQuery store."""
+
+    if path:
+        return SQLiteStore(path)
+
+    return BigQueryStore(project_id, dataset)
@@ -0,0 +1,62 @@
+"""A small task graph runner to overlap independent I/O"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import monotonic
+from typing import Callable, NamedTuple
+
+
+class Task(NamedTuple):
+    """A step of a task graph, called with the results of its dependencies"""
+
+    fn: Callable
+    deps: tuple = ()
+    timeout: float = None
+
+
+def run_tasks(tasks: dict, max_workers: int = 4) -> dict:
+    """
+    Runs a {name: Task} graph on a thread pool, starting each task as soon as
+    its dependencies have finished, and returns the {name: result} of every
+    task. A task which raises, or runs longer than its timeout, fails the
+    whole graph without waiting for the tasks still running.
+    """
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    start = monotonic()
+    results = {}
+    running = {}
+
+    def submit_ready():
+        started = {name for name, _, _ in running.values()}
+        for name, task in tasks.items():
+            ready = all(dep in results for dep in task.deps)
+            if name not in results and name not in started and ready:
+                future = pool.submit(task.fn, *[results[dep] for dep in task.deps])
+                deadline = monotonic() + task.timeout if task.timeout else None
+                running[future] = (name, monotonic(), deadline)
+
+    try:
+        submit_ready()
+        while running:
+            deadlines = [d for _, _, d in running.values() if d is not None]
+            timeout = max(min(deadlines) - monotonic(), 0) if deadlines else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name, started, _ = running.pop(future)
+                results[name] = future.result()
+                print(f"Task {name} finished in {monotonic() - started:.2f}s")
+
+            for name, started, deadline in running.values():
+                if deadline is not None and monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"Task {name} timed out after {monotonic() - started:.0f}s"
+                    )
+
+            submit_ready()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    print(f"Ran {len(tasks)} tasks in {monotonic() - start:.2f}s")
+
+    return results
@@ -2,8 +2,11 @@
 
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 
+NS_PER_DAY = 86_400 * 10**9
+
 
 def import_prices_from_bigquery(
     project_id: str, table: str, n_days: int = 7
@@ -22,26 +25,69 @@ def import_prices_from_bigquery(
     )
 
 
+def compact_prices(df: pd.DataFrame, price_dtype="float64") -> pd.DataFrame:
+    """
+    Converts prices read from BigQuery to a compact layout: dictionary-encoded
+    symbols, float prices and int64 epoch-nanosecond UTC timestamps. The date
+    column is dropped, dates are derived on demand with "get_dates".
+    """
+
+    df = df.drop(columns="date", errors="ignore")
+    df["symbol"] = df["symbol"].astype("category")
+    df["price"] = df["price"].astype(price_dtype)
+    df["timestamp"] = to_epoch(df["timestamp"])
+
+    return df
+
+
+def to_epoch(timestamps: pd.Series) -> np.ndarray:
+    """Returns UTC timestamps as int64 nanoseconds since the epoch"""
+
+    if timestamps.dtype.kind in "iu":
+        return timestamps.values.astype("int64")
+
+    return timestamps.values.astype("datetime64[ns]").view("int64")
+
+
+def get_dates(df: pd.DataFrame) -> np.ndarray:
+    """Returns the UTC trading date of each price as datetime64[D]"""
+
+    if "date" in df:
+        return pd.to_datetime(df["date"]).values.astype("datetime64[D]")
+
+    return (to_epoch(df["timestamp"]) // NS_PER_DAY).astype("datetime64[D]")
+
+
+def get_symbol_prices(prices: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    """Get the prices of a symbol in time order, indexed by a UTC timestamp"""
+
+    df = prices[prices["symbol"] == symbol]
+    df = df.set_index(
+        pd.DatetimeIndex(pd.to_datetime(to_epoch(df["timestamp"]), utc=True))
+    )
+
+    return df.drop(columns="timestamp").sort_index()
+
+
 def get_daily_close_price(df: pd.DataFrame, date: str) -> pd.DataFrame:
     """Get the closing price for a given date"""
 
+    df = df.assign(date=get_dates(df), timestamp=to_epoch(df["timestamp"]))
     df = df.sort_values("timestamp").drop_duplicates(["symbol", "date"], keep="last")
 
-    return df[df["date"] == date][["symbol", "price"]]
+    return df[df["date"] == np.datetime64(date, "D")][["symbol", "price"]]
 
 
 def get_last_two_dates(df: pd.DataFrame) -> pd.DataFrame:
     """Get the maximum two dates in the dataframe"""
 
-    df = df.sort_values("date", ascending=False)
-    dates = df["date"].unique()
-    return dates[1], dates[0]
+    dates = np.unique(get_dates(df))
+    return dates[-2], dates[-1]
 
 
 def get_yesterday_close(prices, symbol):
     """Get the closing price for yesterday for a gven symbol"""
-    df = prices[prices["date"] < datetime.today().date()]
-
-    df = df[df["symbol"] == symbol].sort_values(by="timestamp")
+    before_today = get_dates(prices) < np.datetime64(datetime.today().date())
+    df = prices[before_today & (prices["symbol"] == symbol)]
 
-    return df["price"].iloc[-1]
+    return df["price"].iloc[to_epoch(df["timestamp"]).argmax()]
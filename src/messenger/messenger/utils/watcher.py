@@ -0,0 +1,259 @@
+"""Streaming price watcher with rolling window statistics
+
+Instead of recomputing the price statistics of every symbol from the full
+history once an hour, the watcher keeps a rolling window per symbol and
+updates it with every polled quote:
+    min/max: monotonic deques of window positions, O(1) amortised per tick
+    mean:    a running sum over the window, O(1) per tick
+The buy/sell conditions of the hourly price check are evaluated on every
+tick against the window as it was before the tick, and an alert is emitted
+as soon as a symbol enters a buy or sell condition. Quotes are stamped with
+their market time, and a quote whose market time has not advanced (e.g. the
+close, polled overnight) is skipped, so the window holds the same prices as
+the minutely history.
+"""
+
+import asyncio
+import os
+from collections import deque
+from time import monotonic, process_time, time_ns
+
+import numpy as np
+import pandas as pd
+
+from .utils import to_epoch
+
+WATCH_WINDOW = pd.Timedelta(days=int(os.environ.get("WATCH_WINDOW_DAYS", 7)))
+WATCH_CADENCE = float(os.environ.get("WATCH_CADENCE_SECONDS", 60))
+
+# int64 value of NaT, below every valid time
+NAT = np.iinfo("int64").min
+
+# The buy/sell conditions of create_price_alert
+MIN_PRICE = 1
+BAND = 0.05
+
+
+class RollingWindow:
+    """Rolling min, max and mean of one symbol's prices over a time window"""
+
+    def __init__(self, window_ns: int, capacity: int = 1024):
+        self.window_ns = window_ns
+        self.times = np.empty(capacity, dtype="int64")
+        self.prices = np.empty(capacity, dtype="float64")
+
+        # Absolute positions of the first and one past the last price held
+        self.start = 0
+        self.end = 0
+        self.total = 0.0
+
+        # Positions whose prices decrease (maxima) or increase (minima)
+        self.maxima = deque()
+        self.minima = deque()
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def min(self) -> float:
+        return self.prices[self.minima[0] % len(self.prices)] if self.minima else np.nan
+
+    @property
+    def max(self) -> float:
+        return self.prices[self.maxima[0] % len(self.prices)] if self.maxima else np.nan
+
+    @property
+    def mean(self) -> float:
+        return self.total / len(self) if len(self) else np.nan
+
+    def update(self, t: int, price: float):
+        """Adds a price at epoch-nanosecond time "t" and evicts expired prices."""
+
+        if len(self) == len(self.prices):
+            self._grow()
+
+        capacity = len(self.prices)
+        pos = self.end
+        self.times[pos % capacity] = t
+        self.prices[pos % capacity] = price
+        self.end += 1
+        self.total += price
+
+        while self.maxima and self.prices[self.maxima[-1] % capacity] <= price:
+            self.maxima.pop()
+        self.maxima.append(pos)
+
+        while self.minima and self.prices[self.minima[-1] % capacity] >= price:
+            self.minima.pop()
+        self.minima.append(pos)
+
+        self.evict(t)
+
+    def evict(self, t: int):
+        """Drops the prices which are older than the window at time "t"."""
+
+        capacity = len(self.prices)
+        cutoff = t - self.window_ns
+
+        while self.start < self.end and self.times[self.start % capacity] <= cutoff:
+            self.total -= self.prices[self.start % capacity]
+            if self.maxima[0] == self.start:
+                self.maxima.popleft()
+            if self.minima[0] == self.start:
+                self.minima.popleft()
+            self.start += 1
+
+    def seed(self, times: np.ndarray, prices: np.ndarray):
+        """Fills an empty window from time-ordered history in one vectorised step."""
+
+        n = len(prices)
+        capacity = max(1024, 1 << int(np.ceil(np.log2(n * 1.25 + 1))))
+        self.times = np.empty(capacity, dtype="int64")
+        self.prices = np.empty(capacity, dtype="float64")
+        self.times[:n], self.prices[:n] = times, prices
+        self.start, self.end, self.total = 0, n, float(prices.sum())
+
+        # A position stays in a deque only if it beats every later price
+        later_max = np.append(np.maximum.accumulate(prices[::-1])[::-1][1:], -np.inf)
+        later_min = np.append(np.minimum.accumulate(prices[::-1])[::-1][1:], np.inf)
+        self.maxima = deque(np.flatnonzero(prices > later_max).tolist())
+        self.minima = deque(np.flatnonzero(prices < later_min).tolist())
+
+        if n > 0:
+            self.evict(int(times[-1]))
+
+    def _grow(self):
+        """Doubles the ring buffer, keeping every position at the same index."""
+
+        positions = np.arange(self.start, self.end)
+        old = len(self.prices)
+        new = old * 2
+
+        times = np.empty(new, dtype="int64")
+        prices = np.empty(new, dtype="float64")
+        times[positions % new] = self.times[positions % old]
+        prices[positions % new] = self.prices[positions % old]
+        self.times, self.prices = times, prices
+
+
+def evaluate(window: RollingWindow, price: float):
+    """Returns "buy", "sell" or None for a price against the window's statistics."""
+
+    if len(window) == 0 or not price > MIN_PRICE:
+        return None
+    if price < window.mean * (1 - BAND) and price < window.min:
+        return "buy"
+    if price > window.mean * (1 + BAND) and price > window.max:
+        return "sell"
+    return None
+
+
+class PriceWatcher:
+    """Keeps a rolling window per symbol and emits alerts as conditions are met"""
+
+    def __init__(self, on_alert, window: pd.Timedelta = WATCH_WINDOW):
+        self.on_alert = on_alert
+        self.window_ns = window.value
+        self.windows = {}
+        self.signals = {}
+        self.last_times = {}
+
+    def seed(self, prices: pd.DataFrame):
+        """Seeds the windows from the price history (compact or BigQuery layout)."""
+
+        df = pd.DataFrame(
+            {
+                "symbol": np.asarray(prices["symbol"]),
+                "timestamp": to_epoch(prices["timestamp"]),
+                "price": prices["price"].astype(float),
+            }
+        ).sort_values(["symbol", "timestamp"], kind="stable")
+
+        for symbol, group in df.groupby("symbol", sort=False):
+            window = RollingWindow(self.window_ns)
+            window.seed(group["timestamp"].values, group["price"].values)
+            self.windows[symbol] = window
+            self.last_times[symbol] = int(group["timestamp"].values[-1])
+
+        print(f"Seeded rolling windows for {len(self.windows)} symbols")
+
+    def tick(self, symbol: str, t: int, price: float) -> bool:
+        """
+        Evaluates and then adds one quote, emitting an alert on a new signal.
+        Returns False, and skips the quote, if it is not newer than the last.
+        """
+
+        if t <= self.last_times.get(symbol, NAT):
+            return False
+        self.last_times[symbol] = t
+
+        window = self.windows.get(symbol)
+        if window is None:
+            window = self.windows[symbol] = RollingWindow(self.window_ns)
+
+        window.evict(t)
+        signal = evaluate(window, price)
+
+        if signal is not None and signal != self.signals.get(symbol):
+            self.on_alert(
+                {
+                    "symbol": symbol,
+                    "signal": signal,
+                    "price": price,
+                    "mean_price": window.mean,
+                    "min_price": window.min,
+                    "max_price": window.max,
+                }
+            )
+        self.signals[symbol] = signal
+
+        window.update(t, price)
+        return True
+
+
+async def watch(
+    watcher: PriceWatcher,
+    fetch,
+    cadence: float = WATCH_CADENCE,
+    iterations: int = None,
+    queue=None,
+):
+    """
+    Polls "fetch()" for a frame of current prices (symbol, currentPrice and
+    optionally marketTime) every "cadence" seconds and feeds them to the
+    watcher. Without a marketTime, quotes are stamped with the poll time.
+    The fetch runs in a thread, so it does not block the event loop. The CPU
+    time spent on the statistics is reported per poll and per quote. Alerts
+    queued on a DiscordQueue "queue" during a poll are sent together after it.
+    """
+
+    polls = 0
+    while iterations is None or polls < iterations:
+        started = monotonic()
+        quotes = await asyncio.to_thread(fetch)
+        if "marketTime" in quotes:
+            times = to_epoch(quotes["marketTime"])
+        else:
+            times = np.full(len(quotes), time_ns())
+
+        cpu = process_time()
+        ticks = sum(
+            watcher.tick(symbol, int(t), float(price))
+            for symbol, t, price in zip(quotes["symbol"], times, quotes["currentPrice"])
+        )
+        cpu = process_time() - cpu
+
+        polls += 1
+        print(
+            f"Poll {polls}: {len(quotes)} quotes ({ticks} new), "
+            f"statistics took {cpu * 1e3:.2f}ms "
+            f"CPU ({cpu * 1e6 / max(len(quotes), 1):.1f}us per quote)"
+        )
+
+        if queue is not None and len(queue) > 0:
+            try:
+                await queue.send()
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"Watch alerts failed to send to Discord: {e}")
+
+        await asyncio.sleep(max(cadence - (monotonic() - started), 0))
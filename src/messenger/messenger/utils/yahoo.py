@@ -1,27 +1,124 @@
 """Utility functions for interacting with Yahoo Finance"""
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 from yahooquery import Ticker
 
+from .rate_limit import LIMITER, is_throttled
+
+BATCH_SIZE = int(os.environ.get("YAHOO_BATCH_SIZE", 100))
+
+# The quote endpoint serves a whole batch in one request, up to ~1,500 symbols
+QUOTE_BATCH_SIZE = int(os.environ.get("YAHOO_QUOTE_BATCH_SIZE", 500))
+QUOTE_PRICE_FIELD = "regularMarketPrice"
+QUOTE_TIME_FIELD = "regularMarketTime"
+
 
-def get_stock_prices(tickers: list) -> pd.DataFrame:
-    """Get stock price for a list of tickers."""
+def get_stock_prices(
+    tickers: list, mode: str = "quotes", market_time: bool = False
+) -> pd.DataFrame:
+    """
+    Get stock price for a list of tickers.
+    With mode="quotes" the last price comes from the batched quote endpoint,
+    one request per batch. With mode="financial_data" it comes from the
+    financialData module, one request per symbol.
+    If "market_time" is True, the time of each price is returned as the
+    "marketTime" column (UTC, quotes mode only).
+    """
 
-    print("Fetching current stock prices...")
-    client = Ticker(tickers, asynchronous=True)
+    print(f"Fetching current stock prices ({mode})...")
+    if mode == "quotes":
+        data = fetch_in_batches(tickers, fetch_quotes, QUOTE_BATCH_SIZE)
+        df = parse_quotes(data)
+    else:
+        data = fetch_in_batches(tickers, _fetch_financial_data, BATCH_SIZE)
+        df = parse_financial_data(data)
 
-    df = pd.DataFrame(client.financial_data).T.reset_index(names=["symbol"])
     print(
         f"Yahoo client returned prices for {df.symbol.nunique()} symbols. Cleaning data..."
     )
 
-    df = df[["symbol", "currentPrice"]]
-
-    invalid_prices = ~pd.to_numeric(df["currentPrice"], errors="coerce").notnull()
+    invalid_prices = df["currentPrice"].isna()
     print(f"Invalid prices found: {df[invalid_prices]}")
     df = df[~invalid_prices]
 
-    df["symbol"] = df["symbol"].str.replace(".ax", "", regex=False)
+    # Quotes are keyed by Yahoo's upper-case symbol, financial data by the request
+    df["symbol"] = df["symbol"].str.replace(r"\.ax$", "", case=False, regex=True)
+
+    if market_time:
+        if "marketTime" not in df:
+            df["marketTime"] = pd.NaT
+        return df[["symbol", "currentPrice", "marketTime"]]
+
+    return df[["symbol", "currentPrice"]]
+
+
+def fetch_in_batches(tickers: list, fetch, batch_size: int) -> dict:
+    """Runs "fetch" on batches of tickers in parallel and merges the results."""
+
+    batches = [tickers[i : i + batch_size] for i in range(0, len(tickers), batch_size)]
+    with ThreadPoolExecutor(max_workers=LIMITER.max_concurrency) as pool:
+        results = list(pool.map(fetch, batches))
+    print(f"Yahoo rate limiter: {LIMITER.metrics()}")
+
+    return {k: v for result in results for k, v in result.items()}
+
+
+def fetch_quotes(batch: list) -> dict:
+    """Fetches the quotes of a batch of tickers in one request."""
+
+    with LIMITER.limit() as outcome:
+        result = Ticker(batch).quotes
+        if not isinstance(result, dict):
+            outcome["throttled"] = is_throttled(result)
+            print(f"Quote batch starting {batch[0]} failed: {result}")
+            return {}
+
+    return result
+
+
+def parse_quotes(data: dict) -> pd.DataFrame:
+    """Parses {ticker: quote} to a frame of the last price of each ticker and its time."""
+
+    quotes = [q if isinstance(q, dict) else {} for q in data.values()]
+    prices = pd.to_numeric(
+        np.array([q.get(QUOTE_PRICE_FIELD) for q in quotes], dtype=object),
+        errors="coerce",
+    )
+    times = pd.to_numeric(
+        np.array([q.get(QUOTE_TIME_FIELD) for q in quotes], dtype=object),
+        errors="coerce",
+    )
+
+    return pd.DataFrame(
+        {
+            "symbol": list(data),
+            "currentPrice": prices,
+            "marketTime": pd.to_datetime(times, unit="s"),
+        }
+    )
+
+
+def parse_financial_data(data: dict) -> pd.DataFrame:
+    """Parses {ticker: financial data} to a frame of the current price of each ticker."""
+
+    df = pd.DataFrame(data).T.reset_index(names=["symbol"])
+    if "currentPrice" not in df:
+        df["currentPrice"] = np.nan
     df["currentPrice"] = pd.to_numeric(df["currentPrice"], errors="coerce")
 
     return df[["symbol", "currentPrice"]]
+
+
+def _fetch_financial_data(batch: list) -> dict:
+    """Fetches the financial data of a batch of tickers through the rate limiter."""
+
+    with LIMITER.limit(len(batch)) as outcome:
+        result = Ticker(batch, asynchronous=True).financial_data
+        errors = [v for v in result.values() if not isinstance(v, dict)]
+        outcome["throttled"] = any(is_throttled(e) for e in errors)
+
+    return result
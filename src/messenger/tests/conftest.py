@@ -1,11 +1,19 @@
 """Conftest for messenger tests."""
 
+import json
+import os
+import threading
 from datetime import datetime
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
 import pandas as pd
 
 import pytest
 
+from messenger.utils import yahoo
+from messenger.utils.rate_limit import AdaptiveLimiter
+
 
 @pytest.fixture
 def prices_dataframe() -> pd.DataFrame:
@@ -18,3 +26,133 @@ def prices_dataframe() -> pd.DataFrame:
     ]
     symbols = ["ABC", "DEF", "GHI", "JKL"]
     return pd.DataFrame({"date": dates * 4, "symbol": symbols * 4,})
+
+
+@pytest.fixture
+def handler_dir() -> str:
+    """Fixture to return the directory the handler is deployed from"""
+    return os.path.join(os.path.dirname(__file__), "..", "messenger")
+
+
+@pytest.fixture
+def handler_env() -> dict:
+    """Fixture to return the environment the handler is deployed with"""
+    return {"WEBHOOK": "https://example.com", "PRICES": "prices"}
+
+
+@pytest.fixture
+def fake_yahoo(monkeypatch) -> dict:
+    """
+    Replaces the Yahoo client with a stand-in serving canned quote and
+    financialData payloads, shaped like the real responses, without rate
+    limiting. Unknown symbols come back as errors. Returns the requests made,
+    by endpoint.
+    """
+
+    prices = {f"S{i:03d}.ax": round(1 + i / 100, 3) for i in range(250)}
+    requests = {"quotes": [], "financial_data": []}
+
+    class FakeTicker:
+        def __init__(self, symbols, **kwargs):
+            self.symbols = symbols
+
+        @property
+        def quotes(self):
+            requests["quotes"].append(self.symbols)
+            # Yahoo echoes the symbol in upper case, whatever case was requested
+            return {
+                s.upper(): {
+                    "language": "en-US",
+                    "region": "US",
+                    "quoteType": "EQUITY",
+                    "currency": "AUD",
+                    "exchange": "ASX",
+                    "marketState": "REGULAR",
+                    "regularMarketPrice": prices[s],
+                    "regularMarketTime": 1687392000,
+                }
+                for s in self.symbols
+                if s in prices
+            }
+
+        @property
+        def financial_data(self):
+            requests["financial_data"].extend(self.symbols)
+            return {
+                s: (
+                    {
+                        "maxAge": 86400,
+                        "currentPrice": prices[s],
+                        "targetHighPrice": prices[s] * 1.2,
+                        "targetLowPrice": prices[s] * 0.8,
+                        "recommendationKey": "buy",
+                        "totalCash": 123456789,
+                        "totalDebt": 98765432,
+                        "totalRevenue": 555555555,
+                        "grossMargins": 0.41,
+                        "ebitdaMargins": 0.22,
+                        "operatingMargins": 0.18,
+                        "financialCurrency": "AUD",
+                    }
+                    if s in prices
+                    else f"Quote not found for ticker symbol: {s}"
+                )
+                for s in self.symbols
+            }
+
+    monkeypatch.setattr(yahoo, "Ticker", FakeTicker)
+    monkeypatch.setattr(yahoo, "LIMITER", AdaptiveLimiter(rate=1e6, max_rate=1e6))
+
+    return requests
+
+
+@pytest.fixture
+def discord_server() -> tuple:
+    """
+    Serves a local stand-in for a Discord webhook. It records the payload
+    and file names of each message, and answers with the queued
+    (status, body, headers) responses before falling back to a 204. Returns
+    the webhook URL, the messages and the response queue.
+    """
+
+    messages, responses = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            status, reply, headers = responses.pop(0) if responses else (204, None, {})
+
+            if status < 300:
+                content_type = self.headers["Content-Type"]
+                if content_type.startswith("multipart/"):
+                    message = BytesParser().parsebytes(
+                        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+                    )
+                    parts = {
+                        p.get_param("name", header="content-disposition"): p
+                        for p in message.get_payload()
+                    }
+                    payload = json.loads(parts.pop("payload_json").get_payload())
+                    payload["files"] = sorted(p.get_filename() for p in parts.values())
+                else:
+                    payload = json.loads(body)
+                messages.append(payload)
+
+            data = json.dumps(reply).encode() if reply is not None else b""
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}/webhook", messages, responses
+
+    server.shutdown()
@@ -0,0 +1,75 @@
+"""Unit tests for the alert state store"""
+
+import pandas as pd
+
+from messenger.utils.alert_state import (
+    filter_alerts,
+    read_alert_state,
+    write_alert_state,
+)
+from messenger.utils.rules import Rule, compile_rules
+from messenger.utils.state import SQLiteStore
+
+RULES = compile_rules(
+    [
+        Rule("buy", "Buy", "price < min_price", cooldown_hours=4, hysteresis=0.05),
+        Rule("sell", "Sell", "price > max_price", cooldown_hours=1),
+    ]
+)
+START = pd.Timestamp("2022-01-03 00:00", tz="UTC")
+
+
+def hits(*rows) -> pd.DataFrame:
+    """A hits table of (rule, symbol, price) rows"""
+
+    df = pd.DataFrame(rows, columns=["rule", "symbol", "price"])
+    df["rule"] = pd.Categorical(df["rule"], categories=["buy", "sell"])
+    return df
+
+
+def test_alerts_are_sent_once_until_they_clear_or_move(tmp_path):
+    """Test cooldowns and hysteresis across hourly checks, through the state store"""
+
+    store = SQLiteStore(str(tmp_path / "state.db"))
+    checks = [
+        # hour, hits, expected (symbol, status) sent
+        (
+            0,
+            hits(("buy", "ABC", 10.0), ("sell", "DEF", 5.0)),
+            {("ABC", "new"), ("DEF", "new")},
+        ),
+        (1, hits(("buy", "ABC", 9.8), ("sell", "DEF", 5.1)), set()),
+        (2, hits(("buy", "ABC", 9.0)), {("ABC", "changed")}),
+        (3, hits(("sell", "DEF", 5.0)), {("DEF", "new")}),
+        (4, hits(), set()),
+        (5, hits(("buy", "ABC", 9.0)), set()),
+        (6, hits(), set()),
+        (7, hits(("buy", "ABC", 9.0)), {("ABC", "new")}),
+    ]
+
+    for hour, check, expected in checks:
+        sent, state = filter_alerts(
+            check, RULES, read_alert_state(store), now=START + pd.Timedelta(hours=hour)
+        )
+        write_alert_state(store, state)
+
+        assert set(zip(sent["symbol"], sent["status"])) == expected, f"hour {hour}"
+
+    assert len(read_alert_state(store)) == 1
+
+
+def test_state_lookup_is_cheap_at_scale(tmp_path):
+    """Test that loading and filtering against a large state stays fast"""
+
+    store = SQLiteStore(str(tmp_path / "state.db"))
+    universe = hits(*[("buy", f"S{i:04d}", 1.0 + i) for i in range(2000)])
+
+    _, state = filter_alerts(universe, RULES, read_alert_state(store), now=START)
+    write_alert_state(store, state)
+
+    start = pd.Timestamp.now()
+    sent, _ = filter_alerts(universe, RULES, read_alert_state(store), now=START)
+    elapsed = (pd.Timestamp.now() - start).total_seconds()
+
+    assert len(sent) == 0
+    assert elapsed < 0.5
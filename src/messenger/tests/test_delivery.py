@@ -0,0 +1,69 @@
+"""Unit tests for the Discord delivery queue"""
+
+from time import monotonic
+
+from discord_webhook import DiscordEmbed
+
+from messenger.utils.delivery import DiscordQueue, embed_chars
+
+
+def test_embeds_are_packed_within_the_limits(discord_server):
+    """Test that fields and embeds are split and packed into few messages"""
+
+    url, messages, _ = discord_server
+    queue = DiscordQueue(url)
+
+    big = DiscordEmbed(title="Buy Alert", color="03b2f8")
+    for i in range(60):
+        big.add_embed_field(name=f"Field {i}", value="x" * 200, inline=False)
+    queue.add(big, files={"chart.png": b"\x89PNG"})
+    for i in range(12):
+        queue.add({"title": f"Alert {i}", "description": "y" * 100})
+    queue.add(
+        {
+            "title": "Long",
+            "fields": [{"name": "Lines", "value": "z" * 50 + "\n" + "z" * 1000}],
+        }
+    )
+
+    assert queue.metrics()["max_depth"] == len(queue) == 16
+    queue.flush()
+
+    embeds = [e for m in messages for e in m["embeds"]]
+    assert len(embeds) == 16
+    assert sum(len(e.get("fields", [])) for e in embeds[:3]) == 60
+    assert embeds[-1]["fields"][1]["value"] == "z" * 1000
+    assert messages[0]["files"] == ["chart.png"]
+    for message in messages:
+        assert len(message["embeds"]) <= 10
+        assert sum(embed_chars(e) for e in message["embeds"]) <= 6000
+        assert all(len(e.get("fields", [])) <= 25 for e in message["embeds"])
+        assert all(
+            len(f["value"]) <= 1024
+            for e in message["embeds"]
+            for f in e.get("fields", [])
+        )
+    assert len(messages) == 4
+    assert queue.metrics()["depth"] == 0
+
+
+def test_rate_limits_are_waited_out(discord_server):
+    """Test that a 429 is retried after its retry_after, and an empty bucket pauses"""
+
+    url, messages, responses = discord_server
+    responses.append((429, {"retry_after": 0.2, "global": False}, {}))
+    responses.append(
+        (204, None, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.2"})
+    )
+
+    queue = DiscordQueue(url)
+    for i in range(11):
+        queue.add({"title": f"Alert {i}"})
+
+    start = monotonic()
+    queue.flush()
+
+    assert monotonic() - start >= 0.4
+    assert [len(m["embeds"]) for m in messages] == [10, 1]
+    assert queue.metrics()["requests"] == 3
+    assert queue.metrics()["retries"] == 1
@@ -0,0 +1,10 @@
+"""Cold-start imports of the messenger handler"""
+
+# Heavy modules which only some methods need, so they are imported lazily
+LAZY_MODULES = ["yahooquery", "matplotlib", "discord_webhook", "fire"]
+
+
+def test_handler_defers_heavy_imports(imported_modules):
+    """Test that the heavy, method-specific modules are not imported on load"""
+
+    assert not set(LAZY_MODULES) & imported_modules
@@ -0,0 +1,84 @@
+"""Unit tests for the close-price matrix metrics"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from messenger.utils.metrics import (
+    build_close_matrix,
+    get_horizon_change,
+    get_price_change,
+    get_top_n,
+)
+from messenger.utils.utils import compact_prices
+
+
+def make_prices() -> pd.DataFrame:
+    """Two intraday prices per symbol and day for Thu 2023-06-01 to Tue 2023-06-06"""
+
+    days = pd.to_datetime(["2023-06-01", "2023-06-02", "2023-06-05", "2023-06-06"])
+    rows = []
+    for i, symbol in enumerate(["ABC", "DEF", "GHI"]):
+        for j, day in enumerate(days):
+            close = 10.0 + (i + 1) * j * (-1) ** i
+            rows.append((symbol, day + pd.Timedelta("05:00:00"), close))
+            rows.append((symbol, day + pd.Timedelta("01:00:00"), 99.0))
+
+    df = pd.DataFrame(rows, columns=["symbol", "timestamp", "price"])
+    df["timestamp"] = df["timestamp"].dt.tz_localize("UTC")
+    df["date"] = df["timestamp"].dt.date
+
+    # Shuffled, so the matrix must not rely on the input order
+    return df.sample(frac=1, random_state=0)
+
+
+def test_build_close_matrix():
+    """Test that the close of each cell is the price with the latest timestamp"""
+
+    matrix = build_close_matrix(make_prices())
+
+    assert list(matrix.symbols) == ["ABC", "DEF", "GHI"]
+    assert list(matrix.dates) == list(
+        pd.to_datetime(["2023-06-01", "2023-06-02", "2023-06-05", "2023-06-06"])
+    )
+    np.testing.assert_array_equal(matrix.close[1], [10.0, 8.0, 6.0, 4.0])
+
+    # The compact layout gives the same matrix
+    compact = build_close_matrix(compact_prices(make_prices()))
+    np.testing.assert_array_equal(compact.close, matrix.close)
+
+
+def test_horizon_changes():
+    """Test the 1-day, week-to-date and full horizons and the top-N selection"""
+
+    prices = make_prices()
+    matrix = build_close_matrix(prices)
+
+    # Closes on Mon 2023-06-05 and Tue 2023-06-06
+    expected = pd.DataFrame(
+        {
+            "symbol": ["ABC", "DEF", "GHI"],
+            "price_start": [12.0, 6.0, 16.0],
+            "price_end": [13.0, 4.0, 19.0],
+            "abs_change": [1.0, -2.0, 3.0],
+            "pct_change": [1 / 12, -1 / 3, 3 / 16],
+        }
+    )
+    daily = get_horizon_change(matrix, 1)
+    pd.testing.assert_frame_equal(daily, expected, check_dtype=False)
+    pd.testing.assert_frame_equal(
+        get_price_change(prices, date(2023, 6, 5), date(2023, 6, 6)),
+        expected,
+        check_dtype=False,
+    )
+
+    # The week started on Mon 2023-06-05, so week-to-date runs from Friday's close
+    weekly = get_horizon_change(matrix, "wtd")
+    assert weekly["price_start"].tolist() == [11.0, 8.0, 13.0]
+
+    full = get_horizon_change(matrix, 10)
+    assert full["price_start"].tolist() == [10.0, 10.0, 10.0]
+
+    assert get_top_n(daily, 2)["symbol"].tolist() == ["GHI", "ABC"]
+    assert get_top_n(daily, 1, largest=False)["symbol"].tolist() == ["DEF"]
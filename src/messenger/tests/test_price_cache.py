@@ -0,0 +1,64 @@
+"""Unit tests for the incremental price cache"""
+
+from datetime import datetime
+
+import pandas as pd
+
+from messenger.utils import price_cache
+
+
+def test_price_cache_only_fetches_new_rows(tmp_path, monkeypatch):
+    """Test that a warm cache only queries recent rows and evicts old ones"""
+
+    table = pd.DataFrame(
+        {
+            "symbol": "ABC",
+            "timestamp": pd.date_range("2023-06-01", "2023-06-09", freq="6h", tz="UTC"),
+            "price": 1.0,
+        }
+    )
+    queries = []
+
+    def query_prices_since(project_id, table_name, since):
+        queries.append(since)
+        return table[table["timestamp"] >= since].reset_index(drop=True)
+
+    monkeypatch.setattr(price_cache, "query_prices_since", query_prices_since)
+
+    def read(now):
+        return price_cache.import_prices_with_cache(
+            "project", "dataset.prices", 7, str(tmp_path), now=now
+        )
+
+    table = table[table["timestamp"] <= "2023-06-08"]
+    df = read(datetime(2023, 6, 8))
+    assert queries[-1] == pd.Timestamp("2023-06-01", tz="UTC")
+    assert len(df) == 29
+
+    table = pd.concat(
+        [
+            table,
+            pd.DataFrame(
+                {
+                    "symbol": "ABC",
+                    "timestamp": pd.to_datetime(["2023-06-08 06:00"], utc=True),
+                    "price": 2.0,
+                }
+            ),
+        ]
+    )
+    df = read(datetime(2023, 6, 8, 12))
+    assert queries[-1] == pd.Timestamp("2023-06-07 23:00", tz="UTC")
+    assert df["timestamp"].min() == pd.Timestamp("2023-06-01 12:00", tz="UTC").value
+    assert df["timestamp"].is_unique
+    assert df["price"].iloc[-1] == 2.0
+    assert df["symbol"].dtype == "category"
+
+    # A new column forces a full reload
+    table = table.assign(volume=10.0)
+    df = read(datetime(2023, 6, 8, 12))
+    assert queries[-2:] == [
+        pd.Timestamp("2023-06-08 05:00", tz="UTC"),
+        pd.Timestamp("2023-06-01 12:00", tz="UTC"),
+    ]
+    assert "volume" in df and len(df) == 28
@@ -0,0 +1,48 @@
+"""Unit tests for the chart rendering pipeline"""
+
+import numpy as np
+import pandas as pd
+
+from messenger.utils.daily_report import make_chart
+from messenger.utils.render import benchmark_render, day_labels, hour_labels, _TEMPLATES
+from messenger.utils.utils import compact_prices
+
+
+def test_labels_match_strftime():
+    """Test that the vectorised tick labels match the strftime ones they replace"""
+
+    index = pd.date_range("2023-01-01", periods=24 * 40, freq="h", tz="Australia/Perth")
+
+    assert list(day_labels(index)) == [
+        t.strftime("\n%d-%b").replace("\n0", "\n") for t in index
+    ]
+    assert list(hour_labels(index)) == [t.strftime("%I").lstrip("0") for t in index]
+    assert list(hour_labels(index, clock=24)) == [
+        t.strftime("%H").lstrip("0") for t in index
+    ]
+
+
+def test_chart_renders_to_png_on_a_reused_template():
+    """Test that the daily chart renders to PNG bytes and reuses its figure"""
+
+    timestamps = pd.date_range(
+        "2020-01-01 23:00", periods=2 * 24 * 60, freq="min", tz="UTC"
+    )
+    prices = compact_prices(
+        pd.DataFrame(
+            {
+                "symbol": np.repeat(["ABC", "DEF"], len(timestamps)),
+                "timestamp": np.tile(timestamps, 2),
+                "price": 1
+                + np.random.default_rng(0).uniform(0, 0.1, 2 * len(timestamps)),
+            }
+        )
+    )
+
+    result = benchmark_render(lambda: make_chart(prices, "ABC", "DEF"), repeats=2)
+    figure = _TEMPLATES["daily_report"]
+
+    assert make_chart(prices, "ABC", "DEF")[:8] == b"\x89PNG\r\n\x1a\n"
+    assert _TEMPLATES["daily_report"] is figure
+    assert len(figure.axes) == 2
+    assert result["bytes"] > 0 and result["repeat_ms"] > 0
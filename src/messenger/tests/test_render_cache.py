@@ -0,0 +1,57 @@
+"""Unit tests for the render cache"""
+
+import pandas as pd
+import pytest
+
+from messenger.utils.render_cache import cached_render, chart_key
+
+
+@pytest.fixture(params=["local", "memory"])
+def cache(request, tmp_path) -> str:
+    """A render cache on local disk, or on fsspec's in-memory stand-in for a bucket"""
+
+    if request.param == "local":
+        return str(tmp_path / "render_cache")
+
+    return f"memory://render_cache/{tmp_path.name}"
+
+
+def test_unchanged_inputs_are_served_from_the_cache(cache):
+    """Test that a chart is rendered once per distinct input, in LRU order"""
+
+    renders = []
+
+    def render(name):
+        def _render():
+            renders.append(name)
+            return f"png of {name}".encode()
+
+        return _render
+
+    prices = pd.DataFrame({"symbol": ["ABC", "DEF"], "price": [1.0, 2.0]})
+    key = chart_key("chart", prices, "ABC")
+
+    assert chart_key("chart", prices.copy(), "ABC") == key
+    assert chart_key("chart", prices.assign(price=[1.0, 2.5]), "ABC") != key
+
+    assert cached_render(key, render("a"), cache, max_entries=2) == b"png of a"
+    assert cached_render(key, render("again"), cache, max_entries=2) == b"png of a"
+    assert renders == ["a"]
+
+    cached_render("b", render("b"), cache, max_entries=2)
+    cached_render(key, render("again"), cache, max_entries=2)
+    cached_render("c", render("c"), cache, max_entries=2)
+
+    # "b" was the least recently used chart, so it was evicted
+    cached_render(key, render("again"), cache, max_entries=2)
+    cached_render("b", render("b"), cache, max_entries=2)
+    assert renders == ["a", "b", "c", "b"]
+
+
+def test_unusable_cache_falls_back_to_rendering(tmp_path):
+    """Test that a cache which cannot be written still returns the render"""
+
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+
+    assert cached_render("key", lambda: b"png", str(blocker / "cache")) == b"png"
@@ -0,0 +1,152 @@
+"""Unit tests for the declarative alert rules"""
+
+from decimal import Decimal
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from messenger.utils.rules import (
+    DEFAULT_RULES,
+    Rule,
+    compile_rules,
+    evaluate_rules,
+    rule_columns,
+)
+
+
+@pytest.fixture
+def universe() -> tuple:
+    """Per-symbol columns for 2,000 symbols"""
+
+    rng = np.random.default_rng(0)
+    n = 2000
+    mean = rng.uniform(0.5, 20, n)
+    columns = {
+        "price": mean * rng.uniform(0.8, 1.2, n),
+        "mean_price": mean,
+        "min_price": mean * rng.uniform(0.85, 1, n),
+        "max_price": mean * rng.uniform(1, 1.15, n),
+        "mean_volume": rng.uniform(0, 1e6, n),
+        "GIC": rng.choice(["Materials", "Energy", "Banks"], n).astype(object),
+    }
+    columns["price"][:5] = np.nan
+    symbols = np.array([f"S{i:04d}" for i in range(n)], dtype=object)
+
+    return symbols, columns
+
+
+def test_default_rules_match_the_price_alert_masks(universe):
+    """Test that the default rules give the same buys and sells as the old masks"""
+
+    symbols, c = universe
+    hits = evaluate_rules(compile_rules(DEFAULT_RULES), symbols, c)
+
+    buys = (c["price"] > 1) & (c["price"] < c["mean_price"] * 0.95)
+    buys &= c["price"] < c["min_price"]
+    sells = (c["price"] > 1) & (c["price"] > c["mean_price"] * 1.05)
+    sells &= c["price"] > c["max_price"]
+
+    assert list(hits.loc[hits["rule"] == "buy", "symbol"]) == list(symbols[buys])
+    assert list(hits.loc[hits["rule"] == "sell", "symbol"]) == list(symbols[sells])
+    assert 0 < buys.sum() and 0 < sells.sum()
+
+
+def test_volume_and_sector_filters(universe):
+    """Test membership and arithmetic expressions, and that columns are carried"""
+
+    symbols, c = universe
+    rule = Rule(
+        "liquid_miner",
+        "Miners",
+        'GIC in ["Materials", "Energy"] and not mean_volume * price < 1e6 '
+        "and abs(price - mean_price) / mean_price > 0.1",
+    )
+    hits = evaluate_rules(compile_rules([rule]), symbols, c)
+
+    expected = np.isin(c["GIC"], ["Materials", "Energy"])
+    expected &= ~(c["mean_volume"] * c["price"] < 1e6)
+    expected &= np.abs(c["price"] - c["mean_price"]) / c["mean_price"] > 0.1
+
+    assert list(hits["symbol"]) == list(symbols[expected])
+    assert set(hits["GIC"]) <= {"Materials", "Energy"}
+
+
+@pytest.mark.parametrize(
+    "when",
+    [
+        "not price > 1",
+        "not (price > 1 and mean_price > 0)",
+        "not (price < 5 or price > 10)",
+        "GIC not in ['Banks'] and not price in [1.0]",
+    ],
+)
+def test_missing_values_never_fire_a_rule(universe, when):
+    """Test that a comparison with NaN stays unknown under negation"""
+
+    symbols, c = universe
+    c["GIC"][:5] = np.nan
+    hits = evaluate_rules(compile_rules([Rule("r", "R", when)]), symbols, c)
+
+    assert len(hits) > 0
+    assert not set(hits["symbol"]) & set(symbols[:5])
+
+
+def test_register_columns_from_bigquery_are_usable_in_rules():
+    """Test NUMERIC (Decimal/None), nullable and string columns as BigQuery returns them"""
+
+    register = pd.DataFrame(
+        {
+            "symbol": ["AAA", "BBB", "CCC", "DDD"],
+            "GIC": pd.array(["Energy", None, "Banks", "Energy"], dtype="string"),
+            "market_cap": [Decimal("2.5e9"), None, Decimal("5e8"), Decimal("1.2e10")],
+            "employees": pd.array([100, None, 30, 5000], dtype="Int64"),
+            "price": pd.array([2.0, 3.0, None, 4.0], dtype="Float64"),
+        }
+    )
+    rules = compile_rules(
+        [
+            Rule("big", "Big", "price > 1 and market_cap > 1000000000"),
+            Rule("cheap", "Cheap", "market_cap / price > 1e9 and employees < 1000"),
+            Rule("not_banks", "Not banks", "not GIC in ['Banks']"),
+        ]
+    )
+
+    hits = evaluate_rules(rules, register["symbol"], rule_columns(register))
+
+    assert hits.groupby("rule", observed=True)["symbol"].apply(list).to_dict() == {
+        "big": ["AAA", "DDD"],
+        "cheap": ["AAA"],
+        "not_banks": ["AAA", "DDD"],
+    }
+
+
+@pytest.mark.parametrize(
+    "when",
+    ["__import__('os')", "price.real > 1", "1 < price < 2", "price in mean_price"],
+)
+def test_unsupported_expressions_are_rejected(when):
+    """Test that anything outside the rule grammar fails to compile"""
+
+    with pytest.raises(ValueError):
+        compile_rules([Rule("bad", "Bad", when)])
+
+
+def test_dozens_of_rules_evaluate_in_milliseconds(universe):
+    """Test that 40 rules over 2,000 symbols are evaluated in one fast pass"""
+
+    symbols, c = universe
+    rules = compile_rules(
+        [
+            Rule(f"r{i}", f"R{i}", f"price > 1 and price < mean_price * {1 - i / 100}")
+            for i in range(40)
+        ]
+    )
+
+    start = perf_counter()
+    hits = evaluate_rules(rules, symbols, c)
+    elapsed = perf_counter() - start
+
+    assert len(hits) > 0
+    assert elapsed < 0.05
@@ -0,0 +1,42 @@
+"""Unit tests for the task graph runner"""
+
+from time import monotonic, sleep
+
+import pytest
+
+from messenger.utils.tasks import Task, run_tasks
+
+
+def slow(value, seconds=0.2):
+    """Returns "value" after "seconds" """
+    sleep(seconds)
+    return value
+
+
+def test_run_tasks_overlaps_independent_tasks():
+    """Test that independent tasks run concurrently and dependents get their results"""
+
+    tasks = {
+        "prices": Task(lambda: slow(1)),
+        "companies": Task(lambda: slow(2, 0.1)),
+        "quotes": Task(lambda companies: slow(companies * 10, 0.1), ("companies",)),
+        "send": Task(lambda *args: sum(args), ("prices", "quotes")),
+    }
+
+    start = monotonic()
+    results = run_tasks(tasks)
+
+    assert results["send"] == 21
+    assert monotonic() - start < 0.35
+
+
+def test_run_tasks_times_out_without_waiting():
+    """Test that a task over its timeout fails the graph straight away"""
+
+    tasks = {"stuck": Task(lambda: slow(None, 2), timeout=0.1)}
+
+    start = monotonic()
+    with pytest.raises(TimeoutError):
+        run_tasks(tasks)
+
+    assert monotonic() - start < 1
@@ -0,0 +1,97 @@
+"""Unit tests for the streaming price watcher"""
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from messenger.utils.watcher import PriceWatcher, RollingWindow, watch
+
+MINUTE = 60 * 10**9
+
+
+def test_rolling_window_matches_recomputed_stats():
+    """Test the rolling stats against a full recompute, across evictions and growth"""
+
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(1, 2, 3000)
+    times = np.arange(len(prices)) * MINUTE
+    window_ns = 500 * MINUTE
+
+    seeded = RollingWindow(window_ns)
+    seeded.seed(times[:1000], prices[:1000])
+    window = RollingWindow(window_ns, capacity=4)
+
+    for i, (t, price) in enumerate(zip(times, prices)):
+        window.update(t, price)
+        if i >= 1000:
+            seeded.update(t, price)
+
+        if i % 97 == 0 or i == 999:
+            held = prices[(times > t - window_ns) & (times <= t)]
+            for w in [window, seeded] if i >= 999 else [window]:
+                assert len(w) == len(held)
+                assert (w.min, w.max) == (held.min(), held.max())
+                assert np.isclose(w.mean, held.mean())
+
+
+def test_watcher_alerts_once_when_a_condition_is_met():
+    """Test that a buy alert is emitted on the tick which breaks the window low"""
+
+    alerts = []
+    watcher = PriceWatcher(alerts.append, window=pd.Timedelta(days=1))
+    watcher.seed(
+        pd.DataFrame(
+            {
+                "symbol": ["ABC"] * 3,
+                "timestamp": pd.to_datetime(
+                    ["2020-01-01 10:00", "2020-01-01 11:00", "2020-01-01 12:00"]
+                ),
+                "price": [10.0, 11.0, 12.0],
+            }
+        )
+    )
+
+    t = pd.Timestamp("2020-01-01 13:00").value
+    watcher.tick("ABC", t, 10.5)
+    assert alerts == []
+
+    watcher.tick("ABC", t + MINUTE, 9.0)
+    watcher.tick("ABC", t + 2 * MINUTE, 8.0)
+    assert [(a["symbol"], a["signal"], a["min_price"]) for a in alerts] == [
+        ("ABC", "buy", 10.0)
+    ]
+
+
+def test_watch_polls_at_the_cadence():
+    """Test that the watch loop feeds each poll's quotes to the watcher"""
+
+    alerts = []
+    watcher = PriceWatcher(alerts.append)
+    prices = iter([1.5, 2.0, 1.2])
+
+    def fetch():
+        return pd.DataFrame({"symbol": ["ABC"], "currentPrice": [next(prices)]})
+
+    asyncio.run(watch(watcher, fetch, cadence=0, iterations=3))
+
+    assert len(watcher.windows["ABC"]) == 3
+    assert [a["signal"] for a in alerts] == ["sell", "buy"]
+
+
+def test_watch_skips_quotes_whose_market_time_has_not_advanced():
+    """Test that the close polled overnight is added to the window only once"""
+
+    watcher = PriceWatcher(lambda alert: None)
+    close = pd.Timestamp("2020-01-01 06:10")
+    polls = iter([close - pd.Timedelta(minutes=1), close, close, close])
+
+    def fetch():
+        return pd.DataFrame(
+            {"symbol": ["ABC"], "currentPrice": [1.5], "marketTime": [next(polls)]}
+        )
+
+    asyncio.run(watch(watcher, fetch, cadence=0, iterations=4))
+
+    assert len(watcher.windows["ABC"]) == 2
+    assert watcher.last_times["ABC"] == close.value
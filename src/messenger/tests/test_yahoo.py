@@ -0,0 +1,36 @@
+"""Unit tests for fetching current prices from Yahoo"""
+
+import pandas as pd
+
+from messenger.utils.benchmark import benchmark_quote_modes
+from messenger.utils.yahoo import get_stock_prices
+
+
+def test_quote_and_financial_data_modes_agree(fake_yahoo):
+    """Test that the batched quotes give the same prices in far fewer requests"""
+
+    tickers = [f"S{i:03d}.ax" for i in range(250)] + ["MISSING.ax"]
+
+    quotes = get_stock_prices(tickers, mode="quotes")
+    financial_data = get_stock_prices(tickers, mode="financial_data")
+
+    pd.testing.assert_frame_equal(
+        quotes.reset_index(drop=True), financial_data.reset_index(drop=True)
+    )
+    assert quotes["symbol"].iloc[0] == "S000"
+    assert len(quotes) == 250
+    assert len(fake_yahoo["quotes"]) == 1
+    assert len(fake_yahoo["financial_data"]) == 251
+    assert get_stock_prices(tickers, market_time=True)["marketTime"].iloc[0] == (
+        pd.Timestamp("2023-06-22 00:00")
+    )
+
+
+def test_benchmark_quote_modes(fake_yahoo):
+    """Test that the benchmark reports both modes"""
+
+    results = benchmark_quote_modes([f"S{i:03d}.ax" for i in range(250)])
+
+    assert results["mode"].tolist() == ["financial_data", "quotes"]
+    assert results["prices"].tolist() == [250, 250]
+    assert results["bytes"].iloc[1] < results["bytes"].iloc[0]
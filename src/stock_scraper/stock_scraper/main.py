@@ -3,15 +3,46 @@
 import os
 from time import perf_counter
 from base64 import b64decode
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import chain
+from functools import partial
 import json
 
 import pandas as pd
 
 # pylint: disable=import-error
-from utils.utils import read_from_bg, load_to_bg, save_data_to_gcs
-from utils.asx import get_listed_companies
-from utils.yahoo import get_stock_data
+from utils.utils import read_from_bg, load_to_bg, merge_to_bg, read_prices_between
+from utils.archive import write_archive, read_archive, compact_archive
+from utils.asx import (
+    download_listed_companies,
+    diff_listed_companies,
+    write_validators,
+)
+from utils.state import get_state_store
+from utils.watermarks import read_watermarks, update_watermarks, rebuild_watermarks
+from utils.windows import plan_fetch_windows, MAX_HISTORY
+from utils.aggregate import resample_to_hourly
+from utils.pipeline import stream_prices
+from utils.activity import (
+    COUNT_DTYPES,
+    read_activity,
+    scheduled_time,
+    select_symbols,
+    update_activity,
+)
+from utils.retry_queue import read_retry_queue, update_retry_queue
+from utils.backfill import plan_shards, read_manifest, write_manifest, run_shards
+from utils.gaps import (
+    find_gaps,
+    summarise_gaps,
+    plan_gap_windows,
+    stored_keys,
+    drop_stored_rows,
+)
+from utils.schemas import PRICES_SCHEMA, COMPANIES_SCHEMA
+
+# utils.yahoo (and yahooquery) is imported by the handlers which scrape, and the
+# warehouse clients on first use, to keep cold starts of the other methods fast.
 
 PROJECT_ID = os.environ.get("PROJECT_ID")
 URL = os.environ.get("LISTED_COMPANIES_URL")
@@ -21,6 +52,13 @@ HOURLY_PRICES_TABLE = os.environ.get("HOURLY_PRICES_TABLE")
 MINUTELY_PRICES_TABLE = os.environ.get("MINUTELY_PRICES_TABLE")
 HOURLY_INDEX_TABLE = os.environ.get("HOURLY_INDEX_TABLE")
 BUCKET = os.environ.get("BUCKET")
+STATE_DATASET = os.environ.get("STATE_DATASET")
+STATE_DB = os.environ.get("STATE_DB")
+ARCHIVE_ROOT = os.environ.get("ARCHIVE_ROOT", f"gs://{BUCKET}/prices")
+ARCHIVE_SYMBOL_BUCKETS = int(os.environ.get("ARCHIVE_SYMBOL_BUCKETS", 0))
+BACKFILL_MANIFEST = os.environ.get("BACKFILL_MANIFEST", "backfill_manifest.json")
+
+STORE = get_state_store(PROJECT_ID, STATE_DATASET, STATE_DB)
 
 ##################
 ## Main Handler ##
@@ -30,7 +68,7 @@ BUCKET = os.environ.get("BUCKET")
 def main(event=None, context=None):
     """GCF handler function to decoed the event data and route to different method"""
 
-    if set(event.keys()) == {"method", "interval"}:  # Invoked manually.
+    if "data" not in event:  # Invoked manually.
         pass
     else:  # Invoked via pubsub.
         event = json.loads(b64decode(event["data"]).decode("utf-8"))
@@ -40,10 +78,44 @@ def main(event=None, context=None):
 
     print("Function started, method:", method, "interval:", interval)
 
+    if method == "watermarks":  # One-off rebuild from the full history table.
+        rebuild_watermarks(STORE, PROJECT_ID, prices_table(interval))
+        return
+
+    if method == "compact":  # Compacts a day of per-run archive files.
+        yesterday = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d")
+        compact_archive(ARCHIVE_ROOT, event.get("date", yesterday))
+        return
+
+    if method == "replay":  # Reloads archived prices without touching Yahoo.
+        replay_prices(prices_table(interval), event["start"], event["end"])
+        return
+
+    if method == "retry":  # Re-scrapes only the symbols which failed last time.
+        scrape_prices(
+            read_retry_queue(STORE, prices_table(interval)),
+            table=prices_table(interval),
+            interval=interval,
+        )
+        return
+
+    if method == "gaps":  # Re-fetches the bars missing from the last "days" days.
+        repair_gaps(interval, event.get("days", 28), event.get("min_bars", 1))
+        return
+
     # Fetch symbols
     symbols = fetch_symbols(method)
 
     # Ingest data
+    if method == "listed_companies" and len(symbols) > 0:  # Backfills new listings.
+        scrape_prices(
+            symbols,
+            table=MINUTELY_PRICES_TABLE,
+            interval="1m",
+            gcs_save=True,
+            track_activity=True,
+        )
+
     if method == "index":
 
         scrape_prices(
@@ -52,12 +124,26 @@ def main(event=None, context=None):
 
     if method == "stock":
         if interval == "1m":
+            now = scheduled_time(getattr(context, "timestamp", None))
+            symbols = select_symbols(
+                symbols,
+                read_activity(STORE),
+                now=now,
+                full_refresh=event.get("full_refresh"),
+            )
+            queued = set(read_retry_queue(STORE, MINUTELY_PRICES_TABLE))
+            symbols += sorted(queued - set(symbols))
             scrape_prices(
-                symbols, table=MINUTELY_PRICES_TABLE, interval="1m", gcs_save=True
+                symbols,
+                table=MINUTELY_PRICES_TABLE,
+                interval="1m",
+                gcs_save=True,
+                track_activity=True,
+                now=now,
             )
 
         if interval == "1h":
-            scrape_prices(symbols, table=HOURLY_PRICES_TABLE, interval="1h")
+            derive_hourly_prices(symbols)
 
 
 ##################
@@ -65,12 +151,16 @@ def main(event=None, context=None):
 ##################
 
 
+def prices_table(interval: str) -> str:
+    """Returns the stock prices table for an interval"""
+    return MINUTELY_PRICES_TABLE if interval == "1m" else HOURLY_PRICES_TABLE
+
+
 def fetch_symbols(method: str) -> list:
     """Fetches the symbols to ingest"""
     if method == "listed_companies":
         print("Fetching register of listed ASX companies from ASX")
-        listed_entities = get_listed_companies(URL)
-        load_to_bg(PROJECT_ID, listed_entities, COMPANIES_TABLE, "replace")
+        listed_entities = refresh_listed_companies()
         symbols = [f"{ii}.ax" for ii in listed_entities["symbol"]]
 
     if method == "index":
@@ -88,68 +178,300 @@ def fetch_symbols(method: str) -> list:
     return symbols
 
 
+def refresh_listed_companies() -> pd.DataFrame:
+    """
+    Applies the changes to the ASX register since the last download to the
+    companies table, skipping the download if the register is unchanged.
+    Returns the newly listed companies.
+    """
+
+    current, validators = download_listed_companies(URL, STORE)
+    if current is None:
+        write_validators(STORE, URL, validators)
+        return pd.DataFrame(columns=["symbol"])
+
+    previous = read_from_bg(PROJECT_ID, COMPANIES_TABLE)
+    if len(previous) == 0:
+        load_to_bg(
+            PROJECT_ID, current, COMPANIES_TABLE, "replace", schema=COMPANIES_SCHEMA
+        )
+        write_validators(STORE, URL, validators)
+        return current
+
+    diff = diff_listed_companies(previous, current)
+    changes = pd.concat(
+        [
+            pd.concat([diff["listed"], diff["changed"]]).assign(deleted=False),
+            diff["delisted"].reindex(columns=current.columns).assign(deleted=True),
+        ],
+        ignore_index=True,
+    )
+    if len(changes) > 0:
+        merge_to_bg(PROJECT_ID, changes, COMPANIES_TABLE, "symbol", COMPANIES_SCHEMA)
+
+    # Only remember this version once it has been applied
+    write_validators(STORE, URL, validators)
+
+    return diff["listed"]
+
+
 #############
 ## Scraper ##
 #############
 
 
 def scrape_prices(
-    tickers: list, table: str, interval: str = "1h", bq_mode="append", gcs_save=False
+    tickers: list,
+    table: str,
+    interval: str = "1h",
+    bq_mode="append",
+    gcs_save=False,
+    track_activity=False,
+    now=None,
 ):
     """
     Ingests the ASX stock data with a "interval" granularity.
-    This function ingests all price data in a certain period
-    and writes to BQ with mode="bq_mode".
-    If "gcs_save" is True, save data to GCS.
+    Each symbol is fetched from its ingestion watermark onwards
+    and the new rows are written to BQ with mode="bq_mode".
+    If "gcs_save" is True, also archive the data to GCS as Parquet.
+    If "track_activity" is True, update the per-symbol activity statistics,
+    stamped with "now", the time the symbols were selected at.
+    Symbols which still fail after retries are queued for the "retry" method.
     """
 
-    print(f"Importing latest timestamp from {table} in BQ...")
-    query = f"""
-        SELECT symbol, MAX(timestamp) as latest_timestamp
-        FROM {table} GROUP BY symbol ORDER BY latest_timestamp desc
+    from utils.yahoo import iter_stock_data
+
+    latest_prices = load_latest_prices(table)
+    failures = {}
+
+    batches = chain.from_iterable(
+        iter_stock_data(group, None, interval, start=start, end=end, failures=failures)
+        for start, end, group in plan_fetch_windows(tickers, latest_prices, interval)
+    )
+
+    now = now or datetime.utcnow()
+    counts = ingest_prices(batches, latest_prices, table, bq_mode, archive=gcs_save)
+    update_retry_queue(STORE, table, tickers, failures, now)
+
+    if track_activity:
+        succeeded = [t for t in tickers if t not in failures]
+        update_activity(STORE, succeeded, counts, now)
+
+
+def derive_hourly_prices(tickers: list):
     """
-    latest_prices = pd.read_gbq(query, project_id=PROJECT_ID, dialect="standard")
-    if len(latest_prices) > 0:
-        latest_prices["latest_timestamp"] = latest_prices[
-            "latest_timestamp"
-        ].dt.tz_localize(None)
+    Builds hourly bars from the minutely bars already ingested and loads them
+    to the hourly table, instead of scraping Yahoo a second time. Symbols whose
+    hourly history ends before the minutely retention window (or is missing)
+    fall back to a direct hourly scrape.
+    """
+
+    now = datetime.utcnow()
+    latest_prices = load_latest_prices(HOURLY_PRICES_TABLE)
+
+    symbols = pd.Series(tickers).str.replace(".ax", "", regex=False)
+    watermarks = symbols.map(latest_prices.set_index("symbol")["latest_timestamp"])
+    derivable = (watermarks >= pd.Timestamp(now) - MAX_HISTORY["1m"]).values
+
+    if derivable.any():
+        start = watermarks[derivable].min() + pd.Timedelta(hours=1)
+        minutely = read_prices_between(
+            PROJECT_ID, MINUTELY_PRICES_TABLE, start, pd.Timestamp(now).floor("h")
+        )
+        minutely = minutely[minutely["symbol"].isin(symbols[derivable])]
+
+        bars = resample_to_hourly(minutely, now)
         print(
-            f"Last timestamp found in {table} is {latest_prices.latest_timestamp.iloc[0]}"
+            f"Derived {len(bars)} hourly bars for {derivable.sum()} symbols "
+            f"from {len(minutely)} minutely bars"
         )
-        period = "1d" if interval == "1m" else "4w"
+        ingest_prices([bars], latest_prices, HOURLY_PRICES_TABLE)
 
-    else:
-        print(f"No latest timestamp found in {table}")
-        period = "1d" if interval == "1m" else "2y"
+    fallback = [t for t, ok in zip(tickers, derivable) if not ok]
+    if len(fallback) > 0:
+        print(f"Falling back to a direct hourly scrape for {len(fallback)} symbols")
+        scrape_prices(fallback, table=HOURLY_PRICES_TABLE, interval="1h")
+
+
+def replay_prices(table: str, start: str, end: str):
+    """Reloads archived prices between two dates into "table" without touching Yahoo."""
+
+    batches = read_archive(ARCHIVE_ROOT, start, end)
+    ingest_prices(batches, load_latest_prices(table), table, archive=False)
+
+
+def repair_gaps(interval: str, days: int, min_bars: int = 1):
+    """
+    Finds the bars missing from the stored history over the last "days" days
+    and re-fetches just the missing ranges from Yahoo. Only bars which are not
+    already stored are loaded, and the watermarks are left untouched.
+    """
+
+    from utils.yahoo import iter_stock_data
+
+    table = prices_table(interval)
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
 
-    print(
-        f"Fetching prices for listed companies in period {period} (interval {interval})"
+    print(f"Checking {table} for gaps between {start} and {end}...")
+    stored = read_prices_between(
+        PROJECT_ID, table, start, end, columns=["symbol", "timestamp"]
     )
-    stock_data = get_stock_data(tickers, period, interval)
+    report = find_gaps(stored, interval, min_bars=min_bars)
+    print(summarise_gaps(report).head(20).to_string(index=False))
+
+    keys = stored_keys(stored)
+    batches = (
+        drop_stored_rows(df, keys)
+        for window_start, window_end, group in plan_gap_windows(report, interval)
+        for df in iter_stock_data(
+            group, None, interval, start=window_start, end=window_end
+        )
+    )
+
+    def load_chunk(df, chunk_index):
+        load_to_bg(PROJECT_ID, df, table, "append", schema=PRICES_SCHEMA)
+
+    no_watermarks = pd.DataFrame(columns=["symbol", "latest_timestamp"])
+    stream_prices(batches, no_watermarks, [load_chunk])
 
-    if len(stock_data) > 0:
-        stock_data = stock_data.merge(latest_prices, on="symbol", how="left")
-        stock_data["latest_timestamp"] = stock_data["latest_timestamp"].fillna(
-            datetime(2020, 1, 1)
+
+def backfill(
+    interval: str = "1h",
+    start: str = None,
+    end: str = None,
+    processes: int = 4,
+    manifest: str = BACKFILL_MANIFEST,
+    symbols: list = None,
+):
+    """
+    Backfills the history of the listed companies (or "symbols") between
+    "start" and "end" into the prices table of "interval". The work is split
+    into shards run on "processes" processes and completed shards are
+    checkpointed to "manifest", so running the same command again resumes an
+    interrupted backfill. Without "start"/"end", the range of the manifest is
+    reused, or the full history Yahoo serves is fetched.
+    Intended for filling a new table, existing rows in the range are not checked.
+    """
+
+    table = prices_table(interval)
+    plan = read_manifest(manifest)
+
+    end = pd.Timestamp(
+        end or plan.get("end") or datetime.utcnow().replace(microsecond=0)
+    )
+    start = pd.Timestamp(start or plan.get("start") or end - MAX_HISTORY[interval])
+    tickers = symbols or fetch_symbols("stock")
+
+    plan.update(
+        {"table": table, "interval": interval, "start": str(start), "end": str(end)}
+    )
+    write_manifest(manifest, plan)
+
+    shards = plan_shards(tickers, start, end, interval)
+    worker = partial(backfill_shard, table=table, interval=interval)
+
+    latest = []
+    try:
+        for result in run_shards(shards, worker, manifest, processes):
+            latest.append(result["latest"])
+    finally:
+        if len(latest) > 0:
+            update_watermarks(STORE, table, pd.concat(latest, ignore_index=True))
+
+
+def backfill_shard(shard: dict, table: str, interval: str) -> dict:
+    """
+    Fetches and loads one backfill shard with the same cleaning and load path
+    as "scrape_prices". The shard is loaded in a single load job, so a shard
+    is either fully loaded or not at all when a backfill is interrupted.
+    """
+
+    from utils.yahoo import iter_stock_data
+
+    failures = {}
+    start, end = pd.Timestamp(shard["start"]), pd.Timestamp(shard["end"])
+
+    frames = list(
+        iter_stock_data(
+            shard["tickers"], None, interval, start=start, end=end, failures=failures
         )
-        stock_data = stock_data[
-            stock_data["timestamp"] > stock_data["latest_timestamp"]
-        ]
+    )
+    if len(frames) == 0:
+        return {"rows": 0, "latest": pd.DataFrame(), "failures": failures}
 
-        print(f"Success! Returned {len(stock_data)} rows.")
+    df = pd.concat(frames, ignore_index=True)
+    df = df[(df["timestamp"] >= start) & (df["timestamp"] < end)]
+    load_to_bg(PROJECT_ID, df, table, "append", schema=PRICES_SCHEMA)
 
-        load_to_bg(
-            PROJECT_ID, stock_data.drop(columns="latest_timestamp"), table, bq_mode
+    latest = df.groupby("symbol", as_index=False).agg(timestamp=("timestamp", "max"))
+
+    return {"rows": len(df), "latest": latest, "failures": failures}
+
+
+def load_latest_prices(table: str):
+    """Reads the per-symbol watermarks of "table", rebuilding them if missing."""
+
+    print(f"Importing latest timestamps for {table} from the watermark store...")
+    latest_prices = read_watermarks(STORE, table)
+    if len(latest_prices) == 0:
+        latest_prices = rebuild_watermarks(STORE, PROJECT_ID, table)
+
+    if len(latest_prices) > 0:
+        print(
+            f"Last timestamp found in {table} is {latest_prices.latest_timestamp.max()}"
+        )
+    else:
+        print(f"No latest timestamp found in {table}")
+
+    return latest_prices
+
+
+def ingest_prices(batches, latest_prices, table: str, bq_mode="append", archive=False):
+    """
+    Streams price batches into "table". The watermarks of the loaded chunks
+    are advanced in one write at the end of the run, even if it fails part way.
+    If "archive" is True, the new rows are also written to the Parquet archive.
+    Returns the number of new bars and their volume per symbol.
+    """
+
+    now = int(datetime.now().timestamp())
+    loaded = []
+
+    def load_chunk(df, chunk_index):
+        load_to_bg(PROJECT_ID, df, table, bq_mode, schema=PRICES_SCHEMA)
+        loaded.append(df.groupby("symbol", as_index=False)["timestamp"].max())
+
+    def archive_chunk(df, chunk_index):
+        write_archive(
+            df,
+            ARCHIVE_ROOT,
+            name=f"ingest_timestamp={now}-{chunk_index}",
+            symbol_buckets=ARCHIVE_SYMBOL_BUCKETS,
         )
 
-        if gcs_save:
-            now = int(datetime.now().timestamp())
-            save_data_to_gcs(
-                stock_data, f"gs://{BUCKET}/prices/ingest_timestamp={now}.jsonlines"
+    tallies = []
+
+    def tally_chunk(df, chunk_index):
+        tallies.append(
+            df.groupby("symbol", as_index=False).agg(
+                bars=("timestamp", "size"), volume=("volume", "sum")
             )
+        )
 
-    else:
+    sinks = [load_chunk, archive_chunk] if archive else [load_chunk]
+
+    try:
+        counts = stream_prices(batches, latest_prices, sinks + [tally_chunk])
+    finally:
+        if len(loaded) > 0:
+            update_watermarks(STORE, table, pd.concat(loaded, ignore_index=True))
+
+    if counts["retained"] == 0:
         print("No price data found!")
+        return pd.DataFrame(columns=list(COUNT_DTYPES)).astype(COUNT_DTYPES)
+
+    return pd.concat(tallies).groupby("symbol", as_index=False).sum()
 
 
 ##########
@@ -157,6 +479,8 @@ def scrape_prices(
 ##########
 
 if __name__ == "__main__":
+    import fire
+
     start = perf_counter()
-    main()
+    fire.Fire({"main": main, "backfill": backfill})
     print(f"Execution time: {perf_counter() - start:.2f} seconds")
@@ -0,0 +1,151 @@
+"""Per-symbol activity statistics used to tier how often symbols are scraped
+
+Symbols are assigned to tiers from their recent activity:
+    hot:  traded within HOT_WINDOW with at least HOT_BARS recent bars, every run
+    warm: traded within WARM_WINDOW, at most every WARM_EVERY
+    cold: everything else, only on full refresh runs
+A cold symbol that returns bars on a full refresh is promoted on the next run.
+Symbols are selected and stamped with the run's scheduled time, so jitter in
+when a run starts does not push a warm symbol back by a whole run.
+"""
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ACTIVITY = "symbol_activity"
+COLUMNS = ["symbol", "recent_bars", "recent_volume", "last_non_empty", "last_fetched"]
+COUNT_DTYPES = {"symbol": object, "bars": "int64", "volume": "float64"}
+
+HOT_WINDOW = pd.Timedelta(days=1)
+HOT_BARS = 30
+WARM_WINDOW = pd.Timedelta(days=7)
+WARM_EVERY = pd.Timedelta(hours=int(os.environ.get("WARM_EVERY_HOURS", 2)))
+FULL_REFRESH_HOURS = [
+    int(h) for h in os.environ.get("FULL_REFRESH_HOURS", "0").split(",") if h
+]
+
+# Weight of the previous statistics when a symbol is fetched again
+DECAY = 0.5
+
+
+def scheduled_time(timestamp: str = None) -> pd.Timestamp:
+    """
+    Returns the scheduled time of a run, the minute of its Pub/Sub event
+    "timestamp" (UTC), or of the current time when run manually.
+    """
+
+    if timestamp is None:
+        return pd.Timestamp(datetime.utcnow()).floor("min")
+
+    return pd.Timestamp(timestamp).tz_convert("UTC").tz_localize(None).floor("min")
+
+
+def read_activity(store) -> pd.DataFrame:
+    """Reads the activity statistics with consistent dtypes."""
+
+    df = store.read(ACTIVITY)
+    if len(df) == 0:
+        df = pd.DataFrame(columns=COLUMNS)
+
+    for column in ["last_non_empty", "last_fetched"]:
+        df[column] = pd.to_datetime(df[column])
+        if df[column].dt.tz is not None:
+            df[column] = df[column].dt.tz_localize(None)
+        df[column] = df[column].astype("datetime64[ns]")
+    df[["recent_bars", "recent_volume"]] = df[["recent_bars", "recent_volume"]].astype(
+        float
+    )
+
+    return df[COLUMNS]
+
+
+def assign_tiers(activity: pd.DataFrame, now: datetime) -> pd.Series:
+    """Assigns each symbol to the hot, warm or cold tier."""
+
+    since_active = pd.Timestamp(now) - activity["last_non_empty"]
+
+    return pd.Series(
+        np.select(
+            [
+                (since_active <= HOT_WINDOW) & (activity["recent_bars"] >= HOT_BARS),
+                since_active <= WARM_WINDOW,
+            ],
+            ["hot", "warm"],
+            default="cold",
+        ),
+        index=activity.index,
+    )
+
+
+def select_symbols(
+    tickers: list, activity: pd.DataFrame, now: datetime = None, full_refresh=None
+) -> list:
+    """
+    Returns the tickers due to be scraped this run. Symbols without statistics
+    are always scraped. Every symbol is scraped on a full refresh, which by
+    default happens on the runs in the FULL_REFRESH_HOURS (UTC).
+    """
+
+    now = pd.Timestamp(now or datetime.utcnow())
+    if full_refresh is None:
+        full_refresh = now.hour in FULL_REFRESH_HOURS
+
+    df = pd.DataFrame({"ticker": tickers})
+    df["symbol"] = df["ticker"].str.replace(".ax", "", regex=False)
+    df = df.merge(activity, on="symbol", how="left")
+
+    df["tier"] = assign_tiers(df, now)
+    df.loc[df["last_fetched"].isna(), "tier"] = "new"
+
+    due = (
+        full_refresh
+        | df["tier"].isin(["hot", "new"])
+        | ((df["tier"] == "warm") & (now - df["last_fetched"] >= WARM_EVERY))
+    )
+
+    tiers = df["tier"].value_counts().to_dict()
+    print(
+        f"Scraping {due.sum()} of {len(df)} symbols "
+        f"(full_refresh={full_refresh}, tiers={tiers})"
+    )
+
+    return df.loc[due, "ticker"].tolist()
+
+
+def update_activity(store, tickers: list, counts: pd.DataFrame, now: datetime = None):
+    """
+    Updates the activity statistics of the tickers that were just scraped.
+    "counts" holds the number of new bars and their volume for each symbol.
+    "now" should be the time the tickers were selected at, see scheduled_time.
+    """
+
+    now = pd.Timestamp(now or datetime.utcnow())
+
+    fetched = pd.DataFrame(
+        {"symbol": pd.Series([t.replace(".ax", "") for t in tickers], dtype=object)}
+    )
+    counts = counts.astype(COUNT_DTYPES)
+    fetched = fetched.merge(counts, on="symbol", how="left").fillna(
+        {"bars": 0, "volume": 0}
+    )
+
+    activity = read_activity(store)
+    df = activity.merge(fetched, on="symbol", how="outer", indicator=True)
+    was_fetched = df["_merge"] != "left_only"
+
+    df.loc[was_fetched, "recent_bars"] = (
+        DECAY * df["recent_bars"].fillna(0) + df["bars"]
+    )
+    df.loc[was_fetched, "recent_volume"] = (
+        DECAY * df["recent_volume"].fillna(0) + df["volume"]
+    )
+    df.loc[was_fetched, "last_fetched"] = now
+    df.loc[was_fetched & (df["bars"] > 0), "last_non_empty"] = now
+
+    store.write(ACTIVITY, df[COLUMNS])
+
+    tiers = assign_tiers(df, now).value_counts().to_dict()
+    print(f"Updated activity for {was_fetched.sum()} symbols, tiers: {tiers}")
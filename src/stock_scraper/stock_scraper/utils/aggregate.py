@@ -0,0 +1,31 @@
+"""Aggregates minutely price bars into coarser bars"""
+
+from datetime import datetime
+
+import pandas as pd
+
+COLUMNS = ["symbol", "timestamp", "open", "high", "low", "close", "volume"]
+
+
+def resample_to_hourly(df: pd.DataFrame, now: datetime = None) -> pd.DataFrame:
+    """
+    Builds hourly OHLCV bars from minutely bars for every symbol at once.
+    Only hours which have finished before "now" are returned, so a bar is
+    never written from a partial hour.
+    """
+
+    now = pd.Timestamp(now or datetime.utcnow())
+
+    df = df.sort_values(["symbol", "timestamp"])
+    df["timestamp"] = df["timestamp"].dt.floor("h")
+    df = df[df["timestamp"] < now.floor("h")]
+
+    bars = df.groupby(["symbol", "timestamp"], as_index=False, sort=False).agg(
+        open=("open", "first"),
+        high=("high", "max"),
+        low=("low", "min"),
+        close=("close", "last"),
+        volume=("volume", "sum"),
+    )
+
+    return bars[COLUMNS]
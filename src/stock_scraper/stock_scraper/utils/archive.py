@@ -0,0 +1,134 @@
+"""Partitioned Parquet archive of scraped prices
+
+Files are laid out as {root}/date=YYYY-MM-DD[/bucket=NN]/{name}.parquet and
+written with zstd compression. The root can be any fsspec URL, so the same
+code writes to gs:// in production and to local disk offline.
+"""
+
+import posixpath
+
+import fsspec
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+COMPACTED = "daily.parquet"
+
+
+def write_archive(
+    df: pd.DataFrame, root: str, name: str, symbol_buckets: int = 0
+) -> list:
+    """
+    Writes prices to the archive, partitioned by trading date and, if
+    "symbol_buckets" is set, by a stable hash of the symbol.
+    Returns the paths written.
+    """
+
+    fs, root = fsspec.core.url_to_fs(root)
+
+    keys = [df["timestamp"].dt.strftime("date=%Y-%m-%d")]
+    if symbol_buckets:
+        bucket = pd.util.hash_pandas_object(df["symbol"], index=False) % symbol_buckets
+        keys.append(bucket.map("bucket={:02d}".format))
+
+    paths = []
+    for key, part in df.groupby(keys):
+        directory = posixpath.join(root, *key)
+        fs.makedirs(directory, exist_ok=True)
+
+        path = posixpath.join(directory, f"{name}.parquet")
+        _write_parquet(fs, path, part)
+        paths.append(path)
+
+    print(f"Archived {len(df)} rows to {len(paths)} files under {root}")
+
+    return paths
+
+
+def read_archive(root: str, start: str, end: str, symbols: list = None):
+    """
+    Yields the archived prices for each trading date between "start" and "end"
+    (inclusive), oldest first. Used to replay prices without touching Yahoo.
+    """
+
+    fs, root = fsspec.core.url_to_fs(root)
+
+    for date in pd.date_range(start, end, freq="D").strftime("%Y-%m-%d"):
+        partition = posixpath.join(root, f"date={date}")
+        files = [
+            f for d in _list_partition(fs, partition) for f in _list_parquet(fs, d)
+        ]
+        if len(files) == 0:
+            continue
+
+        df = pd.concat([_read_parquet(fs, f) for f in files], ignore_index=True)
+        if symbols is not None:
+            df = df[df["symbol"].isin(symbols)]
+
+        print(f"Replaying {len(df)} archived rows for {date}")
+        yield df
+
+
+def compact_archive(root: str, date: str):
+    """
+    Compacts the small per-run files of one trading date into a single
+    daily file per partition, dropping duplicate (symbol, timestamp) rows.
+    """
+
+    fs, root = fsspec.core.url_to_fs(root)
+    partition = posixpath.join(root, f"date={date}")
+
+    for directory in _list_partition(fs, partition):
+        files = _list_parquet(fs, directory)
+        if len(files) <= 1:
+            continue
+
+        df = pd.concat([_read_parquet(fs, f) for f in files], ignore_index=True)
+        df = df.drop_duplicates(["symbol", "timestamp"], keep="last")
+        df = df.sort_values(["symbol", "timestamp"])
+
+        staging = posixpath.join(directory, "_" + COMPACTED)
+        _write_parquet(fs, staging, df)
+        fs.rm(files)
+        fs.mv(staging, posixpath.join(directory, COMPACTED))
+
+        print(f"Compacted {len(files)} files into {len(df)} rows in {directory}")
+
+
+def _list_partition(fs, partition: str) -> list:
+    """Lists a date partition and its symbol bucket directories."""
+
+    directories = [partition]
+    if fs.exists(partition):
+        directories += [d for d in fs.ls(partition, detail=False) if fs.isdir(d)]
+
+    return directories
+
+
+def _list_parquet(fs, directory: str) -> list:
+    """Lists the Parquet files directly under a directory, skipping staged files."""
+
+    if not fs.exists(directory):
+        return []
+
+    return sorted(
+        f
+        for f in fs.ls(directory, detail=False)
+        if f.endswith(".parquet") and not posixpath.basename(f).startswith("_")
+    )
+
+
+def _write_parquet(fs, path: str, df: pd.DataFrame):
+    """Writes a frame to a zstd-compressed Parquet file."""
+
+    with fs.open(path, "wb") as f:
+        pq.write_table(
+            pa.Table.from_pandas(df, preserve_index=False), f, compression="zstd"
+        )
+
+
+def _read_parquet(fs, path: str) -> pd.DataFrame:
+    """Reads a Parquet file to a frame."""
+
+    with fs.open(path, "rb") as f:
+        return pq.read_table(f).to_pandas()
@@ -1,12 +1,28 @@
 """Utility functions for interacting with the ASX website"""
 
+import hashlib
+import io
+
 import pandas as pd
+import requests
+
+VALIDATORS = "register_validators"
+VALIDATOR_COLUMNS = ["url", "etag", "last_modified", "content_hash"]
+
+REGISTER_KEY = "symbol"
+REGISTER_COLUMNS = ["symbol", "name", "GIC", "listing_date", "market_cap"]
 
 
 def get_listed_companies(url: str) -> pd.DataFrame:
     """Get a list of all companies currently listed on the ASX."""
 
-    df = pd.read_csv(url)
+    return parse_listed_companies(url)
+
+
+def parse_listed_companies(source) -> pd.DataFrame:
+    """Parses the ASX directory CSV from a URL, path or buffer."""
+
+    df = pd.read_csv(source)
     df["Listing date"] = pd.to_datetime(df["Listing date"], format="%d/%m/%Y")
     df["Market Cap"] = pd.to_numeric(df["Market Cap"], errors="coerce")
     columns_renamed = {
@@ -17,3 +33,109 @@ def get_listed_companies(url: str) -> pd.DataFrame:
         "Market Cap": "market_cap",
     }
     return df.rename(columns=columns_renamed)
+
+
+def download_listed_companies(url: str, store, timeout: int = 60):
+    """
+    Downloads the ASX directory only if it changed since the last download.
+    The ETag and Last-Modified validators of the previous response are sent
+    with the request, and a content hash catches servers which ignore them.
+    Returns the parsed register (None if it is unchanged) and the validators
+    of the response, to be saved with "write_validators" once applied.
+    """
+
+    validators = read_validators(store, url)
+
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        print("ASX register not modified since the last download")
+        return None, validators
+    response.raise_for_status()
+
+    latest = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": hashlib.sha256(response.content).hexdigest(),
+    }
+    if latest["content_hash"] == validators.get("content_hash"):
+        print("ASX register content unchanged since the last download")
+        return None, latest
+
+    print(f"Downloaded {len(response.content)} bytes of ASX register")
+    return parse_listed_companies(io.BytesIO(response.content)), latest
+
+
+def diff_listed_companies(previous: pd.DataFrame, current: pd.DataFrame) -> dict:
+    """
+    Compares two versions of the register on the symbol and returns a dict of
+    frames: "listed" (new symbols), "delisted" (removed symbols) and "changed"
+    (symbols whose details changed, with their current values).
+    """
+
+    previous = _normalise(previous)
+    current = _normalise(current)
+
+    df = previous.merge(
+        current, on=REGISTER_KEY, how="outer", suffixes=("_old", ""), indicator=True
+    )
+
+    values = [c for c in REGISTER_COLUMNS if c != REGISTER_KEY]
+    old = df[[f"{c}_old" for c in values]].set_axis(values, axis=1)
+    new = df[values]
+    differs = (old.ne(new) & ~(old.isna() & new.isna())).any(axis=1)
+
+    diff = {
+        "listed": df.loc[df["_merge"] == "right_only", REGISTER_COLUMNS],
+        "delisted": df.loc[df["_merge"] == "left_only", [REGISTER_KEY]],
+        "changed": df.loc[(df["_merge"] == "both") & differs, REGISTER_COLUMNS],
+    }
+    diff = {k: v.reset_index(drop=True) for k, v in diff.items()}
+
+    print(
+        f"ASX register diff: {len(diff['listed'])} listed, "
+        f"{len(diff['delisted'])} delisted, {len(diff['changed'])} changed"
+    )
+
+    return diff
+
+
+def _normalise(df: pd.DataFrame) -> pd.DataFrame:
+    """Aligns a register read from BQ or the ASX to the same columns and dtypes."""
+
+    df = df.reindex(columns=REGISTER_COLUMNS)
+    df["listing_date"] = pd.to_datetime(df["listing_date"])
+    if df["listing_date"].dt.tz is not None:
+        df["listing_date"] = df["listing_date"].dt.tz_localize(None)
+    df["market_cap"] = df["market_cap"].astype(float)
+
+    return df
+
+
+def read_validators(store, url: str) -> dict:
+    """Reads the HTTP validators and content hash of the last download of "url"."""
+
+    df = store.read(VALIDATORS)
+    if len(df) == 0 or url not in set(df["url"]):
+        return {}
+
+    row = df[df["url"] == url].iloc[0]
+    return {c: row[c] for c in VALIDATOR_COLUMNS if pd.notna(row[c])}
+
+
+def write_validators(store, url: str, validators: dict):
+    """Replaces the HTTP validators and content hash stored for "url"."""
+
+    df = store.read(VALIDATORS)
+    if len(df) == 0:
+        df = pd.DataFrame(columns=VALIDATOR_COLUMNS)
+
+    row = pd.DataFrame([{"url": url, **validators}], columns=VALIDATOR_COLUMNS)
+    df = pd.concat([df[df["url"] != url], row], ignore_index=True)
+
+    store.write(VALIDATORS, df[VALIDATOR_COLUMNS].astype("string"))
@@ -0,0 +1,170 @@
+"""Resumable, sharded backfill of historical prices
+
+The backfill is split into (symbols, date range) shards which are fetched
+and loaded by a process pool. Each completed shard is checkpointed to a
+local JSON manifest, so an interrupted backfill picks up where it stopped
+when it is run again with the same manifest. The symbols of a shard which
+could not be fetched are re-planned into a retry shard for the next run, up
+to the retry queue's RETRY_MAX_ATTEMPTS, after which they are dead-lettered
+in the manifest.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+
+import pandas as pd
+
+from .retry_queue import MAX_ATTEMPTS
+
+SHARD_SYMBOLS = int(os.environ.get("BACKFILL_SHARD_SYMBOLS", 50))
+
+# Yahoo caps the range of a single intraday request
+SHARD_DAYS = {"1m": 7, "1h": 60}
+
+
+def plan_shards(
+    tickers: list,
+    start: str,
+    end: str,
+    interval: str,
+    symbols_per_shard: int = SHARD_SYMBOLS,
+    days_per_shard: int = None,
+) -> list:
+    """
+    Splits a backfill into shards of at most "symbols_per_shard" tickers and
+    "days_per_shard" days. Shard ids are stable for the same plan, so they can
+    be matched against the manifest of an earlier run.
+    """
+
+    days_per_shard = days_per_shard or SHARD_DAYS[interval]
+    edges = pd.date_range(start, end, freq=f"{days_per_shard}D").append(
+        pd.DatetimeIndex([pd.Timestamp(end)])
+    )
+    edges = edges.unique()
+
+    shards = []
+    for i in range(0, len(tickers), symbols_per_shard):
+        group = sorted(tickers[i : i + symbols_per_shard])
+        digest = hashlib.sha1(",".join(group).encode()).hexdigest()[:10]
+
+        for window_start, window_end in zip(edges[:-1], edges[1:]):
+            shards.append(
+                {
+                    "id": f"{interval}-{window_start:%Y%m%dT%H%M}-{digest}",
+                    "tickers": group,
+                    "start": window_start.isoformat(),
+                    "end": window_end.isoformat(),
+                }
+            )
+
+    print(f"Planned {len(shards)} shards for {len(tickers)} symbols")
+
+    return shards
+
+
+def plan_retry_shard(shard: dict, tickers: list) -> dict:
+    """Plans a shard which re-fetches the failed "tickers" of "shard"."""
+
+    attempt = shard.get("attempt", 0) + 1
+    base = shard["id"].split("-retry")[0]
+    digest = hashlib.sha1(",".join(sorted(tickers)).encode()).hexdigest()[:10]
+
+    return {
+        **shard,
+        "id": f"{base}-retry{attempt}-{digest}",
+        "tickers": sorted(tickers),
+        "attempt": attempt,
+    }
+
+
+def read_manifest(path: str) -> dict:
+    """Reads a backfill manifest, returning an empty one if it does not exist."""
+
+    if not os.path.exists(path):
+        return {"completed": {}}
+
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(path: str, manifest: dict):
+    """Writes a backfill manifest atomically, so a crash never corrupts it."""
+
+    staging = f"{path}.tmp"
+    with open(staging, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, path)
+
+
+def run_shards(
+    shards: list,
+    worker,
+    manifest_path: str,
+    processes: int = 4,
+    max_attempts: int = MAX_ATTEMPTS,
+):
+    """
+    Runs worker(shard) for every shard not yet completed in the manifest on
+    a pool of "processes" processes. The worker returns a dict with the number
+    of "rows" loaded and the "failures" of symbols which could not be fetched.
+    Each result is checkpointed and yielded as soon as its shard completes.
+    A shard which raises is reported and left for the next run, and the
+    failed symbols of a completed shard are left for it as a retry shard,
+    unless they have already failed "max_attempts" times.
+    """
+
+    manifest = read_manifest(manifest_path)
+    completed = manifest["completed"]
+    retries = manifest.setdefault("retries", [])
+    pending = [s for s in shards + retries if s["id"] not in completed]
+
+    print(
+        f"Backfilling {len(pending)} shards "
+        f"({len(shards) + len(retries) - len(pending)} already completed)"
+    )
+
+    start = perf_counter()
+    done, failed, rows = 0, 0, 0
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(worker, shard): shard for shard in pending}
+
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                failed += 1
+                print(f"Shard {shard['id']} failed, left for the next run: {e!r}")
+                continue
+
+            done += 1
+            rows += result["rows"]
+            failures = sorted(result.get("failures", {}))
+            completed[shard["id"]] = {"rows": result["rows"], "failed": failures}
+            if len(failures) > 0 and shard.get("attempt", 0) + 1 < max_attempts:
+                retries.append(plan_retry_shard(shard, failures))
+                print(
+                    f"Shard {shard['id']}: {len(failures)} symbols left for the next run"
+                )
+            elif len(failures) > 0:
+                manifest.setdefault("dead_letter", {})[shard["id"]] = failures
+                print(f"Shard {shard['id']}: {len(failures)} symbols dead-lettered")
+            write_manifest(manifest_path, manifest)
+
+            elapsed = perf_counter() - start
+            eta = elapsed / done * (len(pending) - done - failed)
+            print(
+                f"Completed {done}/{len(pending)} shards, {rows} rows, "
+                f"{rows / elapsed:.0f} rows/s, ETA {eta:.0f}s"
+            )
+
+            yield result
+
+    print(
+        f"Backfill finished: {done} shards completed, {failed} failed, "
+        f"{rows} rows in {perf_counter() - start:.1f}s"
+    )
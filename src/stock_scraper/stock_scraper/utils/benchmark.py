@@ -0,0 +1,50 @@
+"""Benchmarks for tuning the scraper's load and fetch paths"""
+
+from time import perf_counter
+
+import pandas as pd
+
+from .utils import load_to_bg, to_parquet_buffer
+
+
+def benchmark_load_formats(
+    df: pd.DataFrame, schema: list, project_id: str = None, table: str = None
+) -> pd.DataFrame:
+    """
+    Compares the string-cast CSV load path with the typed Parquet load path on
+    payload bytes and serialisation time. If "project_id" and "table" are given
+    the frame is also loaded with each path to measure load latency. The table
+    is replaced, so it must be a scratch table.
+    """
+
+    numeric_cols = [f["name"] for f in schema if f["type"] == "NUMERIC"]
+    csv_df = df.copy()
+    csv_df[numeric_cols] = csv_df[numeric_cols].astype("string")
+
+    start = perf_counter()
+    csv_bytes = len(csv_df.to_csv(index=False).encode())
+    csv_time = perf_counter() - start
+
+    start = perf_counter()
+    parquet_bytes = to_parquet_buffer(df, schema).getbuffer().nbytes
+    parquet_time = perf_counter() - start
+
+    results = pd.DataFrame(
+        {
+            "api_method": ["load_csv", "load_parquet"],
+            "bytes": [csv_bytes, parquet_bytes],
+            "serialise_seconds": [csv_time, parquet_time],
+        }
+    )
+
+    if project_id and table:
+        latencies = []
+        for api_method, frame in [("load_csv", csv_df), ("load_parquet", df)]:
+            start = perf_counter()
+            load_to_bg(project_id, frame, table, "replace", api_method, schema)
+            latencies.append(perf_counter() - start)
+        results["load_seconds"] = latencies
+
+    print(results.to_string(index=False))
+
+    return results
@@ -0,0 +1,127 @@
+"""Detects missing price bars against the expected ASX session grid"""
+
+import numpy as np
+import pandas as pd
+
+# Expected bar offsets within a trading day. The ASX trades 00:00-06:00 UTC,
+# matching the timestamp spine of the prices_minutely_resampled dbt model.
+SESSION_OFFSETS = {
+    "1m": pd.timedelta_range("0h", "6h", freq="1min"),
+    "1h": pd.timedelta_range("0h", "5h", freq="1h"),
+}
+FREQUENCIES = {"1m": "1min", "1h": "1h"}
+
+REPORT_COLUMNS = ["symbol", "gap_start", "gap_end", "missing_bars"]
+
+
+def find_gaps(
+    df: pd.DataFrame, interval: str = "1m", min_bars: int = 1, only_active_days=True
+) -> pd.DataFrame:
+    """
+    Compares each symbol's stored timestamps with the expected session grid
+    and returns one row per run of missing bars. Trading days are the days on
+    which any symbol has a bar, so exchange holidays are not reported. With
+    "only_active_days" a symbol is only checked on days it has at least one
+    bar, so suspended or delisted symbols are not reported every day.
+    """
+
+    offsets = SESSION_OFFSETS[interval]
+    timestamps = df["timestamp"].dt.floor(FREQUENCIES[interval])
+    days = timestamps.dt.floor("D").values.astype("datetime64[ns]")
+    times = (timestamps.values.astype("datetime64[ns]") - days).astype(
+        "timedelta64[ns]"
+    )
+
+    trading_days = np.unique(days)
+    codes, symbols = pd.factorize(df["symbol"])
+
+    # Position of every bar on a (symbol, day, offset) grid
+    day_pos = np.searchsorted(trading_days, days)
+    offset_pos = np.searchsorted(offsets.values, times)
+    in_session = offset_pos < len(offsets)
+    in_session[in_session] = offsets.values[offset_pos[in_session]] == times[in_session]
+
+    present = np.zeros((len(symbols), len(trading_days), len(offsets)), dtype=bool)
+    present[codes[in_session], day_pos[in_session], offset_pos[in_session]] = True
+
+    missing = ~present
+    if only_active_days:
+        missing &= present.any(axis=2, keepdims=True)
+
+    # Runs of missing bars, split at day boundaries
+    padding = np.zeros(missing.shape[:2] + (1,), dtype=np.int8)
+    edges = np.diff(
+        np.concatenate([padding, missing.astype(np.int8), padding], axis=2), axis=2
+    )
+    sym, day, start = np.nonzero(edges == 1)
+    end = np.nonzero(edges == -1)[2]
+
+    report = pd.DataFrame(
+        {
+            "symbol": symbols[sym],
+            "gap_start": trading_days[day] + offsets.values[start],
+            "gap_end": trading_days[day] + offsets.values[end - 1],
+            "missing_bars": end - start,
+        }
+    )
+    report = report[report["missing_bars"] >= min_bars].reset_index(drop=True)
+
+    print(
+        f"Found {len(report)} gaps ({report['missing_bars'].sum()} missing bars) "
+        f"across {report['symbol'].nunique()} of {len(symbols)} symbols "
+        f"over {len(trading_days)} trading days"
+    )
+
+    return report[REPORT_COLUMNS]
+
+
+def summarise_gaps(report: pd.DataFrame) -> pd.DataFrame:
+    """Summarises a gap report per symbol, worst first."""
+
+    return (
+        report.groupby("symbol", as_index=False)
+        .agg(
+            gaps=("gap_start", "size"),
+            missing_bars=("missing_bars", "sum"),
+            first_gap=("gap_start", "min"),
+            last_gap=("gap_end", "max"),
+        )
+        .sort_values("missing_bars", ascending=False)
+        .reset_index(drop=True)
+    )
+
+
+def plan_gap_windows(report: pd.DataFrame, interval: str = "1m") -> list:
+    """
+    Groups the gaps by trading day and returns (start, end, tickers) windows
+    that only cover the missing range of that day.
+    """
+
+    step = pd.Timedelta(FREQUENCIES[interval])
+    report = report.assign(day=report["gap_start"].dt.floor("D"))
+
+    return [
+        (
+            group["gap_start"].min(),
+            group["gap_end"].max() + step,
+            [f"{s}.ax" for s in group["symbol"].unique()],
+        )
+        for _, group in report.groupby("day")
+    ]
+
+
+def stored_keys(stored: pd.DataFrame) -> pd.MultiIndex:
+    """
+    Returns the unique (symbol, timestamp) keys of the stored rows. Built once
+    per repair, so each re-fetched batch only pays for the lookup.
+    """
+
+    return pd.MultiIndex.from_frame(stored[["symbol", "timestamp"]]).unique()
+
+
+def drop_stored_rows(df: pd.DataFrame, keys: pd.MultiIndex) -> pd.DataFrame:
+    """Drops the re-fetched rows whose keys are already stored, keeping only gap fills."""
+
+    batch = pd.MultiIndex.from_frame(df[["symbol", "timestamp"]])
+
+    return df[keys.get_indexer(batch) == -1]
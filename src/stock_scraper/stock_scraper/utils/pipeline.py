@@ -0,0 +1,95 @@
+"""Streaming fetch -> clean -> load pipeline for the price scraper"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+CHUNK_ROWS = int(os.environ.get("PIPELINE_CHUNK_ROWS", 250_000))
+
+
+def stream_prices(
+    batches, latest_prices: pd.DataFrame, sinks: list, chunk_rows: int = CHUNK_ROWS
+) -> dict:
+    """
+    Streams cleaned price batches through to the sinks. Rows at or before each
+    symbol's watermark are dropped, the remaining rows are regrouped into chunks
+    of at most "chunk_rows" rows, and each chunk is passed to every sink in order
+    as sink(chunk, chunk_index). Peak memory depends on the batch and chunk size,
+    not on the size of the universe or the history being fetched.
+    """
+
+    counts = {"downloaded": 0, "retained": 0, "chunks": 0}
+
+    new_rows = drop_ingested_rows(batches, latest_prices, counts)
+    flush_in_background(rechunk(new_rows, chunk_rows), sinks, counts)
+
+    print(
+        f"Downloaded {counts['downloaded']} rows and retained {counts['retained']} "
+        f"new rows in {counts['chunks']} chunks."
+    )
+
+    return counts
+
+
+def drop_ingested_rows(batches, latest_prices: pd.DataFrame, counts: dict):
+    """Yields each batch without the rows at or before the symbol's watermark."""
+
+    latest = latest_prices.set_index("symbol")["latest_timestamp"]
+
+    for df in batches:
+        counts["downloaded"] += len(df)
+
+        watermark = df["symbol"].map(latest)
+        df = df[watermark.isna() | (df["timestamp"] > watermark)]
+
+        counts["retained"] += len(df)
+        if len(df) > 0:
+            yield df
+
+
+def rechunk(frames, chunk_rows: int):
+    """Regroups a stream of frames into frames of at most "chunk_rows" rows."""
+
+    buffer = []
+    n_buffered = 0
+
+    for df in frames:
+        buffer.append(df)
+        n_buffered += len(df)
+
+        while n_buffered >= chunk_rows:
+            df = pd.concat(buffer, ignore_index=True)
+            yield df.iloc[:chunk_rows]
+            buffer = [df.iloc[chunk_rows:]]
+            n_buffered = len(buffer[0])
+
+    if n_buffered > 0:
+        yield pd.concat(buffer, ignore_index=True)
+
+
+def flush_in_background(chunks, sinks: list, counts: dict):
+    """
+    Passes each chunk to the sinks on a background thread, so a flush overlaps
+    with fetching the next chunk. At most one flush is in flight at a time,
+    and a failed flush stops the stream.
+    """
+
+    pending = None
+
+    with ThreadPoolExecutor(max_workers=1) as flusher:
+        for i, chunk in enumerate(chunks):
+            if pending is not None:
+                pending.result()
+            pending = flusher.submit(_flush, chunk, i, sinks)
+            counts["chunks"] += 1
+
+        if pending is not None:
+            pending.result()
+
+
+def _flush(chunk: pd.DataFrame, chunk_index: int, sinks: list):
+    """Passes one chunk to every sink in order."""
+
+    for sink in sinks:
+        sink(chunk, chunk_index)
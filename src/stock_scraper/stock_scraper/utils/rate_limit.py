@@ -0,0 +1,170 @@
+"""Token-bucket rate limiter with AIMD concurrency control for Yahoo Finance calls
+
+Every Yahoo call takes tokens from a bucket refilled at "rate" requests per
+second and holds one of "concurrency" call slots. When a call is throttled
+(HTTP 429 or 5xx) the rate and concurrency are cut multiplicatively, and
+every successful call raises them additively, so the limiter settles just
+under the provider's limit. The scraper and the messenger each keep a copy
+of this module, with the rates set per deployment through environment
+variables. Each process has its own limiter and nothing coordinates them, so
+overlapping jobs (e.g. the minutely and hourly scrapes, or a backfill) share
+Yahoo's limit between them and only back off once they are throttled.
+"""
+
+import os
+import re
+import threading
+from contextlib import contextmanager
+from time import monotonic
+
+YAHOO_RATE = float(os.environ.get("YAHOO_RATE", 20))
+YAHOO_MAX_RATE = float(os.environ.get("YAHOO_MAX_RATE", 50))
+YAHOO_CONCURRENCY = int(os.environ.get("YAHOO_CONCURRENCY", 4))
+YAHOO_MAX_CONCURRENCY = int(os.environ.get("YAHOO_MAX_CONCURRENCY", 8))
+
+# Errors which mean the provider wants us to slow down
+THROTTLED = re.compile(r"\b(429|5\d\d)\b|too many requests|rate limit", re.IGNORECASE)
+
+
+def is_throttled(error) -> bool:
+    """Returns True if an exception or error message is a 429 or 5xx response."""
+
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+
+    return bool(THROTTLED.search(str(error)))
+
+
+class AdaptiveLimiter:
+    """Thread-safe token bucket whose rate and concurrency adapt with AIMD."""
+
+    def __init__(
+        self,
+        rate: float = YAHOO_RATE,
+        max_rate: float = YAHOO_MAX_RATE,
+        concurrency: int = YAHOO_CONCURRENCY,
+        max_concurrency: int = YAHOO_MAX_CONCURRENCY,
+        min_rate: float = 1,
+        decrease: float = 0.5,
+        timeout: float = None,
+    ):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.concurrency = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.decrease = decrease
+        self.timeout = timeout
+
+        self.capacity = max_rate
+        self.tokens = float(rate)
+        self.updated = monotonic()
+        self.in_flight = 0
+
+        self.acquired = 0
+        self.throttled = 0
+        self.rejections = 0
+        self.queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+        self._cond = threading.Condition()
+
+    def acquire(self, tokens: int = 1):
+        """
+        Blocks until "tokens" requests may be sent and a call slot is free.
+        A batch larger than the bucket waits for a full bucket and leaves it
+        in debt, so later calls wait until the whole batch has been paid for.
+        Raises TimeoutError (counted as a rejection) after "timeout" seconds.
+        """
+
+        needed = min(tokens, self.capacity)
+        start = monotonic()
+
+        with self._cond:
+            while True:
+                self._refill()
+                if self.in_flight < int(self.concurrency) and self.tokens >= needed:
+                    break
+
+                waited = monotonic() - start
+                if self.timeout is not None and waited >= self.timeout:
+                    self.rejections += 1
+                    raise TimeoutError(f"Rate limiter wait exceeded {self.timeout}s")
+
+                shortfall = max(needed - self.tokens, 0) / self.rate
+                self._cond.wait(timeout=max(shortfall, 0.01))
+
+            self.tokens -= tokens
+            self.in_flight += 1
+            self.acquired += 1
+
+            waited = monotonic() - start
+            self.queue_wait += waited
+            self.max_queue_wait = max(self.max_queue_wait, waited)
+
+    def release(self, throttled: bool = False):
+        """Frees a call slot and adapts the rate and concurrency to the outcome."""
+
+        with self._cond:
+            self.in_flight -= 1
+
+            if throttled:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.concurrency = max(1.0, self.concurrency * self.decrease)
+                self.tokens = min(self.tokens, 0.0)
+                print(
+                    f"Yahoo throttled us, backing off to {self.rate:.1f} req/s "
+                    f"and {int(self.concurrency)} concurrent calls"
+                )
+            else:
+                self.rate = min(self.max_rate, self.rate + 1 / self.concurrency)
+                self.concurrency = min(
+                    self.max_concurrency, self.concurrency + 1 / self.concurrency
+                )
+
+            self._cond.notify_all()
+
+    @contextmanager
+    def limit(self, tokens: int = 1):
+        """
+        Wraps one call. Exceptions are classified with "is_throttled"; a call
+        which returns errors instead can set outcome["throttled"] itself.
+        """
+
+        self.acquire(tokens)
+        outcome = {"throttled": False}
+        try:
+            yield outcome
+        except Exception as e:
+            outcome["throttled"] = is_throttled(e)
+            raise
+        finally:
+            self.release(outcome["throttled"])
+
+    def metrics(self) -> dict:
+        """Returns the current rate, concurrency, rejections and queue wait."""
+
+        with self._cond:
+            return {
+                "rate": round(self.rate, 2),
+                "concurrency": int(self.concurrency),
+                "in_flight": self.in_flight,
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "rejections": self.rejections,
+                "mean_queue_wait": round(self.queue_wait / max(self.acquired, 1), 3),
+                "max_queue_wait": round(self.max_queue_wait, 3),
+            }
+
+    def _refill(self):
+        """Adds the tokens accrued since the last refill."""
+
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+LIMITER = AdaptiveLimiter()
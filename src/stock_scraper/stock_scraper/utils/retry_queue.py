@@ -0,0 +1,93 @@
+"""Persistent queue of symbols which failed to scrape, keyed by (table, ticker)
+
+A ticker which has failed RETRY_MAX_ATTEMPTS runs in a row, e.g. because it
+was delisted, is moved to a dead-letter table instead of being retried on
+every run. It returns to the queue only if a later scrape fails again.
+"""
+
+import os
+from datetime import datetime
+
+import pandas as pd
+
+RETRY_QUEUE = "retry_queue"
+DEAD_LETTER = "retry_dead_letter"
+MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", 5))
+COLUMNS = ["table_name", "ticker", "error", "attempts", "first_failed"]
+
+
+def read_retry_queue(store, table: str) -> list:
+    """Returns the tickers queued for a retry on "table"."""
+
+    df = _read_all(store)
+    return df.loc[df["table_name"] == table, "ticker"].tolist()
+
+
+def update_retry_queue(
+    store,
+    table: str,
+    tickers: list,
+    failures: dict,
+    now: datetime = None,
+    max_attempts: int = MAX_ATTEMPTS,
+):
+    """
+    Removes the tickers which were just scraped successfully from the queue of
+    "table" and adds (or bumps the attempt count of) the ones which failed.
+    Tickers which have failed "max_attempts" times are dead-lettered.
+    """
+
+    now = pd.Timestamp(now or datetime.utcnow())
+    queue = _read_all(store)
+
+    failed = pd.DataFrame(
+        {
+            "table_name": table,
+            "ticker": list(failures),
+            "error": list(failures.values()),
+        }
+    )
+    failed = failed.merge(
+        queue[["table_name", "ticker", "attempts", "first_failed"]],
+        on=["table_name", "ticker"],
+        how="left",
+    )
+    failed["attempts"] = failed["attempts"].fillna(0) + 1
+    failed["first_failed"] = failed["first_failed"].fillna(now)
+
+    dead = failed["attempts"] >= max_attempts
+    if dead.any():
+        dead_letter = pd.concat(
+            [store.read(DEAD_LETTER), failed.loc[dead, COLUMNS].assign(dead_at=now)],
+            ignore_index=True,
+        )
+        dead_letter = dead_letter.drop_duplicates(["table_name", "ticker"], keep="last")
+        store.write(DEAD_LETTER, dead_letter)
+
+    attempted = (queue["table_name"] == table) & queue["ticker"].isin(tickers)
+    queue = pd.concat(
+        [queue[~attempted], failed.loc[~dead, COLUMNS]], ignore_index=True
+    )
+
+    if attempted.any() or len(failed) > 0:
+        store.write(RETRY_QUEUE, queue)
+
+    print(
+        f"Retry queue for {table}: {len(failed)} failed this run, "
+        f"{dead.sum()} dead-lettered, {(queue['table_name'] == table).sum()} queued"
+    )
+
+
+def _read_all(store) -> pd.DataFrame:
+    """Reads the whole retry queue with consistent dtypes."""
+
+    df = store.read(RETRY_QUEUE)
+    if len(df) == 0:
+        df = pd.DataFrame(columns=COLUMNS)
+
+    df["attempts"] = df["attempts"].astype(int)
+    df["first_failed"] = pd.to_datetime(df["first_failed"])
+    if df["first_failed"].dt.tz is not None:
+        df["first_failed"] = df["first_failed"].dt.tz_localize(None)
+
+    return df[COLUMNS]
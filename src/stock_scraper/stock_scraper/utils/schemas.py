@@ -0,0 +1,52 @@
+"""Explicit warehouse schemas for the tables written by the scraper"""
+
+import pyarrow as pa
+
+PRICES_SCHEMA = [
+    {"name": "symbol", "type": "STRING"},
+    {"name": "timestamp", "type": "TIMESTAMP"},
+    {"name": "open", "type": "NUMERIC"},
+    {"name": "high", "type": "NUMERIC"},
+    {"name": "low", "type": "NUMERIC"},
+    {"name": "close", "type": "NUMERIC"},
+    {"name": "volume", "type": "NUMERIC"},
+]
+
+COMPANIES_SCHEMA = [
+    {"name": "symbol", "type": "STRING"},
+    {"name": "name", "type": "STRING"},
+    {"name": "GIC", "type": "STRING"},
+    {"name": "listing_date", "type": "TIMESTAMP"},
+    {"name": "market_cap", "type": "NUMERIC"},
+]
+
+# Naive UTC datetimes, as pandas-gbq writes the state tables
+WATERMARKS_SCHEMA = [
+    {"name": "table_name", "type": "STRING"},
+    {"name": "symbol", "type": "STRING"},
+    {"name": "latest_timestamp", "type": "DATETIME"},
+]
+
+# BigQuery types mapped to the Arrow types written to Parquet
+ARROW_TYPES = {
+    "STRING": pa.string(),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+    "DATETIME": pa.timestamp("us"),
+    "NUMERIC": pa.decimal128(38, 9),
+    "INTEGER": pa.int64(),
+    "FLOAT": pa.float64(),
+    "BOOLEAN": pa.bool_(),
+}
+
+
+def to_arrow(df, schema: list) -> pa.Table:
+    """Converts a frame to an Arrow table with the types of "schema"."""
+
+    return pa.table(
+        {
+            field["name"]: pa.array(df[field["name"]], from_pandas=True).cast(
+                ARROW_TYPES[field["type"]], safe=field["type"] != "NUMERIC"
+            )
+            for field in schema
+        }
+    )
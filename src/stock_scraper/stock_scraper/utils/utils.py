@@ -1,7 +1,31 @@
 """Standard utils"""
 
+import io
+from datetime import datetime
+from functools import lru_cache
+
 import pandas as pd
-import pandas_gbq
+import pyarrow.parquet as pq
+
+from .schemas import to_arrow
+
+# The BigQuery and pandas-gbq clients are imported on first use, so methods
+# which never touch the warehouse do not pay for them on a cold start.
+
+WRITE_DISPOSITIONS = {
+    "append": "WRITE_APPEND",
+    "replace": "WRITE_TRUNCATE",
+    "fail": "WRITE_EMPTY",
+}
+
+
+@lru_cache(maxsize=None)
+def get_bq_client(project_id: str):
+    """Returns a BigQuery client, reused across warm invocations."""
+
+    from google.cloud import bigquery
+
+    return bigquery.Client(project=project_id)
 
 
 def read_from_bg(project_id: str, table: str) -> pd.DataFrame:
@@ -16,25 +40,121 @@ def read_from_bg(project_id: str, table: str) -> pd.DataFrame:
 
 
 def load_to_bg(
-    project_id: str, df: pd.DataFrame, table: str, mode: str, api_method="load_csv"
+    project_id: str,
+    df: pd.DataFrame,
+    table: str,
+    mode: str,
+    api_method="load_parquet",
+    schema: list = None,
+):
+    """
+    Load data to BQ.
+    With api_method="load_parquet" the frame is shipped as a zstd-compressed
+    Parquet file typed by "schema", so numbers are never serialised to text.
+    With api_method="load_csv" the frame is loaded through pandas-gbq.
+    """
+
+    print(f"Loading to {table} with mode={mode} ({api_method})")
+    if api_method == "load_parquet":
+        from google.cloud import bigquery
+
+        client = get_bq_client(project_id)
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=WRITE_DISPOSITIONS[mode],
+            schema=[bigquery.SchemaField(f["name"], f["type"]) for f in schema],
+        )
+        client.load_table_from_file(
+            to_parquet_buffer(df, schema), table, job_config=job_config
+        ).result()
+    else:
+        import pandas_gbq
+
+        pandas_gbq.to_gbq(
+            df,
+            table,
+            project_id=project_id,
+            if_exists=mode,
+            progress_bar=False,
+            api_method=api_method,
+        )
+    print("Loaded data to BQ successfully.")
+
+
+def merge_to_bg(
+    project_id: str,
+    df: pd.DataFrame,
+    table: str,
+    key,
+    schema: list,
+    update_when: str = None,
 ):
-    """Load data to BQ."""
+    """
+    Applies a set of row changes to a BQ table in a single MERGE statement.
+    Rows of "df" are matched to the table on "key" (a column or a list of
+    columns): rows flagged in the boolean "deleted" column are deleted, the
+    rest are updated or inserted. If "update_when" is given, matched rows
+    are only updated where that condition on the target T and source S holds.
+    The changes are staged in "{table}_changes" first.
+    """
 
-    print(f"Loading to {table} with mode={mode}")
-    pandas_gbq.to_gbq(
+    keys = [key] if isinstance(key, str) else list(key)
+    staging = f"{table}_changes"
+    load_to_bg(
+        project_id,
         df,
-        table,
-        project_id=project_id,
-        if_exists=mode,
-        progress_bar=False,
-        api_method=api_method,
+        staging,
+        "replace",
+        schema=schema + [{"name": "deleted", "type": "BOOLEAN"}],
     )
-    print("Loaded data to BQ successfully.")
 
+    columns = [f["name"] for f in schema]
+    match = " AND ".join(f"T.{k} = S.{k}" for k in keys)
+    condition = f" AND {update_when}" if update_when else ""
+    updates = ", ".join(f"{c} = S.{c}" for c in columns if c not in keys)
+    query = f"""
+        MERGE `{table}` T USING `{staging}` S ON {match}
+        WHEN MATCHED AND S.deleted THEN DELETE
+        WHEN MATCHED{condition} THEN UPDATE SET {updates}
+        WHEN NOT MATCHED AND NOT S.deleted THEN
+            INSERT ({", ".join(columns)}) VALUES ({", ".join(columns)})
+    """
+
+    print(f"Merging {len(df)} changed rows into {table}")
+    get_bq_client(project_id).query(query).result()
+    print("Merged changes to BQ successfully.")
+
+
+def to_parquet_buffer(df: pd.DataFrame, schema: list) -> io.BytesIO:
+    """Serialises a frame to an in-memory, zstd-compressed Parquet file."""
+
+    buffer = io.BytesIO()
+    pq.write_table(to_arrow(df, schema), buffer, compression="zstd")
+    buffer.seek(0)
+
+    return buffer
+
+
+def read_prices_between(
+    project_id: str,
+    table: str,
+    start: datetime,
+    end: datetime,
+    columns: list = ("symbol", "timestamp", "open", "high", "low", "close", "volume"),
+) -> pd.DataFrame:
+    """Import the price bars of a table with start <= timestamp < end"""
+
+    query = f"""
+        SELECT {", ".join(columns)}
+        FROM `{table}`
+        WHERE timestamp >= TIMESTAMP("{start}") AND timestamp < TIMESTAMP("{end}")
+    """
+    df = pd.read_gbq(
+        query=query, project_id=project_id, dialect="standard", use_bqstorage_api=True
+    )
 
-def save_data_to_gcs(df: pd.DataFrame, uri: str):
-    """Saves data to GCS."""
+    numeric_cols = [c for c in ["open", "high", "low", "close", "volume"] if c in df]
+    df[numeric_cols] = df[numeric_cols].astype(float)
+    df["timestamp"] = df["timestamp"].dt.tz_convert("UTC").dt.tz_localize(None)
 
-    print(f"Loading to {uri}...")
-    df.to_json(uri, orient="records", lines=True)
-    print("Saved data to GCS successfully.")
+    return df
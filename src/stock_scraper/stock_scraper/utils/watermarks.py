@@ -0,0 +1,79 @@
+"""Per-symbol ingestion watermarks, keyed by (table, symbol)"""
+
+import pandas as pd
+
+from .schemas import WATERMARKS_SCHEMA
+
+WATERMARKS = "ingestion_watermarks"
+COLUMNS = ["table_name", "symbol", "latest_timestamp"]
+
+
+def read_watermarks(store, table: str) -> pd.DataFrame:
+    """Returns the latest ingested timestamp for each symbol in "table"."""
+
+    df = _read_all(store)
+    df = df[df["table_name"] == table]
+
+    return df[["symbol", "latest_timestamp"]].reset_index(drop=True)
+
+
+def update_watermarks(store, table: str, df: pd.DataFrame):
+    """Advances the watermarks of "table" using the rows that were just loaded."""
+
+    if len(df) == 0:
+        return
+
+    latest = df.groupby("symbol", as_index=False).agg(
+        latest_timestamp=("timestamp", "max")
+    )
+    latest["table_name"] = table
+
+    # Upserted per symbol, so overlapping jobs never roll back each other's rows
+    store.upsert(
+        WATERMARKS,
+        latest[COLUMNS],
+        ["table_name", "symbol"],
+        WATERMARKS_SCHEMA,
+        newest="latest_timestamp",
+    )
+    print(f"Updated watermarks for {len(latest)} symbols in {table}")
+
+
+def rebuild_watermarks(store, project_id: str, table: str) -> pd.DataFrame:
+    """
+    Rebuilds the watermarks of "table" from a full scan of the table.
+    This is a one-off operation, normal runs read the watermark store.
+    """
+
+    print(f"Rebuilding watermarks from a full scan of {table}...")
+    query = f"""
+        SELECT symbol, MAX(timestamp) as latest_timestamp
+        FROM {table} GROUP BY symbol
+    """
+    latest = pd.read_gbq(query, project_id=project_id, dialect="standard")
+    latest["latest_timestamp"] = latest["latest_timestamp"].dt.tz_localize(None)
+    latest["table_name"] = table
+
+    watermarks = _read_all(store)
+    watermarks = pd.concat(
+        [watermarks[watermarks["table_name"] != table], latest[COLUMNS]],
+        ignore_index=True,
+    )
+    store.write(WATERMARKS, watermarks)
+    print(f"Rebuilt watermarks for {len(latest)} symbols in {table}")
+
+    return latest[["symbol", "latest_timestamp"]]
+
+
+def _read_all(store) -> pd.DataFrame:
+    """Reads every watermark in the store with consistent dtypes."""
+
+    df = store.read(WATERMARKS)
+    if len(df) == 0:
+        df = pd.DataFrame(columns=COLUMNS)
+
+    df["latest_timestamp"] = pd.to_datetime(df["latest_timestamp"])
+    if df["latest_timestamp"].dt.tz is not None:
+        df["latest_timestamp"] = df["latest_timestamp"].dt.tz_localize(None)
+
+    return df[COLUMNS]
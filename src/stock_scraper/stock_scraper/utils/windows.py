@@ -0,0 +1,43 @@
+"""Plans per-symbol incremental fetch windows from the ingestion watermarks"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Yahoo only serves intraday history this far back
+MAX_HISTORY = {"1m": pd.Timedelta(days=7), "1h": pd.Timedelta(days=729)}
+
+# Symbols are grouped by how far behind they are, so each group can share a request
+LAG_BUCKETS = pd.to_timedelta(["2h", "1D", "7D", "28D"])
+
+
+def plan_fetch_windows(
+    tickers: list, latest_prices: pd.DataFrame, interval: str, now: datetime = None
+) -> list:
+    """
+    Groups tickers by how far behind their watermark is and returns a list of
+    (start, end, tickers) windows. Tickers without a watermark are backfilled
+    over the full history Yahoo serves for the interval.
+    """
+
+    now = pd.Timestamp(now or datetime.utcnow())
+    earliest = now - MAX_HISTORY[interval]
+
+    df = pd.DataFrame({"ticker": tickers})
+    df["symbol"] = df["ticker"].str.replace(".ax", "", regex=False)
+    df = df.merge(latest_prices, on="symbol", how="left")
+
+    df["start"] = df["latest_timestamp"].clip(lower=earliest).fillna(earliest)
+    df["bucket"] = np.searchsorted(LAG_BUCKETS.values, (now - df["start"]).values)
+    df.loc[df["latest_timestamp"].isna(), "bucket"] = len(LAG_BUCKETS) + 1
+
+    windows = [
+        (group["start"].min(), now, group["ticker"].tolist())
+        for _, group in df.groupby("bucket")
+    ]
+
+    for start, _, group in windows:
+        print(f"Fetching {len(group)} symbols from {start} (interval {interval})")
+
+    return windows
@@ -1,20 +1,233 @@
 """Utility functions for interacting with Yahoo Finance"""
 
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import perf_counter, sleep
+
 import pandas as pd
 from yahooquery import Ticker
 
+from .rate_limit import LIMITER, is_throttled
+
+BATCH_SIZE = int(os.environ.get("YAHOO_BATCH_SIZE", 100))
+MAX_WORKERS = int(os.environ.get("YAHOO_MAX_WORKERS", 4))
+BATCH_TIMEOUT = int(os.environ.get("YAHOO_BATCH_TIMEOUT", 30))
+RETRIES = int(os.environ.get("YAHOO_RETRIES", 3))
+RETRY_ROUNDS = int(os.environ.get("YAHOO_RETRY_ROUNDS", 2))
+BACKOFF = float(os.environ.get("YAHOO_BACKOFF", 1))
+
+COLUMNS = ["symbol", "timestamp", "open", "high", "low", "close", "volume"]
 
-def get_stock_data(tickers: list, period: str, interval: str):
+# yahooquery's error when a response cannot be decoded as JSON
+UNREADABLE = "HTTP 404 Not Found.  Please try again"
+
+
+def get_stock_data(tickers: list, period: str, interval: str, **kwargs):
     """Get stock data for a list of tickers."""
 
-    client = Ticker(tickers, asynchronous=True)
-    df = client.history(period=period, interval=interval).reset_index()
+    frames = list(iter_stock_data(tickers, period, interval, **kwargs))
+
+    if len(frames) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_stock_data(
+    tickers: list,
+    period: str,
+    interval: str,
+    start: datetime = None,
+    end: datetime = None,
+    batch_size: int = BATCH_SIZE,
+    max_workers: int = MAX_WORKERS,
+    timeout: int = BATCH_TIMEOUT,
+    retries: int = RETRIES,
+    retry_rounds: int = RETRY_ROUNDS,
+    failures: dict = None,
+):
+    """
+    Yields cleaned stock data for a list of tickers, one batch at a time.
+    Symbols which fail, alone or as part of a failed batch, are re-fetched
+    in up to "retry_rounds" further rounds with backoff, in batches half the
+    size of the previous round's. Symbols which still fail are recorded in
+    "failures" as {ticker: error}.
+    """
+
+    pending = list(tickers)
+    failed = {}
+
+    def fetch(batch: list) -> pd.DataFrame:
+        with LIMITER.limit(len(batch)) as outcome:
+            client = Ticker(batch, asynchronous=True, timeout=timeout)
+            result, raw = get_history(
+                client, period=period, interval=interval, start=start, end=end
+            )
+            df, errors = split_history(result, raw, batch)
+            outcome["throttled"] = any(is_throttled(e) for e in errors.values())
+        failed.update(errors)
+        return df
+
+    for attempt in range(retry_rounds + 1):
+        if attempt > 0:
+            print(f"Retrying {len(pending)} failed symbols (round {attempt})")
+            sleep(BACKOFF * 2**attempt)
+
+        failed.clear()
+        round_size = max(batch_size // 2**attempt, 1)
+        for df in fetch_in_batches(
+            pending, fetch, round_size, max_workers, retries, failed=failed
+        ):
+            yield clean_stock_data(df)
+
+        pending = list(failed)
+        if len(pending) == 0:
+            break
+
+    if failures is not None:
+        failures.update(failed)
+
+    print(f"Yahoo rate limiter: {LIMITER.metrics()}")
+
+
+def get_history(client, **kwargs) -> tuple:
+    """
+    Returns a Ticker's history frame and the raw per-symbol chart results
+    it was built from. yahooquery drops the symbols without bars from the
+    frame, so the raw results are the only place their errors are kept.
+    A response which was not JSON, such as the plain-text body of a 429 or
+    5xx, fails the whole batch as throttled.
+    """
+
+    # pylint: disable=protected-access
+    raw = {}
+    to_dataframe = client._historical_data_to_dataframe
+
+    def keep_raw(data, params, adj_timezone):
+        if UNREADABLE in str(data.get("error", "")):
+            raise ConnectionError(
+                f"Yahoo sent a non-JSON response, treated as a 429: {data['error']}"
+            )
+        raw.update(data)
+        return to_dataframe(data, params, adj_timezone)
+
+    client._historical_data_to_dataframe = keep_raw
+    return client.history(**kwargs), raw
+
+
+def split_history(result, raw: dict, tickers: list) -> tuple:
+    """
+    Splits a Yahoo history result into the frame of successful symbols and
+    a {ticker: error} dict of the requested tickers which came back as
+    errors. A symbol whose chart has no bars in the range is not an error,
+    it is simply absent from the frame.
+    """
+
+    df = result.reset_index() if "symbol" in result.index.names else pd.DataFrame()
+    errors = {
+        ticker: str(raw.get(ticker, "No response"))
+        for ticker in tickers
+        if not isinstance(raw.get(ticker), dict)
+    }
+
+    return df, errors
+
+
+def fetch_in_batches(
+    tickers: list,
+    fetch,
+    batch_size: int = BATCH_SIZE,
+    max_workers: int = MAX_WORKERS,
+    retries: int = RETRIES,
+    backoff: float = BACKOFF,
+    failed: dict = None,
+):
+    """
+    Splits "tickers" into batches and runs "fetch" on each batch with a bounded
+    worker pool. Results are yielded as batches finish, so one slow batch does
+    not hold up the rest. Only "max_workers" batches are in flight at a time,
+    so memory is bounded by the batch size. Batches which still fail after
+    "retries" attempts are logged, skipped and recorded in "failed".
+    """
+
+    batches = [tickers[i : i + batch_size] for i in range(0, len(tickers), batch_size)]
     print(
-        f"Yahoo client returned {len(df)} rows, with {df.symbol.nunique()} symbols. Cleaning data..."
+        f"Fetching {len(tickers)} symbols in {len(batches)} batches "
+        f"(batch_size={batch_size}, max_workers={max_workers})"
     )
 
+    start = perf_counter()
+    n_rows = 0
+    latencies = []
+
+    queue = iter(enumerate(batches))
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        def submit_next():
+            i, batch = next(queue, (None, None))
+            if batch is not None:
+                future = pool.submit(
+                    _fetch_with_backoff, fetch, batch, retries, backoff
+                )
+                pending[future] = i
+
+        for _ in range(max_workers):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                submit_next()
+
+                df, latency, error = future.result()
+                latencies.append(latency)
+
+                if df is None:
+                    print(f"Batch {i} failed after {latency:.2f}s")
+                    if failed is not None:
+                        failed.update({symbol: error for symbol in batches[i]})
+                    continue
+
+                n_rows += len(df)
+                print(f"Batch {i} returned {len(df)} rows in {latency:.2f}s")
+                yield df
+
+    elapsed = perf_counter() - start
+    if len(latencies) > 0:
+        print(
+            f"Fetched {n_rows} rows in {elapsed:.2f}s ({n_rows / elapsed:.0f} rows/sec). "
+            f"Batch latency: mean={sum(latencies) / len(latencies):.2f}s, max={max(latencies):.2f}s"
+        )
+
+
+def _fetch_with_backoff(fetch, batch: list, retries: int, backoff: float):
+    """Calls "fetch" on a batch, retrying with exponential backoff on failure."""
+
+    start = perf_counter()
+    for attempt in range(retries):
+        try:
+            return fetch(batch), perf_counter() - start, None
+        except Exception as e:  # pylint: disable=broad-except
+            error = str(e)
+            print(f"Batch starting {batch[0]} failed (attempt {attempt + 1}): {e}")
+            if attempt < retries - 1:
+                sleep(backoff * 2**attempt)
+
+    return None, perf_counter() - start, error
+
+
+def clean_stock_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Cleans the raw Yahoo history for loading to the warehouse."""
+
+    if "symbol" not in df.columns or len(df) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
     numeric_cols = ["open", "close", "low", "high", "volume"]
-    df[numeric_cols] = df[numeric_cols].round(3).astype("string")
+    df[numeric_cols] = df[numeric_cols].astype(float).round(3)
 
     df = df.rename(columns={"date": "timestamp"})
     df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
@@ -22,4 +235,4 @@ def get_stock_data(tickers: list, period: str, interval: str):
 
     df["symbol"] = df["symbol"].str.replace(".ax", "", regex=False)
 
-    return df[["symbol", "timestamp", "open", "high", "low", "close", "volume"]]
+    return df[COLUMNS]
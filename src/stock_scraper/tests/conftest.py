@@ -1,5 +1,7 @@
 """Conftest for stock_scraper tests."""
 
+import os
+
 import pytest
 
 
@@ -7,3 +9,15 @@ import pytest
 def asx_registry_url() -> str:
     """Fixture to return the ASX registry url"""
     return "https://asx.api.markitdigital.com/asx-research/1.0/companies/directory/file"
+
+
+@pytest.fixture
+def handler_dir() -> str:
+    """Fixture to return the directory the handler is deployed from"""
+    return os.path.join(os.path.dirname(__file__), "..", "stock_scraper")
+
+
+@pytest.fixture
+def handler_env() -> dict:
+    """Fixture to return the environment the handler is deployed with"""
+    return {}
@@ -0,0 +1,93 @@
+"""Unit tests for the activity-tiered scrape scheduling"""
+
+import pandas as pd
+
+from stock_scraper.utils.activity import (
+    COUNT_DTYPES,
+    read_activity,
+    scheduled_time,
+    select_symbols,
+    update_activity,
+)
+from stock_scraper.utils.state import SQLiteStore
+
+
+def test_cold_symbols_are_skipped_until_refresh_and_promoted(tmp_path):
+    """Test that dormant symbols drop out of normal runs and return once active"""
+
+    store = SQLiteStore(str(tmp_path / "state.db"))
+    tickers = ["HOT.ax", "WARM.ax", "COLD.ax"]
+    day = pd.Timestamp("2023-06-22 00:00")
+
+    update_activity(
+        store,
+        tickers,
+        pd.DataFrame({"symbol": ["HOT", "WARM"], "bars": [60, 5], "volume": [1e5, 10]}),
+        now=day - pd.Timedelta(days=3),
+    )
+    update_activity(
+        store,
+        ["HOT.ax"],
+        pd.DataFrame({"symbol": ["HOT"], "bars": [60], "volume": [1e5]}),
+        now=day + pd.Timedelta(hours=1),
+    )
+
+    activity = read_activity(store)
+    later = day + pd.Timedelta(hours=1, minutes=30)
+    assert select_symbols(tickers, activity, now=later) == ["HOT.ax", "WARM.ax"]
+    assert (
+        select_symbols(tickers + ["NEW.ax"], activity, now=later, full_refresh=False)[
+            -1
+        ]
+        == "NEW.ax"
+    )
+    assert select_symbols(tickers, activity, now=later, full_refresh=True) == tickers
+
+    update_activity(
+        store,
+        tickers,
+        pd.DataFrame({"symbol": ["COLD"], "bars": [40], "volume": [1e4]}),
+        now=later,
+    )
+
+    activity = read_activity(store)
+    assert "COLD.ax" in select_symbols(
+        tickers, activity, now=later + pd.Timedelta(hours=1)
+    )
+
+
+def test_warm_symbols_are_due_on_schedule_despite_jitter(tmp_path):
+    """Test that stamping the scheduled time keeps the warm cadence exact"""
+
+    store = SQLiteStore(str(tmp_path / "state.db"))
+    selected = scheduled_time("2023-06-22T00:00:41.512Z")
+    assert selected == pd.Timestamp("2023-06-22 00:00")
+
+    update_activity(
+        store,
+        ["WARM.ax"],
+        pd.DataFrame({"symbol": ["WARM"], "bars": [5], "volume": [10]}),
+        now=selected,
+    )
+
+    two_hours_later = scheduled_time("2023-06-22T02:00:03Z")
+    assert select_symbols(
+        ["WARM.ax"], read_activity(store), now=two_hours_later, full_refresh=False
+    ) == ["WARM.ax"]
+
+
+def test_runs_without_new_bars_still_stamp_activity(tmp_path):
+    """Test that a holiday run, which keeps no rows, updates the statistics"""
+
+    store = SQLiteStore(str(tmp_path / "state.db"))
+    no_counts = pd.DataFrame(columns=list(COUNT_DTYPES)).astype(COUNT_DTYPES)
+    now = pd.Timestamp("2023-06-22 00:00:41.512")
+
+    update_activity(store, [], no_counts, now=now)
+    update_activity(store, ["ABC.ax"], no_counts, now=now)
+    update_activity(store, ["ABC.ax"], pd.DataFrame(columns=list(COUNT_DTYPES)), now)
+
+    activity = read_activity(store)
+    assert activity["symbol"].tolist() == ["ABC"]
+    assert activity["last_fetched"].tolist() == [now]
+    assert activity["recent_bars"].tolist() == [0]
@@ -0,0 +1,44 @@
+"""Unit tests for the minutely to hourly aggregation"""
+
+import pandas as pd
+
+from stock_scraper.utils.aggregate import resample_to_hourly
+
+
+def test_resample_to_hourly():
+    """Test that OHLCV is aggregated per symbol-hour and partial hours are dropped"""
+
+    df = pd.DataFrame(
+        {
+            "symbol": ["ABC", "ABC", "ABC", "DEF", "ABC"],
+            "timestamp": pd.to_datetime(
+                [
+                    "2023-06-22 00:30",
+                    "2023-06-22 00:00",
+                    "2023-06-22 00:59",
+                    "2023-06-22 00:10",
+                    "2023-06-22 01:05",
+                ]
+            ),
+            "open": [2.0, 1.0, 3.0, 10.0, 4.0],
+            "high": [2.5, 1.5, 3.5, 10.5, 4.5],
+            "low": [0.5, 0.9, 2.9, 9.5, 3.9],
+            "close": [2.1, 1.1, 3.1, 10.1, 4.1],
+            "volume": [100.0, 200.0, 300.0, 50.0, 10.0],
+        }
+    )
+
+    bars = resample_to_hourly(df, now=pd.Timestamp("2023-06-22 01:30"))
+
+    expected = pd.DataFrame(
+        {
+            "symbol": ["ABC", "DEF"],
+            "timestamp": pd.to_datetime(["2023-06-22 00:00"] * 2),
+            "open": [1.0, 10.0],
+            "high": [3.5, 10.5],
+            "low": [0.5, 9.5],
+            "close": [3.1, 10.1],
+            "volume": [600.0, 50.0],
+        }
+    )
+    pd.testing.assert_frame_equal(bars, expected, check_dtype=False)
@@ -0,0 +1,60 @@
+"""Unit tests for the Parquet price archive"""
+
+import pandas as pd
+
+from stock_scraper.utils.archive import write_archive, read_archive, compact_archive
+
+
+def make_prices(start: str) -> pd.DataFrame:
+    """Creates a frame of minutely prices for two symbols"""
+
+    timestamps = pd.date_range(start, periods=3, freq="min")
+    return pd.DataFrame(
+        {
+            "symbol": ["ABC"] * 3 + ["DEF"] * 3,
+            "timestamp": timestamps.append(timestamps),
+            "close": [1.0, 1.1, 1.2, 2.0, 2.1, 2.2],
+        }
+    )
+
+
+def test_archive_round_trip_and_compaction(tmp_path):
+    """Test that archived runs replay by date and compact into one daily file"""
+
+    root = str(tmp_path / "prices")
+    write_archive(make_prices("2023-06-21 23:59"), root, name="run-0")
+    write_archive(make_prices("2023-06-22 00:00"), root, name="run-1")
+    write_archive(make_prices("2023-06-22 00:01"), root, name="run-2")
+
+    compact_archive(root, "2023-06-22")
+
+    assert sorted(
+        p.name for p in (tmp_path / "prices" / "date=2023-06-22").iterdir()
+    ) == ["daily.parquet"]
+
+    replayed = list(read_archive(root, "2023-06-21", "2023-06-22"))
+
+    assert [len(df) for df in replayed] == [2, 8]
+    assert not replayed[1].duplicated(["symbol", "timestamp"]).any()
+
+
+def test_write_archive_symbol_buckets(tmp_path):
+    """Test that symbol bucketing adds a stable second partition level"""
+
+    paths = write_archive(
+        make_prices("2023-06-22 00:00"), str(tmp_path), name="run", symbol_buckets=4
+    )
+
+    assert all("/date=2023-06-22/bucket=" in p for p in paths)
+    assert paths == write_archive(
+        make_prices("2023-06-22 00:00"), str(tmp_path), name="run", symbol_buckets=4
+    )
+
+    replayed = list(read_archive(str(tmp_path), "2023-06-22", "2023-06-22"))
+
+    assert len(replayed) == 1
+    pd.testing.assert_frame_equal(
+        replayed[0].sort_values(["symbol", "timestamp"]).reset_index(drop=True),
+        make_prices("2023-06-22 00:00"),
+        check_dtype=False,
+    )
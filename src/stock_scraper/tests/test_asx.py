@@ -0,0 +1,119 @@
+"""Unit tests for the conditional refresh of the ASX register"""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pandas as pd
+import pytest
+
+from stock_scraper.utils.asx import (
+    download_listed_companies,
+    diff_listed_companies,
+    write_validators,
+)
+from stock_scraper.utils.state import SQLiteStore
+
+REGISTER = (
+    "ASX code,Company name,Listing date,GICs industry group,Market Cap\n"
+    "AAA,Alpha Ltd,01/02/2000,Banks,1000\n"
+    "BBB,Beta Ltd,03/04/2010,Materials,2000\n"
+)
+
+
+@pytest.fixture
+def asx_server():
+    """Serves the register locally with ETag support, counting the full downloads"""
+
+    state = {"body": REGISTER.encode(), "downloads": 0, "send_etag": True}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            etag = '"' + hashlib.md5(state["body"]).hexdigest() + '"'
+            if state["send_etag"] and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            state["downloads"] += 1
+            self.send_response(200)
+            if state["send_etag"]:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(state["body"])))
+            self.end_headers()
+            self.wfile.write(state["body"])
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}/file", state
+
+    server.shutdown()
+
+
+def test_download_skips_unchanged_register(asx_server, tmp_path):
+    """Test that the register is only downloaded and parsed when it changed"""
+
+    url, state = asx_server
+    store = SQLiteStore(str(tmp_path / "state.db"))
+
+    df, validators = download_listed_companies(url, store)
+    assert df["symbol"].tolist() == ["AAA", "BBB"]
+    write_validators(store, url, validators)
+
+    assert download_listed_companies(url, store)[0] is None
+    assert state["downloads"] == 1
+
+    # Without validators, the content hash still detects an unchanged register
+    state["send_etag"] = False
+    assert download_listed_companies(url, store)[0] is None
+    assert state["downloads"] == 2
+
+    state["body"] += b"CCC,Gamma Ltd,05/06/2020,Energy,300\n"
+    df, _ = download_listed_companies(url, store)
+    assert df["symbol"].tolist() == ["AAA", "BBB", "CCC"]
+
+
+def test_diff_listed_companies():
+    """Test that listings, delistings and changed details are separated"""
+
+    previous = pd.DataFrame(
+        {
+            "symbol": ["AAA", "BBB", "DDD"],
+            "name": ["Alpha Ltd", "Beta Ltd", "Delta Ltd"],
+            "GIC": ["Banks", "Materials", "Energy"],
+            "listing_date": pd.to_datetime(
+                ["2000-02-01", "2010-04-03", "2001-01-01"]
+            ).tz_localize("UTC"),
+            "market_cap": [1000.0, 2000.0, None],
+        }
+    )
+    current = previous.iloc[:2].assign(
+        market_cap=[1000, 2500], listing_date=previous["listing_date"].iloc[:2]
+    )
+    current = pd.concat(
+        [
+            current,
+            pd.DataFrame(
+                {
+                    "symbol": ["CCC"],
+                    "name": ["Gamma Ltd"],
+                    "GIC": ["Energy"],
+                    "listing_date": [pd.Timestamp("2020-06-05", tz="UTC")],
+                    "market_cap": [300.0],
+                }
+            ),
+        ]
+    )
+    current["listing_date"] = current["listing_date"].dt.tz_localize(None)
+
+    diff = diff_listed_companies(previous, current)
+
+    assert diff["listed"]["symbol"].tolist() == ["CCC"]
+    assert diff["delisted"]["symbol"].tolist() == ["DDD"]
+    assert diff["changed"]["symbol"].tolist() == ["BBB"]
+    assert diff["changed"]["market_cap"].tolist() == [2500.0]
@@ -0,0 +1,83 @@
+"""Unit tests for the resumable backfill"""
+
+from functools import partial
+
+from stock_scraper.utils.backfill import plan_shards, read_manifest, run_shards
+
+
+def load_shard(shard: dict, fail: tuple = (), missing: tuple = ()) -> dict:
+    """Stand-in worker which fails for the shards in "fail" and symbols in "missing" """
+
+    if shard["id"] in fail:
+        raise ConnectionError("interrupted")
+    failures = {t: "No data found" for t in shard["tickers"] if t in missing}
+    return {"rows": len(shard["tickers"]) - len(failures), "failures": failures}
+
+
+def test_plan_shards():
+    """Test that shards cover every symbol and the whole range exactly once"""
+
+    shards = plan_shards(
+        ["A.ax", "B.ax", "C.ax"], "2023-01-01", "2023-01-20", "1m", symbols_per_shard=2
+    )
+
+    assert len(shards) == 6
+    assert [(s["start"], s["end"]) for s in shards[:3]] == [
+        ("2023-01-01T00:00:00", "2023-01-08T00:00:00"),
+        ("2023-01-08T00:00:00", "2023-01-15T00:00:00"),
+        ("2023-01-15T00:00:00", "2023-01-20T00:00:00"),
+    ]
+    assert len({s["id"] for s in shards}) == 6
+
+
+def test_run_shards_resumes_from_manifest(tmp_path):
+    """Test that a rerun only runs the shards which did not complete"""
+
+    manifest = str(tmp_path / "manifest.json")
+    shards = plan_shards(
+        ["A.ax", "B.ax", "C.ax"], "2023-01-01", "2023-01-20", "1m", symbols_per_shard=2
+    )
+    interrupted = (shards[1]["id"], shards[4]["id"])
+
+    results = list(
+        run_shards(shards, partial(load_shard, fail=interrupted), manifest, 2)
+    )
+    assert len(results) == 4
+    assert set(read_manifest(manifest)["completed"]) == {s["id"] for s in shards} - set(
+        interrupted
+    )
+
+    results = list(run_shards(shards, load_shard, manifest, 2))
+    assert sorted(r["rows"] for r in results) == [1, 2]
+    assert len(read_manifest(manifest)["completed"]) == 6
+
+
+def test_run_shards_retries_failed_symbols_next_run(tmp_path):
+    """Test that only the failed symbols of a completed shard are fetched again"""
+
+    manifest = str(tmp_path / "manifest.json")
+    shards = plan_shards(["A.ax", "B.ax"], "2023-01-01", "2023-01-05", "1m")
+
+    list(run_shards(shards, partial(load_shard, missing=("B.ax",)), manifest, 1))
+    retries = read_manifest(manifest)["retries"]
+    assert [s["tickers"] for s in retries] == [["B.ax"]]
+
+    results = list(run_shards(shards, load_shard, manifest, 1))
+    assert [r["rows"] for r in results] == [1]
+    assert list(run_shards(shards, load_shard, manifest, 1)) == []
+
+
+def test_run_shards_dead_letters_symbols_which_keep_failing(tmp_path):
+    """Test that a symbol which fails every attempt stops being re-planned"""
+
+    manifest = str(tmp_path / "manifest.json")
+    shards = plan_shards(["A.ax", "B.ax"], "2023-01-01", "2023-01-05", "1m")
+    worker = partial(load_shard, missing=("B.ax",))
+
+    for _ in range(4):
+        list(run_shards(shards, worker, manifest, 1, max_attempts=3))
+
+    plan = read_manifest(manifest)
+    assert len(plan["retries"]) == 2
+    assert list(plan["dead_letter"].values()) == [["B.ax"]]
+    assert list(run_shards(shards, worker, manifest, 1, max_attempts=3)) == []
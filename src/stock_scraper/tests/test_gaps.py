@@ -0,0 +1,79 @@
+"""Unit tests for the price gap detector"""
+
+import pandas as pd
+
+from stock_scraper.utils.gaps import (
+    find_gaps,
+    plan_gap_windows,
+    stored_keys,
+    drop_stored_rows,
+)
+
+
+def make_stored_prices() -> pd.DataFrame:
+    """Two symbols with full sessions on two days, minus a few bars"""
+
+    sessions = pd.DatetimeIndex(
+        [
+            *pd.date_range("2023-06-21 00:00", "2023-06-21 06:00", freq="min"),
+            *pd.date_range("2023-06-22 00:00", "2023-06-22 06:00", freq="min"),
+        ]
+    )
+    abc = sessions[
+        ~sessions.isin(
+            pd.date_range("2023-06-21 01:10", "2023-06-21 01:14", freq="min")
+        )
+    ]
+    ghost = sessions[sessions.day == 22][:1]  # one bar on the second day only
+
+    return pd.DataFrame(
+        {
+            "symbol": ["ABC"] * len(abc) + ["DEF"] * len(sessions) + ["GHO"],
+            "timestamp": abc.append(sessions).append(ghost),
+        }
+    )
+
+
+def test_find_gaps():
+    """Test that missing runs are reported and inactive days are ignored"""
+
+    report = find_gaps(make_stored_prices())
+
+    assert report.to_dict("records") == [
+        {
+            "symbol": "ABC",
+            "gap_start": pd.Timestamp("2023-06-21 01:10"),
+            "gap_end": pd.Timestamp("2023-06-21 01:14"),
+            "missing_bars": 5,
+        },
+        {
+            "symbol": "GHO",
+            "gap_start": pd.Timestamp("2023-06-22 00:01"),
+            "gap_end": pd.Timestamp("2023-06-22 06:00"),
+            "missing_bars": 360,
+        },
+    ]
+    assert len(find_gaps(make_stored_prices(), min_bars=10)) == 1
+
+
+def test_gap_windows_only_refill_missing_bars():
+    """Test that the re-fetch covers the gap and only gap rows are kept"""
+
+    stored = make_stored_prices()
+    report = find_gaps(stored, min_bars=10, only_active_days=False)
+    windows = plan_gap_windows(report)
+
+    assert [(str(start), str(end), tickers) for start, end, tickers in windows] == [
+        ("2023-06-21 00:00:00", "2023-06-21 06:01:00", ["GHO.ax"]),
+        ("2023-06-22 00:01:00", "2023-06-22 06:01:00", ["GHO.ax"]),
+    ]
+
+    refetched = pd.DataFrame(
+        {
+            "symbol": ["GHO", "GHO"],
+            "timestamp": pd.to_datetime(["2023-06-22 00:00", "2023-06-22 00:01"]),
+        }
+    )
+    assert drop_stored_rows(refetched, stored_keys(stored))["timestamp"].tolist() == [
+        pd.Timestamp("2023-06-22 00:01")
+    ]
@@ -0,0 +1,29 @@
+"""Unit tests for the streaming scraper pipeline"""
+
+import pandas as pd
+
+from stock_scraper.utils.pipeline import stream_prices
+
+
+def test_stream_prices_filters_and_chunks():
+    """Test that ingested rows are dropped and the rest is flushed in bounded chunks"""
+
+    timestamps = pd.date_range("2023-06-22 00:00", periods=5, freq="min")
+    batches = (
+        pd.DataFrame({"symbol": symbol, "timestamp": timestamps})
+        for symbol in ["ABC", "DEF", "NEW"]
+    )
+    latest_prices = pd.DataFrame(
+        {"symbol": ["ABC", "DEF"], "latest_timestamp": [timestamps[2], timestamps[4]]}
+    )
+
+    flushed = []
+    counts = stream_prices(
+        batches,
+        latest_prices,
+        [lambda df, i: flushed.append((i, len(df)))],
+        chunk_rows=3,
+    )
+
+    assert counts == {"downloaded": 15, "retained": 7, "chunks": 3}
+    assert flushed == [(0, 3), (1, 3), (2, 1)]
@@ -0,0 +1,82 @@
+"""Unit tests for the Yahoo rate limiter"""
+
+from time import monotonic
+
+import pytest
+
+from stock_scraper.utils.rate_limit import AdaptiveLimiter, is_throttled
+
+
+def test_limiter_paces_calls_to_the_rate():
+    """Test that calls beyond the bucket wait for tokens to refill"""
+
+    limiter = AdaptiveLimiter(rate=20, max_rate=20, concurrency=1, max_concurrency=1)
+    limiter.tokens = 0
+
+    start = monotonic()
+    for _ in range(4):
+        with limiter.limit():
+            pass
+
+    assert monotonic() - start >= 0.15
+    assert limiter.metrics()["acquired"] == 4
+    assert limiter.metrics()["max_queue_wait"] > 0
+
+
+def test_limiter_charges_batches_larger_than_the_bucket():
+    """Test that a 30-symbol batch costs 30 tokens although the bucket holds 20"""
+
+    limiter = AdaptiveLimiter(rate=20, max_rate=20, concurrency=2, max_concurrency=2)
+    limiter.tokens = limiter.capacity
+
+    start = monotonic()
+    with limiter.limit(30):
+        pass
+    with limiter.limit(1):
+        pass
+
+    # The next call waits for the 10-token debt and its own token at 20/s
+    assert monotonic() - start >= 0.5
+
+
+def test_limiter_backs_off_on_throttling_and_recovers():
+    """Test that a 429 halves the rate and concurrency and successes ramp them up"""
+
+    limiter = AdaptiveLimiter(rate=20, max_rate=40, concurrency=4, max_concurrency=8)
+
+    with pytest.raises(ConnectionError):
+        with limiter.limit():
+            raise ConnectionError("429 Client Error: Too Many Requests")
+
+    assert limiter.metrics()["rate"] == 10
+    assert limiter.metrics()["concurrency"] == 2
+    assert limiter.metrics()["throttled"] == 1
+
+    limiter.tokens = limiter.capacity
+    for _ in range(10):
+        with limiter.limit():
+            pass
+
+    assert limiter.metrics()["rate"] > 10
+    assert limiter.metrics()["concurrency"] > 2
+
+
+def test_limiter_rejects_after_timeout():
+    """Test that a call which waits too long is rejected and counted"""
+
+    limiter = AdaptiveLimiter(rate=1, concurrency=1, max_concurrency=1, timeout=0.05)
+    limiter.acquire()
+
+    with pytest.raises(TimeoutError):
+        limiter.acquire()
+
+    assert limiter.metrics()["rejections"] == 1
+
+
+def test_is_throttled():
+    """Test that only 429 and 5xx errors count as throttling"""
+
+    assert is_throttled("HTTP Error 503: Service Unavailable")
+    assert is_throttled(ConnectionError("Too Many Requests"))
+    assert not is_throttled("No data found, symbol may be delisted")
+    assert not is_throttled("HTTP Error 404: Not Found")
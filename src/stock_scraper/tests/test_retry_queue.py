@@ -0,0 +1,40 @@
+"""Unit tests for the persistent retry queue"""
+
+from stock_scraper.utils.retry_queue import read_retry_queue, update_retry_queue
+from stock_scraper.utils.state import SQLiteStore
+
+
+def test_retry_queue_only_keeps_symbols_which_still_fail(tmp_path):
+    """Test that successes leave the queue and repeated failures are counted"""
+
+    store = SQLiteStore(str(tmp_path / "state.db"))
+
+    update_retry_queue(
+        store,
+        "prices_minutely",
+        ["A.ax", "B.ax", "C.ax"],
+        {"B.ax": "429", "C.ax": "500"},
+    )
+    update_retry_queue(store, "prices_hourly", ["A.ax"], {"A.ax": "timeout"})
+
+    assert read_retry_queue(store, "prices_minutely") == ["B.ax", "C.ax"]
+
+    update_retry_queue(store, "prices_minutely", ["B.ax", "C.ax"], {"C.ax": "500"})
+
+    assert read_retry_queue(store, "prices_minutely") == ["C.ax"]
+    assert read_retry_queue(store, "prices_hourly") == ["A.ax"]
+    assert store.read("retry_queue").set_index("ticker")["attempts"]["C.ax"] == 2
+
+
+def test_retry_queue_dead_letters_tickers_which_keep_failing(tmp_path):
+    """Test that a ticker leaves the queue once it reaches the maximum attempts"""
+
+    store = SQLiteStore(str(tmp_path / "state.db"))
+
+    for _ in range(3):
+        update_retry_queue(
+            store, "prices_minutely", ["A.ax"], {"A.ax": "delisted"}, max_attempts=3
+        )
+
+    assert read_retry_queue(store, "prices_minutely") == []
+    assert store.read("retry_dead_letter")["ticker"].tolist() == ["A.ax"]
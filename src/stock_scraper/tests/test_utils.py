@@ -0,0 +1,51 @@
+"""Unit tests for the scraper's warehouse load utilities"""
+
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from stock_scraper.utils.schemas import PRICES_SCHEMA
+from stock_scraper.utils.utils import to_parquet_buffer
+from stock_scraper.utils.benchmark import benchmark_load_formats
+
+
+def make_prices(n: int) -> pd.DataFrame:
+    """Creates a frame of cleaned minutely prices"""
+
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "symbol": np.repeat(["ABC", "DEF"], n // 2),
+            "timestamp": pd.date_range("2023-06-22", periods=n, freq="min"),
+            "open": rng.uniform(0, 100, n).round(3),
+            "high": rng.uniform(0, 100, n).round(3),
+            "low": rng.uniform(0, 100, n).round(3),
+            "close": rng.uniform(0, 100, n).round(3),
+            "volume": rng.integers(0, 1e6, n).astype(float),
+        }
+    )
+
+
+def test_to_parquet_buffer_keeps_types():
+    """Test that prices are written as NUMERIC decimals with nulls preserved"""
+
+    df = make_prices(2)
+    df.loc[1, "close"] = np.nan
+
+    table = pq.read_table(to_parquet_buffer(df, PRICES_SCHEMA))
+
+    assert table.schema.field("close").type == pa.decimal128(38, 9)
+    assert table.schema.field("timestamp").type == pa.timestamp("us", tz="UTC")
+    assert table.column("close").to_pylist()[0] == Decimal(str(df["close"][0]))
+    assert table.column("close").null_count == 1
+
+
+def test_benchmark_load_formats():
+    """Test that the typed Parquet payload is smaller than the CSV payload"""
+
+    results = benchmark_load_formats(make_prices(10_000), PRICES_SCHEMA)
+
+    assert results.set_index("api_method")["bytes"].idxmin() == "load_parquet"
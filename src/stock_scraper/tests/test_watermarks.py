@@ -0,0 +1,87 @@
+"""Unit tests for the ingestion watermark store"""
+
+import pandas as pd
+
+from stock_scraper.utils import utils
+from stock_scraper.utils.state import BigQueryStore, SQLiteStore
+from stock_scraper.utils.watermarks import read_watermarks, update_watermarks
+
+
+def test_update_watermarks_keeps_latest_per_table_and_symbol(tmp_path):
+    """Test that watermarks only move forward and are kept separate per table"""
+
+    store = SQLiteStore(str(tmp_path / "state.db"))
+
+    update_watermarks(
+        store,
+        "prices_minutely",
+        pd.DataFrame(
+            {
+                "symbol": ["ABC", "ABC", "DEF"],
+                "timestamp": pd.to_datetime(
+                    ["2023-06-21 01:00", "2023-06-21 02:00", "2023-06-21 03:00"]
+                ),
+            }
+        ),
+    )
+    update_watermarks(
+        store,
+        "prices_minutely",
+        pd.DataFrame(
+            {"symbol": ["DEF"], "timestamp": pd.to_datetime(["2023-06-20 00:00"])}
+        ),
+    )
+    update_watermarks(
+        store,
+        "prices_hourly",
+        pd.DataFrame(
+            {"symbol": ["ABC"], "timestamp": pd.to_datetime(["2023-06-22 00:00"])}
+        ),
+    )
+
+    watermarks = read_watermarks(store, "prices_minutely").set_index("symbol")
+
+    assert watermarks["latest_timestamp"].to_dict() == {
+        "ABC": pd.Timestamp("2023-06-21 02:00"),
+        "DEF": pd.Timestamp("2023-06-21 03:00"),
+    }
+    assert len(read_watermarks(store, "prices_hourly")) == 1
+
+
+def test_bigquery_watermarks_are_merged_per_symbol(monkeypatch):
+    """Test that BigQuery watermarks are upserted, never replaced, so jobs can overlap"""
+
+    staged, queries = [], []
+
+    class FakeClient:
+        def query(self, query):
+            queries.append(" ".join(query.split()))
+            return self
+
+        def result(self):
+            return None
+
+    monkeypatch.setattr(utils, "get_bq_client", lambda project_id: FakeClient())
+    monkeypatch.setattr(
+        utils,
+        "load_to_bg",
+        lambda project_id, df, table, mode, **kw: staged.append(table),
+    )
+
+    update_watermarks(
+        BigQueryStore("project", "state"),
+        "prices_minutely",
+        pd.DataFrame(
+            {
+                "symbol": ["ABC", "ABC"],
+                "timestamp": pd.to_datetime(["2023-06-21", "2023-06-22"]),
+            }
+        ),
+    )
+
+    assert staged == ["state.ingestion_watermarks_changes"]
+    assert "T.table_name = S.table_name AND T.symbol = S.symbol" in queries[0]
+    assert (
+        "WHEN MATCHED AND S.latest_timestamp > T.latest_timestamp THEN "
+        "UPDATE SET latest_timestamp = S.latest_timestamp" in queries[0]
+    )
@@ -0,0 +1,30 @@
+"""Unit tests for the incremental fetch window planner"""
+
+import pandas as pd
+
+from stock_scraper.utils.windows import plan_fetch_windows
+
+
+def test_plan_fetch_windows_groups_by_lag():
+    """Test that tickers are grouped by lag and new listings are backfilled"""
+
+    now = pd.Timestamp("2023-06-22 06:00")
+    latest_prices = pd.DataFrame(
+        {
+            "symbol": ["ABC", "DEF", "GHI"],
+            "latest_timestamp": pd.to_datetime(
+                ["2023-06-22 05:00", "2023-06-22 05:30", "2023-06-12 06:00"]
+            ),
+        }
+    )
+
+    windows = plan_fetch_windows(
+        ["ABC.ax", "DEF.ax", "GHI.ax", "NEW.ax"], latest_prices, "1h", now=now
+    )
+
+    assert [(start, tickers) for start, _, tickers in windows] == [
+        (pd.Timestamp("2023-06-22 05:00"), ["ABC.ax", "DEF.ax"]),
+        (pd.Timestamp("2023-06-12 06:00"), ["GHI.ax"]),
+        (now - pd.Timedelta(days=729), ["NEW.ax"]),
+    ]
+    assert all(end == now for _, end, _ in windows)
@@ -0,0 +1,159 @@
+"""Unit tests for the Yahoo fetch engine"""
+
+import pandas as pd
+import pytest
+from yahooquery import Ticker
+
+from stock_scraper.utils import yahoo
+from stock_scraper.utils.rate_limit import AdaptiveLimiter
+from stock_scraper.utils.yahoo import fetch_in_batches
+
+
+def test_fetch_in_batches_splits_and_retries():
+    """Test that every batch is fetched once and failing batches are retried"""
+
+    attempts = {}
+
+    def fetch(batch):
+        attempts[batch[0]] = attempts.get(batch[0], 0) + 1
+        if batch[0] == "C" and attempts["C"] == 1:
+            raise ConnectionError("throttled")
+        return pd.DataFrame({"symbol": batch})
+
+    tickers = ["A", "B", "C", "D", "E"]
+    frames = list(fetch_in_batches(tickers, fetch, batch_size=2, backoff=0))
+
+    assert len(frames) == 3
+    assert sorted(pd.concat(frames)["symbol"]) == tickers
+    assert attempts == {"A": 1, "C": 2, "E": 1}
+
+
+def test_fetch_in_batches_skips_failed_batch():
+    """Test that a batch which never succeeds does not break the run"""
+
+    def fetch(batch):
+        if "B" in batch:
+            raise TimeoutError("slow symbol")
+        return pd.DataFrame({"symbol": batch})
+
+    frames = list(fetch_in_batches(["A", "B", "C"], fetch, batch_size=1, backoff=0))
+
+    assert sorted(pd.concat(frames)["symbol"]) == ["A", "C"]
+
+
+def chart(*bars) -> dict:
+    """A raw Yahoo chart result with one (epoch, price) bar per argument"""
+
+    prices = [price for _, price in bars]
+    return {
+        "meta": {"exchangeTimezoneName": "Australia/Sydney"},
+        "timestamp": [t for t, _ in bars],
+        "indicators": {
+            "quote": [
+                {
+                    "open": prices,
+                    "high": prices,
+                    "low": prices,
+                    "close": prices,
+                    "volume": [10] * len(bars),
+                }
+            ]
+        },
+    }
+
+
+def fake_ticker(responses, requested: list):
+    """
+    A Ticker whose history builds its frame from "responses(symbols)", raw
+    chart results, with yahooquery's own conversion
+    """
+
+    class FakeTicker:
+        _historical_data_to_dataframe = Ticker._historical_data_to_dataframe
+
+        def __init__(self, symbols, **kwargs):
+            self._symbols = symbols
+            requested.append(list(symbols))
+
+        def history(self, **kwargs):
+            data = responses(self._symbols)
+            return self._historical_data_to_dataframe(data, {"interval": "1m"}, True)
+
+    return FakeTicker
+
+
+def test_iter_stock_data_retries_failed_symbols(monkeypatch):
+    """Test that only symbols which errored are re-fetched and persistent failures are reported"""
+
+    requested = []
+
+    def responses(symbols):
+        flaky_ok = len(requested) > 2
+        return {
+            s: (
+                chart((1687392000, 1.0))
+                if s == "A.ax" or (s == "FLAKY.ax" and flaky_ok)
+                else (
+                    {"meta": {}, "indicators": {"quote": [{}]}}
+                    if s == "QUIET.ax"
+                    else "No data found, symbol may be delisted"
+                )
+            )
+            for s in symbols
+        }
+
+    monkeypatch.setattr(yahoo, "Ticker", fake_ticker(responses, requested))
+    monkeypatch.setattr(yahoo, "BACKOFF", 0)
+
+    failures = {}
+    df = pd.concat(
+        yahoo.iter_stock_data(
+            ["A.ax", "FLAKY.ax", "QUIET.ax", "BAD.ax"],
+            "1d",
+            "1m",
+            batch_size=2,
+            failures=failures,
+        )
+    )
+
+    assert sorted(df["symbol"]) == ["A", "FLAKY"]
+    # A symbol without bars is not retried, and each retry round re-fetches
+    # only the failed symbols, in smaller batches
+    assert sorted(requested) == [
+        ["A.ax", "FLAKY.ax"],
+        ["BAD.ax"],
+        ["BAD.ax"],
+        ["FLAKY.ax"],
+        ["QUIET.ax", "BAD.ax"],
+    ]
+    assert failures == {"BAD.ax": "No data found, symbol may be delisted"}
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        # yahooquery's result when the body is plain text, e.g. "Too Many Requests"
+        lambda symbols: {"error": "HTTP 404 Not Found.  Please try again"},
+        # a JSON error body for each symbol
+        lambda symbols: {s: "Too Many Requests" for s in symbols},
+    ],
+)
+def test_throttled_history_backs_off(monkeypatch, response):
+    """Test that a 429 from Yahoo reaches the limiter and halves its rate"""
+
+    limiter = AdaptiveLimiter(rate=20, max_rate=20, concurrency=4, max_concurrency=4)
+    monkeypatch.setattr(yahoo, "LIMITER", limiter)
+    monkeypatch.setattr(yahoo, "Ticker", fake_ticker(response, []))
+    monkeypatch.setattr(yahoo, "BACKOFF", 0)
+
+    failures = {}
+    frames = list(
+        yahoo.iter_stock_data(
+            ["A.ax"], "1d", "1m", retries=1, retry_rounds=0, failures=failures
+        )
+    )
+
+    assert all(len(df) == 0 for df in frames)
+    assert list(failures) == ["A.ax"]
+    assert limiter.metrics()["throttled"] == 1
+    assert limiter.metrics()["rate"] == 10
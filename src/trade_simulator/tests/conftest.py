@@ -0,0 +1,26 @@
+"""Conftest for trade_simulator tests."""
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def handler_dir() -> str:
+    """Fixture to return the directory the handler is deployed from"""
+    return os.path.join(os.path.dirname(__file__), "..", "trade_simulator")
+
+
+@pytest.fixture
+def handler_env() -> dict:
+    """Fixture to return the environment the handler is deployed with"""
+    return {
+        "PROJECT_ID": "test",
+        "CHANNEL_ID": "test",
+        "GUILD_ID": "test",
+        "AUTH_TOKEN": "test",
+        "PRICES_MINUTELY": "test",
+        "TRADES_TABLE": "test",
+        "TRADE_BALANCES": "test",
+        "WEBHOOK": "test",
+    }
@@ -0,0 +1,10 @@
+"""Cold-start imports of the trade_simulator handler"""
+
+# Heavy modules which only some methods need, so they are imported lazily
+LAZY_MODULES = ["matplotlib", "pandas_gbq", "google.cloud.bigquery", "fire"]
+
+
+def test_handler_defers_heavy_imports(imported_modules):
+    """Test that the heavy, method-specific modules are not imported on load"""
+
+    assert not set(LAZY_MODULES) & imported_modules
@@ -5,8 +5,6 @@ from time import perf_counter
 import json
 from base64 import b64decode
 
-import fire
-
 # pylint: disable=import-error
 from utils.discord import (
     scrape_messages_from_discord_channel,
@@ -14,7 +12,7 @@ from utils.discord import (
     create_discord_report,
 )
 from utils.processing import process_discord_messages
-from utils.bigquery import load_to_bg, read_from_bg
+from utils.bigquery import load_to_bg, read_from_bg, TRADES_SCHEMA
 
 PROJECT_ID = os.environ["PROJECT_ID"]
 CHANNEL_ID = os.environ["CHANNEL_ID"]
@@ -64,7 +62,7 @@ def scrape_messages():
 
     trades = trades[~trades["id"].isin(ids)]
     if len(trades) > 0:
-        load_to_bg(PROJECT_ID, trades, TRADES_TABLE, "append")
+        load_to_bg(PROJECT_ID, trades, TRADES_TABLE, "append", schema=TRADES_SCHEMA)
     else:
         print("No new messages found!")
 
@@ -87,6 +85,8 @@ def send_report():
 ##########
 
 if __name__ == "__main__":
+    import fire
+
     start = perf_counter()
     fire.Fire(main)
     print(f"Execution time: {perf_counter() - start:.2f} seconds")
@@ -1,7 +1,50 @@
 """Utilities for interfacing with BigQuery"""
 
-import pandas_gbq
+import io
+from functools import lru_cache
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TRADES_SCHEMA = [
+    {"name": "id", "type": "STRING"},
+    {"name": "timestamp", "type": "TIMESTAMP"},
+    {"name": "timestamp_exact", "type": "TIMESTAMP"},
+    {"name": "content", "type": "STRING"},
+    {"name": "author_id", "type": "STRING"},
+    {"name": "author_name", "type": "STRING"},
+    {"name": "action", "type": "STRING"},
+    {"name": "volume", "type": "INTEGER"},
+    {"name": "symbol", "type": "STRING"},
+    {"name": "stock_volume", "type": "INTEGER"},
+    {"name": "cash_volume", "type": "INTEGER"},
+    {"name": "brokerage", "type": "INTEGER"},
+]
+
+# BigQuery types mapped to the Arrow types written to Parquet
+ARROW_TYPES = {
+    "STRING": pa.string(),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+    "NUMERIC": pa.decimal128(38, 9),
+    "INTEGER": pa.int64(),
+    "FLOAT": pa.float64(),
+}
+
+WRITE_DISPOSITIONS = {
+    "append": "WRITE_APPEND",
+    "replace": "WRITE_TRUNCATE",
+    "fail": "WRITE_EMPTY",
+}
+
+
+@lru_cache(maxsize=None)
+def get_bq_client(project_id: str):
+    """Returns a BigQuery client, reused across warm invocations"""
+
+    from google.cloud import bigquery
+
+    return bigquery.Client(project=project_id)
 
 
 def read_from_bg(project_id: str, table: str) -> pd.DataFrame:
@@ -15,17 +58,56 @@ def read_from_bg(project_id: str, table: str) -> pd.DataFrame:
 
 
 def load_to_bg(
-    project_id: str, df: pd.DataFrame, table: str, mode: str, api_method="load_csv"
+    project_id: str,
+    df: pd.DataFrame,
+    table: str,
+    mode: str,
+    api_method="load_parquet",
+    schema: list = None,
 ):
-    """Loads a dataframe to BigQuery"""
+    """Loads a dataframe to BigQuery, as typed Parquet or through pandas-gbq CSV"""
 
-    print(f"Loading {len(df)} rows to {table} with mode={mode}")
-    pandas_gbq.to_gbq(
-        df,
-        table,
-        project_id=project_id,
-        if_exists=mode,
-        progress_bar=False,
-        api_method=api_method,
-    )
+    print(f"Loading {len(df)} rows to {table} with mode={mode} ({api_method})")
+    if api_method == "load_parquet":
+        from google.cloud import bigquery
+
+        client = get_bq_client(project_id)
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=WRITE_DISPOSITIONS[mode],
+            schema=[bigquery.SchemaField(f["name"], f["type"]) for f in schema],
+        )
+        client.load_table_from_file(
+            to_parquet_buffer(df, schema), table, job_config=job_config
+        ).result()
+    else:
+        import pandas_gbq
+
+        pandas_gbq.to_gbq(
+            df,
+            table,
+            project_id=project_id,
+            if_exists=mode,
+            progress_bar=False,
+            api_method=api_method,
+        )
     print("Loaded data to BQ successfully.")
+
+
+def to_parquet_buffer(df: pd.DataFrame, schema: list) -> io.BytesIO:
+    """Serialises a frame to an in-memory, zstd-compressed Parquet file"""
+
+    table = pa.table(
+        {
+            field["name"]: pa.array(df[field["name"]], from_pandas=True).cast(
+                ARROW_TYPES[field["type"]], safe=field["type"] != "NUMERIC"
+            )
+            for field in schema
+        }
+    )
+
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd")
+    buffer.seek(0)
+
+    return buffer
@@ -2,10 +2,8 @@
 import requests
 import pandas as pd
 
-from discord_webhook import DiscordWebhook, DiscordEmbed
-
-# pylint: disable=import-error
-from .report import make_report_figure, get_current_trader_status
+# Reused across warm invocations, so the TLS connection to Discord is kept alive
+SESSION = requests.Session()
 
 
 def scrape_messages_from_discord_channel(channel_id: str, token: str) -> pd.DataFrame:
@@ -14,7 +12,7 @@ def scrape_messages_from_discord_channel(channel_id: str, token: str) -> pd.Data
     headers = {"authorization": f"Bot {token}"}
     url = f"https://discord.com/api/v9/channels/{channel_id}/messages?limit=100"
 
-    r = requests.get(url, headers=headers, timeout=10)
+    r = SESSION.get(url, headers=headers, timeout=10)
 
     return pd.DataFrame(r.json())
 
@@ -25,7 +23,7 @@ def scrape_members_from_discord_guild(guild_id: str, token: str) -> pd.DataFrame
     headers = {"authorization": f"Bot {token}"}
     url = f"https://discord.com/api/v9/guilds/{guild_id}/members?limit=10"
 
-    r = requests.get(url, headers=headers, timeout=10)
+    r = SESSION.get(url, headers=headers, timeout=10)
 
     df = pd.DataFrame(r.json())
     df = df[["user", "nick"]]
@@ -39,7 +37,13 @@ def scrape_members_from_discord_guild(guild_id: str, token: str) -> pd.DataFrame
 
 def create_discord_report(webhook: str, balances: pd.DataFrame, names: pd.DataFrame):
     """Create a Discord report as a Discrod embed"""
-    webhook = DiscordWebhook(url=webhook)
+    # Only the report method needs the webhook client and matplotlib
+    from discord_webhook import DiscordEmbed
+    from .delivery import DiscordQueue
+    from .render import render_in_background
+    from .report import CHART_FILENAME, get_report_chart, get_current_trader_status
+
+    queue = DiscordQueue(webhook)
 
     embed = DiscordEmbed(title="Simulated Trading Results", color="03b2f8")
     embed.set_timestamp()
@@ -57,8 +61,6 @@ def create_discord_report(webhook: str, balances: pd.DataFrame, names: pd.DataFr
 
     balances = balances.merge(names, on="author_name", how="left")
 
-    standings = get_current_trader_status(balances)
-
     total_balance = balances.groupby(["display_name", "timestamp"]).sum().reset_index()
     total_balance["total_change"] = (
         total_balance["balance_value"] - total_balance["cash_input_balance"]
@@ -69,6 +71,11 @@ def create_discord_report(webhook: str, balances: pd.DataFrame, names: pd.DataFr
         * 100
     )
 
+    # The chart renders in the background while the standings are assembled
+    chart = render_in_background(get_report_chart, total_balance)
+
+    standings = get_current_trader_status(balances)
+
     emojis = [":crown:", ":second_place:", ":poop:"]
 
     for i, row in standings.iterrows():
@@ -77,16 +84,11 @@ def create_discord_report(webhook: str, balances: pd.DataFrame, names: pd.DataFr
             name=f"{emojis[i]} {row.author}", value=row.string, inline=False,
         )
 
-    figure = make_report_figure(total_balance)
-
-    with open("/tmp/" + figure, "rb") as f:
-        webhook.add_file(file=f.read(), filename=figure)
-
-    embed.set_image(url="attachment://" + figure)
+    embed.set_image(url="attachment://" + CHART_FILENAME)
 
     # Execute
-    webhook.add_embed(embed)
-    webhook.execute()
+    queue.add(embed, files={CHART_FILENAME: chart.result()})
+    queue.flush()
     print("Discord report created and sent successfully!")
 
     return
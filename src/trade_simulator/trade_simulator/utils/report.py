@@ -6,17 +6,36 @@ import pytz
 import pandas as pd
 import numpy as np
 
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
+from .render import day_labels, get_figure, hour_labels, render_png
+from .render_cache import cached_render, chart_key
 
-def make_report_figure(df: pd.DataFrame) -> str:
-    """Creates and saves a summary figure of the trading results"""
+CHART_FILENAME = "simulated_trading_results.png"
 
-    fig = plt.figure(figsize=(10, 8))
-    plt.subplots_adjust(wspace=0.05, hspace=0.25)
-    ax1 = fig.add_subplot(111)
 
-    df_trunc = df[df["timestamp"] >= datetime.now() - timedelta(7)]
+def get_report_chart(df: pd.DataFrame) -> bytes:
+    """Returns the trading report chart, from the render cache if its data is unchanged"""
+
+    window = get_report_window(df)[["display_name", "timestamp", "total_change"]]
+    key = chart_key("trading_report", window.sort_values(["display_name", "timestamp"]))
+
+    return cached_render(key, lambda: make_report_figure(window))
+
+
+def get_report_window(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns the last 7 days of the trading results, which the report shows"""
+
+    return df[df["timestamp"] >= datetime.now() - timedelta(7)]
+
+
+def make_report_figure(df: pd.DataFrame) -> bytes:
+    """Renders a summary figure of the trading results to PNG bytes"""
+
+    fig = get_figure("trading_report", build_report_template)
+    ax1 = fig.axes[0]
+
+    df_trunc = get_report_window(df)
 
     authors = df_trunc.display_name.unique()
 
@@ -25,48 +44,31 @@ def make_report_figure(df: pd.DataFrame) -> str:
 
         data = data.set_index("timestamp")
 
-        ax1.plot(
-            range(len(data)), data["total_change"], label=author_name,
-        )
+        x = np.arange(len(data))
+        total_change = data["total_change"].values
+
+        ax1.plot(x, total_change, label=author_name)
 
         ax1.fill_between(
-            range(len(data)),
-            data["total_change"],
-            0,
-            where=data["total_change"] > 0,
-            color="g",
-            alpha=0.2,
+            x, total_change, 0, where=total_change > 0, color="g", alpha=0.2
         )
         ax1.fill_between(
-            range(len(data)),
-            data["total_change"],
-            0,
-            where=data["total_change"] < 0,
-            color="r",
-            alpha=0.2,
+            x, total_change, 0, where=total_change < 0, color="r", alpha=0.2
         )
 
     ax1.axhline(0, color="gray", linestyle="--")
 
     # Figure formatting
     ticks_date = data.index.indexer_at_time("00:00")
-    ticks_time = np.arange(data.index.size)[data.index.minute == 1][::1]
+    ticks_time = np.flatnonzero(data.index.minute == 1)
     ax1.set_xticks(ticks_date)
     ax1.set_xticks(ticks_time, minor=True)
 
     timezone = pytz.timezone("Australia/Perth")
-    data.index = data.index.tz_localize("UTC").tz_convert(timezone)
+    local = data.index.tz_localize("UTC").tz_convert(timezone)
 
-    labels_date = [
-        maj_tick.strftime("\n%d-%b").replace("\n0", "\n")
-        for maj_tick in data.index[ticks_date]
-    ]
-    labels_time = [
-        min_tick.strftime("%H").lstrip("0").lower()
-        for min_tick in data.index[ticks_time]
-    ]
-    ax1.set_xticklabels(labels_date)
-    ax1.set_xticklabels(labels_time, minor=True)
+    ax1.set_xticklabels(day_labels(local[ticks_date]))
+    ax1.set_xticklabels(hour_labels(local[ticks_time], clock=24), minor=True)
     ax1.figure.autofmt_xdate(rotation=0, ha="center", which="both")
 
     ax1.legend(
@@ -79,10 +81,17 @@ def make_report_figure(df: pd.DataFrame) -> str:
 
     ax1.set_title("Total Returns", fontsize=20)
 
-    filename = "simulated_trading_results.png"
-    plt.savefig("/tmp/" + filename, facecolor="w")
+    return render_png(fig, facecolor="w")
+
+
+def build_report_template() -> Figure:
+    """Builds the figure the trading report is drawn on"""
+
+    fig = Figure(figsize=(10, 8))
+    fig.subplots_adjust(wspace=0.05, hspace=0.25)
+    fig.add_subplot(111)
 
-    return filename
+    return fig
 
 
 def get_current_trader_status(balances: pd.DataFrame) -> pd.DataFrame: